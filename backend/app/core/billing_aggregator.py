@@ -2,7 +2,10 @@ from collections import defaultdict
 from dataclasses import dataclass
 from datetime import date
 from decimal import Decimal, ROUND_HALF_UP
+import hashlib
+import json
 import re
+from uuid import UUID
 
 from app.db.session import get_db_connection
 from app.core.billing_reference import generate_reference
@@ -193,16 +196,197 @@ def _is_independent_hq(hq_id: str | None, hq_name: str | None) -> bool:
     return "indep" in hq_name.lower()
 
 
+_DOCUMENT_BATCH_SIZE = 500
+_LINE_BATCH_SIZE = 5000
+
+_DOCUMENT_INSERT = """
+    INSERT INTO billing_document (
+        run_id,
+        recipient_type,
+        recipient_id,
+        recipient_name_snapshot,
+        recipient_street_snapshot,
+        recipient_house_num_snapshot,
+        recipient_postal_code_snapshot,
+        recipient_city_snapshot,
+        recipient_country_snapshot,
+        period_month,
+        amount_ht,
+        amount_vat,
+        amount_ttc,
+        vat_rate,
+        creditor_name_snapshot,
+        creditor_iban_snapshot,
+        creditor_street_snapshot,
+        creditor_house_num_snapshot,
+        creditor_postal_code_snapshot,
+        creditor_city_snapshot,
+        creditor_country_snapshot,
+        reference_snapshot,
+        payment_message_snapshot,
+        status,
+        created_by,
+        updated_by,
+        lines_sha256
+    )
+    VALUES {values}
+    RETURNING id, recipient_type, recipient_id::text
+"""
+_DOCUMENT_VALUES = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'draft', %s, %s, %s)"
+
+
+def _insert_documents(cur, documents: list[tuple]) -> dict[tuple[str, str], str]:
+    """
+    Insert billing documents with one multi-row INSERT per batch.
+    Returns document ids keyed by (recipient_type, recipient_id).
+    """
+    document_ids: dict[tuple[str, str], str] = {}
+    for start in range(0, len(documents), _DOCUMENT_BATCH_SIZE):
+        batch = documents[start:start + _DOCUMENT_BATCH_SIZE]
+        cur.execute(
+            _DOCUMENT_INSERT.format(values=", ".join([_DOCUMENT_VALUES] * len(batch))),
+            [value for document in batch for value in document],
+        )
+        for document_id, recipient_type, recipient_id in cur.fetchall():
+            document_ids[(recipient_type, recipient_id)] = str(document_id)
+    return document_ids
+
+
+def _insert_document_lines(cur, rows: list[tuple]) -> None:
+    """
+    Insert (document_id, shop_id, delivery_id, amount_due, meta) rows through
+    unnest(), one round-trip per batch. COPY FROM is not an option here:
+    billing_document_line has row-level security enabled.
+    """
+    for start in range(0, len(rows), _LINE_BATCH_SIZE):
+        batch = rows[start:start + _LINE_BATCH_SIZE]
+        document_ids, shop_ids, delivery_ids, amounts, metas = zip(*batch)
+        cur.execute(
+            """
+            INSERT INTO billing_document_line (
+                document_id,
+                shop_id,
+                delivery_id,
+                amount_due,
+                meta
+            )
+            SELECT document_id, shop_id, delivery_id, amount_due, meta::jsonb
+            FROM unnest(%s::uuid[], %s::uuid[], %s::uuid[], %s::numeric[], %s::text[])
+                AS t(document_id, shop_id, delivery_id, amount_due, meta)
+            """,
+            (
+                list(document_ids),
+                list(shop_ids),
+                list(delivery_ids),
+                list(amounts),
+                [json.dumps(meta) for meta in metas],
+            ),
+        )
+
+
+def _document_fingerprint(values: tuple, lines: list[RecipientLine]) -> str:
+    """
+    Hash of everything a document renders: recipient, amounts, snapshots and
+    lines. run_id and created_by/updated_by are left out.
+    """
+    payload = {
+        "document": values[1:23],
+        "lines": sorted(
+            json.dumps(
+                [line.shop_id, line.delivery_id, line.amount_due, line.meta],
+                sort_keys=True,
+                default=str,
+            )
+            for line in lines
+        ),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _diff_documents(
+    cur,
+    run_id,
+    documents: list[tuple[tuple, list[RecipientLine]]],
+) -> tuple[list[str], list[tuple[tuple, list[RecipientLine]]], int]:
+    """
+    Compare freshly computed documents with the run's non-frozen documents.
+    Returns (ids to delete, documents to insert, unchanged count).
+    """
+    cur.execute(
+        """
+        SELECT id::text, recipient_type, recipient_id::text, lines_sha256
+        FROM billing_document
+        WHERE run_id = %s
+          AND status <> 'frozen'
+        """,
+        (run_id,),
+    )
+    existing = {(row[1], row[2]): (row[0], row[3]) for row in cur.fetchall()}
+
+    to_insert = []
+    unchanged = 0
+    for values, lines in documents:
+        key = (values[1], str(UUID(str(values[2]))))
+        current = existing.pop(key, None)
+        if current is not None and current[1] == values[-1]:
+            unchanged += 1
+            continue
+        if current is not None:
+            existing[key] = current
+        to_insert.append((values, lines))
+
+    # Left in `existing`: changed documents and payors with no lines anymore.
+    stale_ids = [document_id for document_id, _sha in existing.values()]
+    return stale_ids, to_insert, unchanged
+
+
+def _delete_documents(cur, *, run_id=None, document_ids: list[str] | None = None) -> None:
+    """
+    Delete the non-frozen documents of a run, or the given documents, with their lines.
+    """
+    if run_id is not None:
+        cur.execute(
+            """
+            DELETE FROM billing_document_line
+            WHERE document_id IN (
+                SELECT id FROM billing_document
+                WHERE run_id = %s
+                  AND status <> 'frozen'
+            )
+            """,
+            (run_id,),
+        )
+        cur.execute(
+            "DELETE FROM billing_document WHERE run_id = %s AND status <> 'frozen'",
+            (run_id,),
+        )
+        return
+    if not document_ids:
+        return
+    cur.execute(
+        "DELETE FROM billing_document_line WHERE document_id = ANY(%s::uuid[])",
+        (document_ids,),
+    )
+    cur.execute(
+        "DELETE FROM billing_document WHERE id = ANY(%s::uuid[])",
+        (document_ids,),
+    )
+
+
 def aggregate_billing_run(
     *,
     admin_region_id: str,
     period_month: date,
     created_by: str | None,
     jwt_claims: str,
+    incremental: bool = False,
 ) -> dict:
     """
     Builds payor-centric billing documents for a region + month.
     Returns a summary of created documents/lines.
+    With incremental=True, only documents whose content changed since the
+    previous run are rewritten; the others keep their id, status and PDF.
     """
     with get_db_connection(jwt_claims) as conn:
         with conn:
@@ -298,22 +482,6 @@ def aggregate_billing_run(
                 )
                 frozen_recipients = {(row[0], row[1]) for row in cur.fetchall()}
 
-                cur.execute(
-                    """
-                    DELETE FROM billing_document_line
-                    WHERE document_id IN (
-                        SELECT id FROM billing_document
-                        WHERE run_id = %s
-                          AND status <> 'frozen'
-                    )
-                    """,
-                    (run_id,),
-                )
-                cur.execute(
-                    "DELETE FROM billing_document WHERE run_id = %s AND status <> 'frozen'",
-                    (run_id,),
-                )
-
                 recipient_snapshot_cache: dict[tuple[str, str], dict] = {}
 
                 def _get_recipient_snapshot(recipient_type: str, recipient_id: str) -> dict:
@@ -449,8 +617,7 @@ def aggregate_billing_run(
                             )
                         )
 
-                document_count = 0
-                line_count = 0
+                documents: list[tuple[tuple, list[RecipientLine]]] = []
 
                 for (recipient_type, recipient_id), lines in payor_lines.items():
                     if (recipient_type, recipient_id) in frozen_recipients:
@@ -462,93 +629,38 @@ def aggregate_billing_run(
                     payment_message_snapshot = f"Facturation DringDring {period_month.strftime('%Y-%m')}"
                     recipient_snapshot = _get_recipient_snapshot(recipient_type, recipient_id)
 
-                    cur.execute(
-                        """
-                        INSERT INTO billing_document (
-                            run_id,
-                            recipient_type,
-                            recipient_id,
-                            recipient_name_snapshot,
-                            recipient_street_snapshot,
-                            recipient_house_num_snapshot,
-                            recipient_postal_code_snapshot,
-                            recipient_city_snapshot,
-                            recipient_country_snapshot,
-                            period_month,
-                            amount_ht,
-                            amount_vat,
-                            amount_ttc,
-                            vat_rate,
-                            creditor_name_snapshot,
-                            creditor_iban_snapshot,
-                            creditor_street_snapshot,
-                            creditor_house_num_snapshot,
-                            creditor_postal_code_snapshot,
-                            creditor_city_snapshot,
-                            creditor_country_snapshot,
-                            reference_snapshot,
-                            payment_message_snapshot,
-                            status,
-                            created_by,
-                            updated_by
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'draft', %s, %s)
-                        RETURNING id
-                        """,
+                    documents.append(
                         (
-                            run_id,
-                            recipient_type,
-                            recipient_id,
-                            recipient_snapshot.get("name"),
-                            recipient_snapshot.get("street"),
-                            recipient_snapshot.get("house_num"),
-                            recipient_snapshot.get("postal_code"),
-                            recipient_snapshot.get("city"),
-                            recipient_snapshot.get("country"),
-                            period_month,
-                            amount_ht,
-                            amount_vat,
-                            amount_ttc,
-                            vat_rate,
-                            billing_name,
-                            billing_iban,
-                            billing_street,
-                            billing_house_num,
-                            billing_postal_code,
-                            billing_city,
-                            billing_country,
-                            reference_snapshot,
-                            payment_message_snapshot,
-                            created_by,
-                            created_by,
-                        ),
-                    )
-                    document_id = cur.fetchone()[0]
-                    document_count += 1
-
-                    from psycopg.types.json import Jsonb
-
-                    for line in lines:
-                        cur.execute(
-                            """
-                            INSERT INTO billing_document_line (
-                                document_id,
-                                shop_id,
-                                delivery_id,
-                                amount_due,
-                                meta
-                            )
-                            VALUES (%s, %s, %s, %s, %s)
-                            """,
                             (
-                                document_id,
-                                line.shop_id,
-                                line.delivery_id,
-                                line.amount_due,
-                                Jsonb(line.meta),
+                                run_id,
+                                recipient_type,
+                                recipient_id,
+                                recipient_snapshot.get("name"),
+                                recipient_snapshot.get("street"),
+                                recipient_snapshot.get("house_num"),
+                                recipient_snapshot.get("postal_code"),
+                                recipient_snapshot.get("city"),
+                                recipient_snapshot.get("country"),
+                                period_month,
+                                amount_ht,
+                                amount_vat,
+                                amount_ttc,
+                                vat_rate,
+                                billing_name,
+                                billing_iban,
+                                billing_street,
+                                billing_house_num,
+                                billing_postal_code,
+                                billing_city,
+                                billing_country,
+                                reference_snapshot,
+                                payment_message_snapshot,
+                                created_by,
+                                created_by,
                             ),
+                            lines,
                         )
-                        line_count += 1
+                    )
 
                 if (
                     internal_lines
@@ -563,97 +675,70 @@ def aggregate_billing_run(
                     payment_message_snapshot = f"Facturation interne DringDring {period_month.strftime('%Y-%m')}"
                     recipient_snapshot = _get_recipient_snapshot("INTERNAL", str(admin_region_id))
 
-                    cur.execute(
-                        """
-                        INSERT INTO billing_document (
-                            run_id,
-                            recipient_type,
-                            recipient_id,
-                            recipient_name_snapshot,
-                            recipient_street_snapshot,
-                            recipient_house_num_snapshot,
-                            recipient_postal_code_snapshot,
-                            recipient_city_snapshot,
-                            recipient_country_snapshot,
-                            period_month,
-                            amount_ht,
-                            amount_vat,
-                            amount_ttc,
-                            vat_rate,
-                            creditor_name_snapshot,
-                            creditor_iban_snapshot,
-                            creditor_street_snapshot,
-                            creditor_house_num_snapshot,
-                            creditor_postal_code_snapshot,
-                            creditor_city_snapshot,
-                            creditor_country_snapshot,
-                            reference_snapshot,
-                            payment_message_snapshot,
-                            status,
-                            created_by,
-                            updated_by
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'draft', %s, %s)
-                        RETURNING id
-                        """,
+                    documents.append(
                         (
-                            run_id,
-                            "INTERNAL",
-                            admin_region_id,
-                            recipient_snapshot.get("name"),
-                            recipient_snapshot.get("street"),
-                            recipient_snapshot.get("house_num"),
-                            recipient_snapshot.get("postal_code"),
-                            recipient_snapshot.get("city"),
-                            recipient_snapshot.get("country"),
-                            period_month,
-                            amount_ht,
-                            amount_vat,
-                            amount_ttc,
-                            vat_rate,
-                            internal_billing_name,
-                            internal_billing_iban,
-                            internal_billing_street,
-                            internal_billing_house_num,
-                            internal_billing_postal_code,
-                            internal_billing_city,
-                            internal_billing_country,
-                            reference_snapshot,
-                            payment_message_snapshot,
-                            created_by,
-                            created_by,
-                        ),
-                    )
-                    document_id = cur.fetchone()[0]
-                    document_count += 1
-
-                    from psycopg.types.json import Jsonb
-
-                    for line in internal_lines:
-                        cur.execute(
-                            """
-                            INSERT INTO billing_document_line (
-                                document_id,
-                                shop_id,
-                                delivery_id,
-                                amount_due,
-                                meta
-                            )
-                            VALUES (%s, %s, %s, %s, %s)
-                            """,
                             (
-                                document_id,
-                                line.shop_id,
-                                line.delivery_id,
-                                line.amount_due,
-                                Jsonb(line.meta),
+                                run_id,
+                                "INTERNAL",
+                                admin_region_id,
+                                recipient_snapshot.get("name"),
+                                recipient_snapshot.get("street"),
+                                recipient_snapshot.get("house_num"),
+                                recipient_snapshot.get("postal_code"),
+                                recipient_snapshot.get("city"),
+                                recipient_snapshot.get("country"),
+                                period_month,
+                                amount_ht,
+                                amount_vat,
+                                amount_ttc,
+                                vat_rate,
+                                internal_billing_name,
+                                internal_billing_iban,
+                                internal_billing_street,
+                                internal_billing_house_num,
+                                internal_billing_postal_code,
+                                internal_billing_city,
+                                internal_billing_country,
+                                reference_snapshot,
+                                payment_message_snapshot,
+                                created_by,
+                                created_by,
                             ),
+                            internal_lines,
                         )
-                        line_count += 1
+                    )
+
+                documents = [
+                    (values + (_document_fingerprint(values, lines),), lines)
+                    for values, lines in documents
+                ]
+                unchanged_count = 0
+                if incremental:
+                    stale_ids, documents, unchanged_count = _diff_documents(cur, run_id, documents)
+                    _delete_documents(cur, document_ids=stale_ids)
+                else:
+                    _delete_documents(cur, run_id=run_id)
+
+                document_ids = _insert_documents(cur, [values for values, _lines in documents])
+                line_rows = [
+                    (
+                        document_ids[(values[1], str(UUID(str(values[2]))))],
+                        line.shop_id,
+                        line.delivery_id,
+                        line.amount_due,
+                        line.meta,
+                    )
+                    for values, lines in documents
+                    for line in lines
+                ]
+                _insert_document_lines(cur, line_rows)
+                document_count = len(documents)
+                line_count = len(line_rows)
 
                 return {
                     "run_id": str(run_id),
                     "documents": document_count,
                     "lines": line_count,
+                    "unchanged_documents": unchanged_count,
                     "vat_rate": str(vat_rate),
                 }
@@ -6,8 +6,10 @@ from fastapi import HTTPException
 
 from app.db.session import get_db_connection
 from app.pdf.invoice_qr_bill import build_recipient_invoice_with_qr_bill
+from app.pdf.logo import load_storage_logo
+from app.pdf.render_pool import RenderJob, render_jobs
 from app.pdf.shop_monthly_report import build_shop_monthly_pdf
-from app.storage.supabase_storage import upload_pdf_bytes, download_file_bytes
+from app.storage.supabase_storage import upload_pdf_bytes
 from app.core.billing_reference import generate_reference
 
 
@@ -36,8 +38,39 @@ def freeze_shop_billing_period(
     """
     Core logic to freeze a billing period for a shop.
     Generates the PDF, uploads it, and inserts/updates the billing_period record.
-    Must be called within an active transaction cursor `cur`.
+    Runs in a savepoint when `cur` is already in a transaction (its own
+    transaction otherwise): a shop that fails is rolled back alone and the
+    caller's transaction stays usable for the next one.
     """
+    with cur.connection.transaction():
+        return _freeze_shop_billing_period(
+            cur,
+            shop_id,
+            period_month,
+            frozen_by_user_id,
+            frozen_by_email,
+            frozen_comment,
+        )
+
+
+def _render_pdf(builder, kwargs: dict) -> bytes:
+    # Rendered in the PDF process pool: parallel freezes run their documents
+    # side by side instead of taking turns on the GIL.
+    job = RenderJob(name="freeze", filename="freeze.pdf", builder=builder, kwargs=kwargs)
+    _job, pdf_bytes, error = next(render_jobs([job]))
+    if error is not None:
+        raise error
+    return pdf_bytes
+
+
+def _freeze_shop_billing_period(
+    cur,
+    shop_id: str,
+    period_month: date,
+    frozen_by_user_id: str,
+    frozen_by_email: str,
+    frozen_comment: str | None,
+):
     # 1. Check if already frozen
     cur.execute(
         """
@@ -109,12 +142,7 @@ def freeze_shop_billing_period(
         billing_logo_path,
     ) = shop_row
 
-    logo_bytes = None
-    if billing_logo_path:
-        try:
-            logo_bytes = download_file_bytes(bucket="billing-logos", path=billing_logo_path)
-        except RuntimeError:
-            logo_bytes = None
+    logo_bytes = load_storage_logo(billing_logo_path)
 
     if billing_street is None and admin_region_address:
         billing_street, billing_house_num = _split_address_parts(admin_region_address)
@@ -203,7 +231,7 @@ def freeze_shop_billing_period(
         reference = generate_reference(billing_iban or "", reference_seed)
         
         # Use new Swiss QR Bill compliant invoice
-        pdf_buffer = build_recipient_invoice_with_qr_bill(
+        pdf_bytes = _render_pdf(build_recipient_invoice_with_qr_bill, dict(
             recipient_label="Commerce",
             recipient_name=shop_name,
             recipient_street=shop_address,
@@ -223,9 +251,9 @@ def freeze_shop_billing_period(
             creditor_city=billing_city if has_billing_override else None,
             creditor_country=billing_country if has_billing_override else None,
             logo_bytes=logo_bytes,
-        )
+        ))
     else:
-        pdf_buffer = build_shop_monthly_pdf(
+        pdf_bytes = _render_pdf(build_shop_monthly_pdf, dict(
             shop_name=shop_name,
             shop_city=shop_city,
             hq_name=hq_name,
@@ -234,8 +262,7 @@ def freeze_shop_billing_period(
             frozen_by=frozen_by_user_id,
             frozen_by_name=frozen_by_email,
             deliveries=deliveries,
-        )
-    pdf_bytes = pdf_buffer.getvalue()
+        ))
     pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
     
     # Format: YYYY-MM
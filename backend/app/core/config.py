@@ -22,7 +22,44 @@ class Settings(BaseSettings):
     RETURN_TRIP_MULTIPLIER: float = 2.0
     OSRM_BASE_URL: str = "https://router.project-osrm.org"
     OSRM_TIMEOUT_SECONDS: int = 8
+    OSRM_TABLE_MAX_COORDINATES: int = 100
+    ROUTE_CACHE_TTL_SECONDS: float = 180 * 24 * 3600.0
+    ROUTE_CACHE_MAX_ENTRIES: int = 8192
+    ENRICHMENT_WORKERS: int = 2
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_CONCURRENCY_PER_HOST: int = 8
+    HTTP_BREAKER_FAILURES: int = 5
+    HTTP_BREAKER_RESET_SECONDS: float = 30.0
+    GEOCODE_CACHE_TTL_SECONDS: float = 90 * 24 * 3600.0
+    GEOCODE_NEGATIVE_TTL_SECONDS: float = 24 * 3600.0
+    GEOCODE_CACHE_MAX_ENTRIES: int = 4096
     DEFAULT_USER_PASSWORD: str = "password"
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    DB_POOL_MAX_IDLE_SECONDS: float = 300.0
+    DB_POOL_MAX_LIFETIME_SECONDS: float = 1800.0
+    DB_DNS_TTL_SECONDS: float = 300.0
+    JWT_CACHE_TTL_SECONDS: float = 300.0
+    JWT_CACHE_MAX_ENTRIES: int = 1024
+    IDENTITY_CACHE_TTL_SECONDS: float = 60.0
+    IDENTITY_CACHE_MAX_ENTRIES: int = 4096
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_MAX_PENDING: int = 8
+    PDF_RENDER_TIMEOUT_SECONDS: float = 60.0
+    PDF_CACHE_DIR: str | None = None
+    PDF_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    PDF_CACHE_BUCKET: str = "pdf-cache"
+    LOGO_CACHE_TTL_SECONDS: float = 300.0
+    JOB_WORKERS: int = 4
+    JOB_STALE_SECONDS: float = 900.0
+    STORAGE_TIMEOUT_SECONDS: float = 30.0
+    STORAGE_MAX_CONNECTIONS: int = 10
+    STORAGE_MAX_CONCURRENCY: int = 4
+    STORAGE_RETRIES: int = 2
+    STORAGE_RETRY_BACKOFF_SECONDS: float = 0.5
+    STORAGE_LOCAL_DIR: str | None = None
+    CSV_EXPORT_CHUNK_ROWS: int = 2000
 
     CORS_ORIGINS: list[str] = [
         "http://localhost:3000",
@@ -0,0 +1,184 @@
+"""
+Distance and CO2 of new deliveries, filled in after the delivery is created.
+
+The creation routes only record the delivery (distance_km and co2_saved_kg
+NULL) and call enqueue_enrichment() once their transaction is committed, so
+their latency no longer depends on geo.admin.ch or OSRM. A process-wide pool
+of ENRICHMENT_WORKERS threads then, with the claims of the user who created
+the delivery:
+- geocodes the shop and the client when their coordinates are missing and
+  stores them on the shop/client,
+- routes shop -> client and fills in the delivery distance and CO2.
+No connection is held during the geo.admin.ch/OSRM calls: the delivery is
+read, the connection released, coordinates and distance are computed (the
+shared cache tables get their own short checkouts), and the results are
+written in a second, short transaction.
+
+Deliveries left NULL by a stopped instance (or an address that cannot be
+found) are picked up by scripts/backfill_geo.py.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+import logging
+import threading
+
+from app.core.config import settings
+from app.core.geo import (
+    clean_address,
+    compute_co2_saved_kg,
+    compute_distance_km,
+    format_address,
+    geocode_swiss_address,
+)
+from app.db.session import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is not None:
+        return _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(settings.ENRICHMENT_WORKERS, 1),
+                thread_name_prefix="delivery-enrichment",
+            )
+    return _executor
+
+
+def shutdown_enrichment_workers() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _schedule(delivery_id: str, jwt_claims: str) -> None:
+    _get_executor().submit(_run_enrichment, delivery_id, jwt_claims)
+
+
+def enqueue_enrichment(delivery_id, jwt_claims: str) -> None:
+    """
+    Compute the distance of a committed delivery in the background.
+    """
+    _schedule(str(delivery_id), jwt_claims)
+
+
+def _run_enrichment(delivery_id: str, jwt_claims: str) -> None:
+    try:
+        enrich_delivery(delivery_id, jwt_claims)
+    except Exception:
+        logger.exception("Enrichment of delivery %s failed", delivery_id)
+
+
+@contextmanager
+def _cache_cursor(jwt_claims: str):
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            yield cur
+        conn.commit()
+
+
+def _load_delivery(delivery_id: str, jwt_claims: str):
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT
+                    s.id::text,
+                    s.lat,
+                    s.lng,
+                    s.address,
+                    cl.id::text,
+                    cl.lat,
+                    cl.lng,
+                    l.address,
+                    l.postal_code,
+                    l.city_name
+                FROM delivery d
+                JOIN shop s ON s.id = d.shop_id
+                JOIN delivery_logistics l ON l.delivery_id = d.id
+                LEFT JOIN client cl ON cl.id = d.client_id
+                WHERE d.id = %s
+                  AND d.distance_km IS NULL
+                """,
+                (delivery_id,),
+            )
+            return cur.fetchone()
+
+
+def enrich_delivery(delivery_id: str, jwt_claims: str) -> float | None:
+    """
+    Fill in distance_km/co2_saved_kg of a delivery that has none yet.
+    Returns the distance (return trip, km), None when it cannot be computed.
+    """
+    row = _load_delivery(delivery_id, jwt_claims)
+    if not row:
+        return None
+    (
+        shop_id,
+        shop_lat,
+        shop_lng,
+        shop_address,
+        client_id,
+        client_lat,
+        client_lng,
+        address,
+        postal_code,
+        city_name,
+    ) = row
+    connect = partial(_cache_cursor, jwt_claims)
+
+    shop_geocoded = client_geocoded = None
+    if (shop_lat is None or shop_lng is None) and shop_address:
+        shop_geocoded = geocode_swiss_address(clean_address(shop_address), connect=connect)
+        if shop_geocoded:
+            shop_lat, shop_lng = shop_geocoded
+
+    if client_lat is None or client_lng is None:
+        query = format_address(address, postal_code, city_name)
+        client_geocoded = geocode_swiss_address(query, connect=connect) if query else None
+        if client_geocoded:
+            client_lat, client_lng = client_geocoded
+
+    distance_km = None
+    if None not in (shop_lat, shop_lng, client_lat, client_lng):
+        distance_km = compute_distance_km(shop_lat, shop_lng, client_lat, client_lng, connect=connect)
+        distance_km *= settings.RETURN_TRIP_MULTIPLIER
+
+    if not (shop_geocoded or (client_geocoded and client_id) or distance_km is not None):
+        return None
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            # Coordinates set meanwhile (another delivery, an edit) are kept.
+            if shop_geocoded:
+                cur.execute(
+                    "UPDATE shop SET lat = %s, lng = %s WHERE id = %s AND (lat IS NULL OR lng IS NULL)",
+                    (shop_lat, shop_lng, shop_id),
+                )
+            if client_geocoded and client_id:
+                cur.execute(
+                    "UPDATE client SET lat = %s, lng = %s WHERE id = %s AND (lat IS NULL OR lng IS NULL)",
+                    (client_lat, client_lng, client_id),
+                )
+            if distance_km is not None:
+                cur.execute(
+                    """
+                    UPDATE delivery
+                    SET distance_km = %s,
+                        co2_saved_kg = %s
+                    WHERE id = %s
+                      AND distance_km IS NULL
+                    """,
+                    (distance_km, compute_co2_saved_kg(distance_km), delivery_id),
+                )
+        conn.commit()
+    return distance_km
@@ -1,11 +1,24 @@
+from collections import OrderedDict
+from contextlib import nullcontext
+import logging
 import math
-from typing import Optional, Tuple
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Optional, Sequence, Tuple
+import unicodedata
 
-import httpx
+import psycopg
 from urllib.parse import quote
 
+from app.core import http_client
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
 
 def swiss_to_wgs84(easting: float, northing: float) -> Tuple[float, float]:
     # Swisstopo coordinates can be LV03 or LV95. Detect by magnitude.
@@ -37,6 +50,38 @@ def swiss_to_wgs84(easting: float, northing: float) -> Tuple[float, float]:
     return lat, lon
 
 
+def swiss_to_wgs84_batch(easting, northing) -> "tuple[np.ndarray, np.ndarray]":
+    """
+    swiss_to_wgs84 over arrays of LV03 and/or LV95 coordinates (each point
+    detected by magnitude): (lat array, lon array).
+    """
+    # Imported here: only bulk jobs need NumPy, API processes never load it.
+    import numpy as np
+
+    easting = np.asarray(easting, dtype=np.float64)
+    northing = np.asarray(northing, dtype=np.float64)
+    lv03 = easting < 1000000.0
+    y = (easting - np.where(lv03, 600000.0, 2600000.0)) / 1000000.0
+    x = (northing - np.where(lv03, 200000.0, 1200000.0)) / 1000000.0
+
+    lon = (
+        2.6779094
+        + 4.728982 * y
+        + 0.791484 * y * x
+        + 0.1306 * y * x * x
+        - 0.0436 * y * y * y
+    )
+    lat = (
+        16.9023892
+        + 3.238272 * x
+        - 0.270978 * y * y
+        - 0.002528 * x * x
+        - 0.0447 * y * y * x
+        - 0.0140 * x * x * x
+    )
+    return lat * 100.0 / 36.0, lon * 100.0 / 36.0
+
+
 def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     radius_km = 6371.0
     phi1 = math.radians(lat1)
@@ -52,30 +97,246 @@ def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return radius_km * c
 
 
-def route_distance_km(
-    start_lat: float,
-    start_lng: float,
-    end_lat: float,
-    end_lng: float,
-) -> Optional[float]:
-    url = (
-        f"{settings.OSRM_BASE_URL}/route/v1/driving/"
-        f"{start_lng},{start_lat};{end_lng},{end_lat}"
-        "?overview=false"
+def haversine_km_batch(lat1, lon1, lat2, lon2) -> "np.ndarray":
+    """
+    _haversine_km over arrays (or one point against an array) of lat/lng.
+    """
+    import numpy as np
+
+    radius_km = 6371.0
+    lat1, lon1, lat2, lon2 = (np.asarray(value, dtype=np.float64) for value in (lat1, lon1, lat2, lon2))
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = np.radians(lat2 - lat1)
+    delta_lambda = np.radians(lon2 - lon1)
+
+    a = (
+        np.sin(delta_phi / 2.0) ** 2
+        + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2.0) ** 2
     )
-    try:
-        response = httpx.get(url, timeout=settings.OSRM_TIMEOUT_SECONDS)
+    c = 2.0 * np.arctan2(np.sqrt(a), np.sqrt(1.0 - a))
+    return radius_km * c
+
+
+def compute_co2_saved_kg(distance_km: float) -> float:
+    return distance_km * (settings.CO2_G_PER_KM / 1000.0)
+
+
+class _TTLCache:
+    """
+    LRU with a TTL per entry: geocoded addresses by normalized query (None
+    for "not found", kept for a shorter TTL) and route distances by
+    coordinates.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, value: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_geocode_cache = _TTLCache(settings.GEOCODE_CACHE_MAX_ENTRIES)
+_distance_cache = _TTLCache(settings.ROUTE_CACHE_MAX_ENTRIES)
+
+
+def get_geocode_cache_stats() -> dict:
+    return _geocode_cache.stats()
+
+
+def get_distance_cache_stats() -> dict:
+    return _distance_cache.stats()
+
+
+Point = Tuple[float, float]
+
+
+def _distance_key(start: Point, end: Point) -> str:
+    # Rounded to ~1 m: the same shop and client always hit the same entry.
+    return "{:.5f},{:.5f};{:.5f},{:.5f}".format(*start, *end)
+
+
+def route_distances_km(source: Point, destinations: Sequence[Point]) -> list[Optional[float]]:
+    """
+    Driving distances (km) from `source` to each destination, None where OSRM
+    found no route. One /table request per OSRM_TABLE_MAX_COORDINATES points;
+    network and API errors raise.
+    """
+    distances: list[Optional[float]] = []
+    batch_size = max(settings.OSRM_TABLE_MAX_COORDINATES - 1, 1)
+    for start in range(0, len(destinations), batch_size):
+        batch = destinations[start:start + batch_size]
+        coordinates = ";".join(f"{lng:.5f},{lat:.5f}" for lat, lng in (source, *batch))
+        indexes = ";".join(str(index) for index in range(1, len(batch) + 1))
+        url = (
+            f"{settings.OSRM_BASE_URL}/table/v1/driving/{coordinates}"
+            f"?sources=0&destinations={indexes}&annotations=distance"
+        )
+        response = http_client.get(url, timeout=settings.OSRM_TIMEOUT_SECONDS)
         response.raise_for_status()
         data = response.json()
-        routes = data.get("routes") or []
-        if not routes:
-            return None
-        meters = routes[0].get("distance")
-        if meters is None:
-            return None
-        return float(meters) / 1000.0
-    except Exception:
-        return None
+        if data.get("code") != "Ok":
+            raise RuntimeError(f"OSRM table failed: {data.get('code')} {data.get('message', '')}".strip())
+        row = (data.get("distances") or [[]])[0]
+        if len(row) != len(batch):
+            raise RuntimeError("OSRM table returned an incomplete row")
+        distances.extend(None if meters is None else float(meters) / 1000.0 for meters in row)
+    return distances
+
+
+def _cache_cursor(cur, connect: Optional[Callable[[], ContextManager]]) -> ContextManager:
+    """
+    Cursor for one access to a shared cache table: a short-lived one from
+    `connect` when given (the caller holds no connection across the network
+    calls), else the caller's `cur`.
+    """
+    if connect is not None:
+        return connect()
+    return nullcontext(cur)
+
+
+def _read_stored_distances(cur, keys: list[str]) -> dict[str, tuple[float, float]]:
+    """
+    {key: (distance km, remaining TTL)} found in private.route_distance_cache.
+    """
+    try:
+        with cur.connection.transaction():
+            cur.execute(
+                """
+                SELECT route_key, distance_km, EXTRACT(EPOCH FROM expires_at - now())
+                FROM private.route_distance_cache
+                WHERE route_key = ANY(%s)
+                  AND expires_at > now()
+                """,
+                (keys,),
+            )
+            rows = cur.fetchall()
+    except psycopg.Error as exc:
+        logger.warning("Route distance cache read failed: %s", exc)
+        return {}
+    return {key: (float(distance_km), float(ttl_seconds)) for key, distance_km, ttl_seconds in rows}
+
+
+def _store_distances(cur, distances: dict[str, float], ttl_seconds: float) -> None:
+    try:
+        with cur.connection.transaction():
+            cur.execute(
+                """
+                INSERT INTO private.route_distance_cache (route_key, distance_km, expires_at, updated_at)
+                SELECT route_key, distance_km, now() + make_interval(secs => %s), now()
+                FROM unnest(%s::text[], %s::double precision[]) AS t(route_key, distance_km)
+                ON CONFLICT (route_key) DO UPDATE
+                SET distance_km = EXCLUDED.distance_km,
+                    expires_at = EXCLUDED.expires_at,
+                    updated_at = EXCLUDED.updated_at
+                """,
+                (ttl_seconds, list(distances), list(distances.values())),
+            )
+    except psycopg.Error as exc:
+        logger.warning("Route distance cache write failed: %s", exc)
+
+
+def compute_distances_km(
+    pairs: Sequence[Tuple[float, float, float, float]],
+    cur=None,
+    *,
+    connect: Optional[Callable[[], ContextManager]] = None,
+    haversine_fallback: bool = True,
+) -> list[Optional[float]]:
+    """
+    Driving distance (km) of each (start_lat, start_lng, end_lat, end_lng)
+    pair, in order.
+
+    Served from the in-process LRU, then (given a cursor, or a `connect`
+    factory yielding one) from private.route_distance_cache; the remaining
+    pairs are routed with one OSRM /table request per start point. Pairs
+    OSRM cannot route fall back to the haversine distance, which is not
+    cached (retried next time); with haversine_fallback=False they are None
+    and left to the caller (bulk jobs use haversine_km_batch).
+    """
+    use_table = cur is not None or connect is not None
+    points = {
+        _distance_key((start_lat, start_lng), (end_lat, end_lng)): ((start_lat, start_lng), (end_lat, end_lng))
+        for start_lat, start_lng, end_lat, end_lng in pairs
+    }
+    distances: dict[str, float] = {}
+    missing = []
+    for key in points:
+        cached, distance = _distance_cache.get(key)
+        if cached:
+            distances[key] = distance
+        else:
+            missing.append(key)
+
+    if missing and use_table:
+        with _cache_cursor(cur, connect) as cache_cur:
+            stored = _read_stored_distances(cache_cur, missing)
+        for key, (distance, ttl_seconds) in stored.items():
+            _distance_cache.put(key, distance, ttl_seconds)
+            distances[key] = distance
+        missing = [key for key in missing if key not in distances]
+
+    if missing:
+        by_source: dict[Point, list[str]] = {}
+        for key in missing:
+            by_source.setdefault(points[key][0], []).append(key)
+        routed: dict[str, float] = {}
+        for source, keys in by_source.items():
+            try:
+                results = route_distances_km(source, [points[key][1] for key in keys])
+            except Exception as exc:
+                logger.warning("OSRM routing failed from %s: %s", source, exc)
+                continue
+            routed.update((key, distance) for key, distance in zip(keys, results) if distance is not None)
+        for key, distance in routed.items():
+            _distance_cache.put(key, distance, settings.ROUTE_CACHE_TTL_SECONDS)
+        if routed and use_table:
+            with _cache_cursor(cur, connect) as cache_cur:
+                _store_distances(cache_cur, routed, settings.ROUTE_CACHE_TTL_SECONDS)
+        distances.update(routed)
+
+    results = [
+        distances.get(_distance_key((start_lat, start_lng), (end_lat, end_lng)))
+        for start_lat, start_lng, end_lat, end_lng in pairs
+    ]
+    if haversine_fallback:
+        for index, distance in enumerate(results):
+            if distance is None:
+                results[index] = _haversine_km(*pairs[index])
+    return results
 
 
 def compute_distance_km(
@@ -83,34 +344,163 @@ def compute_distance_km(
     start_lng: float,
     end_lat: float,
     end_lng: float,
+    cur=None,
+    *,
+    connect: Optional[Callable[[], ContextManager]] = None,
 ) -> float:
-    distance = route_distance_km(start_lat, start_lng, end_lat, end_lng)
-    if distance is None:
-        distance = _haversine_km(start_lat, start_lng, end_lat, end_lng)
-    return distance
+    return compute_distances_km([(start_lat, start_lng, end_lat, end_lng)], cur, connect=connect)[0]
 
 
-def compute_co2_saved_kg(distance_km: float) -> float:
-    return distance_km * (settings.CO2_G_PER_KM / 1000.0)
+def clean_address(address: Optional[str]) -> Optional[str]:
+    """
+    Street address without the delivery instructions often typed after it
+    (floor, door code, phone).
+    """
+    if not address:
+        return None
+    cleaned = address.strip()
+    cleaned = re.split(r",?\s*(Etage|Étage|Code|Digicode|T[eé]l|Téléphone)\b", cleaned, maxsplit=1)[0]
+    return cleaned.strip(" ,")
 
 
-def geocode_swiss_address(query: str) -> Optional[Tuple[float, float]]:
+def format_address(
+    address: Optional[str], postal_code: Optional[str], city_name: Optional[str]
+) -> Optional[str]:
+    """
+    Geocoding query "<street>, <postal code> <city>", None without a street.
+    """
+    cleaned = clean_address(address)
+    if not cleaned:
+        return None
+    parts = [cleaned]
+    tail = " ".join(part for part in [postal_code, city_name] if part)
+    if tail:
+        parts.append(tail.strip())
+    return ", ".join(part for part in parts if part)
+
+
+def normalize_address(query: Optional[str]) -> Optional[str]:
+    """
+    Cache key of a geocoding query: case, accents composition, spacing and
+    comma placement do not make a different address.
+    """
+    if not query:
+        return None
+    key = unicodedata.normalize("NFKC", query).casefold()
+    key = re.sub(r"\s*,\s*", ", ", key)
+    key = re.sub(r"\s+", " ", key).strip(" ,")
+    return key or None
+
+
+def _search_address(query: str) -> Optional[Tuple[float, float]]:
+    """
+    First geo.admin.ch address match, None when there is none. Network and
+    API errors raise: they must not be cached as "not found".
+    """
     url = (
         "https://api3.geo.admin.ch/rest/services/ech/SearchServer"
         f"?type=locations&origins=address&searchText={quote(query)}"
     )
+    response = http_client.get(url, timeout=settings.OSRM_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    data = response.json()
+    results = data.get("results") or []
+    if not results:
+        return None
+    attrs = results[0].get("attrs") or {}
+    easting = attrs.get("y")
+    northing = attrs.get("x")
+    if easting is None or northing is None:
+        return None
+    return swiss_to_wgs84(float(easting), float(northing))
+
+
+def _read_stored_geocode(cur, key: str) -> Optional[tuple[Optional[Tuple[float, float]], float]]:
+    """
+    (coordinates, remaining TTL) from private.geocode_cache, None on a miss.
+    Runs in a savepoint: a cache failure never aborts the caller's transaction.
+    """
     try:
-        response = httpx.get(url, timeout=settings.OSRM_TIMEOUT_SECONDS)
-        response.raise_for_status()
-        data = response.json()
-        results = data.get("results") or []
-        if not results:
-            return None
-        attrs = results[0].get("attrs") or {}
-        easting = attrs.get("y")
-        northing = attrs.get("x")
-        if easting is None or northing is None:
-            return None
-        return swiss_to_wgs84(float(easting), float(northing))
-    except Exception:
+        with cur.connection.transaction():
+            cur.execute(
+                """
+                SELECT lat, lng, EXTRACT(EPOCH FROM expires_at - now())
+                FROM private.geocode_cache
+                WHERE query_key = %s
+                  AND expires_at > now()
+                """,
+                (key,),
+            )
+            row = cur.fetchone()
+    except psycopg.Error as exc:
+        logger.warning("Geocode cache read failed: %s", exc)
+        return None
+    if not row:
         return None
+    lat, lng, ttl_seconds = row
+    coords = (float(lat), float(lng)) if lat is not None else None
+    return coords, float(ttl_seconds)
+
+
+def _store_geocode(cur, key: str, coords: Optional[Tuple[float, float]], ttl_seconds: float) -> None:
+    lat, lng = coords if coords else (None, None)
+    try:
+        with cur.connection.transaction():
+            cur.execute(
+                """
+                INSERT INTO private.geocode_cache (query_key, lat, lng, expires_at, updated_at)
+                VALUES (%s, %s, %s, now() + make_interval(secs => %s), now())
+                ON CONFLICT (query_key) DO UPDATE
+                SET lat = EXCLUDED.lat,
+                    lng = EXCLUDED.lng,
+                    expires_at = EXCLUDED.expires_at,
+                    updated_at = EXCLUDED.updated_at
+                """,
+                (key, lat, lng, ttl_seconds),
+            )
+    except psycopg.Error as exc:
+        logger.warning("Geocode cache write failed: %s", exc)
+
+
+def geocode_swiss_address(
+    query: Optional[str],
+    cur=None,
+    *,
+    connect: Optional[Callable[[], ContextManager]] = None,
+) -> Optional[Tuple[float, float]]:
+    """
+    (lat, lng) of a Swiss address, None when it cannot be found.
+
+    Looked up in the in-process LRU, then (given a cursor, or a `connect`
+    factory yielding one) in private.geocode_cache, and only then on
+    geo.admin.ch; answers, including "not found", are written back to both.
+    Failed searches are not cached.
+    """
+    key = normalize_address(query)
+    if not key:
+        return None
+    cached, coords = _geocode_cache.get(key)
+    if cached:
+        return coords
+
+    use_table = cur is not None or connect is not None
+    if use_table:
+        with _cache_cursor(cur, connect) as cache_cur:
+            stored = _read_stored_geocode(cache_cur, key)
+        if stored is not None:
+            coords, ttl_seconds = stored
+            _geocode_cache.put(key, coords, ttl_seconds)
+            return coords
+
+    try:
+        coords = _search_address(query.strip())
+    except Exception as exc:
+        logger.warning("Geocoding failed for %r: %s", query, exc)
+        return None
+
+    ttl_seconds = settings.GEOCODE_CACHE_TTL_SECONDS if coords else settings.GEOCODE_NEGATIVE_TTL_SECONDS
+    _geocode_cache.put(key, coords, ttl_seconds)
+    if use_table:
+        with _cache_cursor(cur, connect) as cache_cur:
+            _store_geocode(cache_cur, key, coords, ttl_seconds)
+    return coords
@@ -0,0 +1,152 @@
+"""
+Outbound HTTP to external APIs (geo.admin.ch, OSRM, Supabase Auth admin).
+
+Every call goes through one process-wide httpx client with keep-alive
+connections (HTTP/2 when the `h2` package is installed) instead of a new
+connection per call, and through a per-host guard:
+- at most HTTP_MAX_CONCURRENCY_PER_HOST requests in flight per host; further
+  calls fail at once instead of tying up more worker threads on a slow API;
+- a circuit breaker: after HTTP_BREAKER_FAILURES consecutive failures
+  (network errors, 5xx) the host is skipped for HTTP_BREAKER_RESET_SECONDS,
+  then a single trial request decides whether it is back.
+
+Both raise HostUnavailableError, an httpx.HTTPError, so callers' existing
+error handling applies. Supabase Storage has its own client (with retries),
+see app/storage/supabase_storage.py.
+"""
+
+import importlib.util
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+class HostUnavailableError(httpx.HTTPError):
+    """
+    Request not sent: the host's circuit is open or its concurrency limit reached.
+    """
+
+
+class _HostGuard:
+    def __init__(self, host: str):
+        self.host = host
+        self.in_flight = 0
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """
+        Reserve a slot; True when the request is the half-open trial.
+        """
+        with self._lock:
+            if self.in_flight >= max(settings.HTTP_MAX_CONCURRENCY_PER_HOST, 1):
+                raise HostUnavailableError(f"Too many concurrent requests to {self.host}")
+            trial = False
+            if self.failures >= settings.HTTP_BREAKER_FAILURES:
+                if time.monotonic() < self.open_until or self.trial_running:
+                    raise HostUnavailableError(f"Circuit open for {self.host}")
+                self.trial_running = trial = True
+            self.in_flight += 1
+            return trial
+
+    def release(self, trial: bool, failed: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if trial:
+                self.trial_running = False
+            if not failed:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= settings.HTTP_BREAKER_FAILURES:
+                self.open_until = time.monotonic() + settings.HTTP_BREAKER_RESET_SECONDS
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "failures": self.failures,
+                "open": self.failures >= settings.HTTP_BREAKER_FAILURES,
+            }
+
+
+_hosts: dict[str, _HostGuard] = {}
+_hosts_lock = threading.Lock()
+
+
+def _get_host_guard(url: str) -> _HostGuard:
+    host = urlsplit(url).netloc
+    guard = _hosts.get(host)
+    if guard is None:
+        with _hosts_lock:
+            guard = _hosts.setdefault(host, _HostGuard(host))
+    return guard
+
+
+def _get_client() -> httpx.Client:
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                http2=_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS,
+                ),
+            )
+    return _client
+
+
+def close_http_client() -> None:
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+def request(method: str, url: str, *, timeout: float, **kwargs) -> httpx.Response:
+    """
+    httpx request through the shared client and the host guard. Responses
+    are returned whatever their status; only 5xx count as failures.
+    """
+    guard = _get_host_guard(url)
+    trial = guard.acquire()
+    failed = True
+    try:
+        response = _get_client().request(method, url, timeout=timeout, **kwargs)
+        failed = response.status_code >= 500
+        return response
+    finally:
+        guard.release(trial, failed)
+
+
+def get(url: str, *, timeout: float, **kwargs) -> httpx.Response:
+    return request("GET", url, timeout=timeout, **kwargs)
+
+
+def post(url: str, *, timeout: float, **kwargs) -> httpx.Response:
+    return request("POST", url, timeout=timeout, **kwargs)
+
+
+def put(url: str, *, timeout: float, **kwargs) -> httpx.Response:
+    return request("PUT", url, timeout=timeout, **kwargs)
+
+
+def get_http_client_stats() -> dict:
+    with _hosts_lock:
+        guards = list(_hosts.values())
+    return {"http2": _HTTP2, "hosts": {guard.host: guard.stats() for guard in guards}}
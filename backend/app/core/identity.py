@@ -1,15 +1,83 @@
+from collections import OrderedDict
 import json
+import threading
+import time
 
 from fastapi import HTTPException
 
+from app.core.config import settings
 from app.db.session import get_db_connection
 from app.schemas.me import MeResponse
 
 
-def resolve_identity(user_id: str, email: str, jwt_claims: str) -> MeResponse:
+class _ProfileCache:
     """
-    Central identity source of truth for DringDring.
+    LRU of public.profiles rows, one entry per user tagged with the JWT `iat`
+    it was read for. A new token (or an expired entry) goes back to the DB.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, iat) -> tuple[bool, tuple | None]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry_iat, expires_at, row = entry
+                if entry_iat == iat and expires_at > time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return True, row
+                del self._entries[user_id]
+            self.misses += 1
+            return False, None
+
+    def put(self, user_id: str, iat, row: tuple | None) -> None:
+        with self._lock:
+            self._entries[user_id] = (iat, time.monotonic() + self.ttl_seconds, row)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str | None = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(user_id), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_profile_cache = _ProfileCache(
+    settings.IDENTITY_CACHE_MAX_ENTRIES,
+    settings.IDENTITY_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_identity(user_id: str | None = None) -> None:
     """
+    Drop the cached profile of one user (or of everyone) after a profile change.
+    """
+    _profile_cache.invalidate(user_id)
+
+
+def get_identity_cache_stats() -> dict:
+    return _profile_cache.stats()
+
+
+def _fetch_profile_row(user_id: str, jwt_claims: str) -> tuple | None:
     try:
         with get_db_connection(jwt_claims) as conn:
             with conn.cursor() as cur:
@@ -21,15 +89,28 @@ def resolve_identity(user_id: str, email: str, jwt_claims: str) -> MeResponse:
                     """,
                     (user_id,),
                 )
-                row = cur.fetchone()
+                return cur.fetchone()
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
+
+def resolve_identity(user_id: str, email: str, jwt_claims: str) -> MeResponse:
+    """
+    Central identity source of truth for DringDring.
+    """
     claims = {}
     try:
         claims = json.loads(jwt_claims) if jwt_claims else {}
     except Exception:
         claims = {}
+
+    iat = claims.get("iat")
+    cached, row = _profile_cache.get(user_id, iat) if iat is not None else (False, None)
+    if not cached:
+        row = _fetch_profile_row(user_id, jwt_claims)
+        if iat is not None:
+            _profile_cache.put(user_id, iat, row)
+
     app_metadata = claims.get("app_metadata") or {}
 
     if row:
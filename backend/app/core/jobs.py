@@ -0,0 +1,439 @@
+"""
+Background jobs for region-wide operations (bulk freeze, billing aggregation).
+
+A job is a background_job row with one background_job_item per unit of work
+(a shop, a region). submit_job() records them and returns at once; the items
+run on a process-wide pool of JOB_WORKERS threads, each item in its own
+transaction with the claims of the user who submitted (or retried) the job,
+so one failing shop no longer aborts the others. Clients poll get_job().
+
+- cancel_job() marks the pending items cancelled; running items finish.
+- retry_job() puts failed/skipped/cancelled items back in the queue.
+- A job left queued/running by a stopped instance (no progress for
+  JOB_STALE_SECONDS) is reported failed when polled, and can be retried.
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import threading
+from typing import Callable
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.db.session import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# handler(params, item_key, jwt_claims) -> JSON-serialisable result. An
+# HTTPException below 500 marks the item skipped (e.g. 409 already frozen).
+JobHandler = Callable[[dict, str, str], dict | None]
+
+_ACTIVE_JOB_STATUSES = ("queued", "running")
+_OPEN_ITEM_STATUSES = ("pending", "running")
+_RETRYABLE_ITEM_STATUSES = ("failed", "skipped", "cancelled")
+
+_handlers: dict[str, JobHandler] = {}
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+# Items queued or running in this process, per job (never reported stale).
+_local_items: Counter = Counter()
+_local_lock = threading.Lock()
+
+
+def register_job_kind(kind: str, handler: JobHandler) -> None:
+    _handlers[kind] = handler
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is not None:
+        return _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(settings.JOB_WORKERS, 1),
+                thread_name_prefix="job-worker",
+            )
+    return _executor
+
+
+def shutdown_job_workers() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _schedule(job_id: str, kind: str, params: dict, item_keys: list[str], jwt_claims: str) -> None:
+    executor = _get_executor()
+    with _local_lock:
+        _local_items[job_id] += len(item_keys)
+    for item_key in item_keys:
+        executor.submit(_run_item, job_id, kind, params, item_key, jwt_claims)
+
+
+def _claim_item(job_id: str, item_key: str, jwt_claims: str) -> bool:
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE background_job_item
+                SET status = 'running', attempts = attempts + 1, started_at = now(),
+                    finished_at = NULL, error = NULL
+                WHERE job_id = %s AND item_key = %s AND status = 'pending'
+                RETURNING 1
+                """,
+                (job_id, item_key),
+            )
+            claimed = cur.fetchone() is not None
+            if claimed:
+                cur.execute(
+                    """
+                    UPDATE background_job
+                    SET status = 'running', started_at = COALESCE(started_at, now()), updated_at = now()
+                    WHERE id = %s AND status = 'queued'
+                    """,
+                    (job_id,),
+                )
+        conn.commit()
+    return claimed
+
+
+def _finish_item(
+    job_id: str,
+    item_key: str,
+    status: str,
+    result: dict | None,
+    error: str | None,
+    jwt_claims: str,
+) -> None:
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            # The job row lock orders concurrent completions: the last item
+            # to finish sees every other item closed and finalizes the job.
+            cur.execute("SELECT 1 FROM background_job WHERE id = %s FOR UPDATE", (job_id,))
+            cur.execute(
+                """
+                UPDATE background_job_item
+                SET status = %s, result = %s::jsonb, error = %s, finished_at = now()
+                WHERE job_id = %s AND item_key = %s
+                """,
+                (status, json.dumps(result, default=str) if result is not None else None, error, job_id, item_key),
+            )
+            cur.execute(
+                """
+                UPDATE background_job j
+                SET updated_at = now(),
+                    status = CASE
+                        WHEN open_items.n > 0 THEN j.status
+                        WHEN j.cancel_requested THEN 'cancelled'
+                        ELSE 'completed'
+                    END,
+                    finished_at = CASE WHEN open_items.n > 0 THEN NULL ELSE now() END
+                FROM (
+                    SELECT count(*) AS n
+                    FROM background_job_item
+                    WHERE job_id = %s AND status = ANY(%s)
+                ) open_items
+                WHERE j.id = %s
+                """,
+                (job_id, list(_OPEN_ITEM_STATUSES), job_id),
+            )
+        conn.commit()
+
+
+def _run_item(job_id: str, kind: str, params: dict, item_key: str, jwt_claims: str) -> None:
+    try:
+        if not _claim_item(job_id, item_key, jwt_claims):
+            return  # cancelled meanwhile
+        result = None
+        error = None
+        try:
+            result = _handlers[kind](params, item_key, jwt_claims)
+            status = "done"
+        except HTTPException as exc:
+            status = "skipped" if exc.status_code < 500 else "failed"
+            error = str(exc.detail)
+        except Exception as exc:
+            logger.exception("Job %s item %s failed", job_id, item_key)
+            status = "failed"
+            error = str(exc)
+        _finish_item(job_id, item_key, status, result, error, jwt_claims)
+    except Exception:
+        # Item left running: reported stale once polled, then retryable.
+        logger.exception("Job %s item %s could not be recorded", job_id, item_key)
+    finally:
+        with _local_lock:
+            _local_items[job_id] -= 1
+            if _local_items[job_id] <= 0:
+                del _local_items[job_id]
+
+
+def submit_job(
+    *,
+    kind: str,
+    items: list[tuple[str, str | None]],
+    params: dict,
+    admin_region_id: str | None,
+    created_by: str | None,
+    jwt_claims: str,
+) -> str:
+    """
+    Record a job with its (item_key, label) items and start running it.
+    Returns the job id.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO background_job (kind, admin_region_id, params, created_by)
+                VALUES (%s, %s, %s::jsonb, %s)
+                RETURNING id::text
+                """,
+                (kind, admin_region_id, json.dumps(params), created_by),
+            )
+            job_id = cur.fetchone()[0]
+            cur.execute(
+                """
+                INSERT INTO background_job_item (job_id, item_key, label)
+                SELECT %s, item.key, item.label
+                FROM unnest(%s::text[], %s::text[]) AS item(key, label)
+                """,
+                (job_id, [key for key, _label in items], [label for _key, label in items]),
+            )
+        conn.commit()
+    _schedule(job_id, kind, params, [key for key, _label in items], jwt_claims)
+    return job_id
+
+
+def _is_local(job_id: str) -> bool:
+    with _local_lock:
+        return job_id in _local_items
+
+
+def _expire_if_stale(cur, job_id: str) -> None:
+    if _is_local(job_id):
+        return
+    cur.execute(
+        """
+        UPDATE background_job
+        SET status = 'failed', error = 'Interrupted before completion',
+            finished_at = now(), updated_at = now()
+        WHERE id = %s
+          AND status = ANY(%s)
+          AND updated_at < now() - make_interval(secs => %s)
+        RETURNING 1
+        """,
+        (job_id, list(_ACTIVE_JOB_STATUSES), settings.JOB_STALE_SECONDS),
+    )
+    if cur.fetchone():
+        cur.execute(
+            """
+            UPDATE background_job_item
+            SET status = 'failed', error = 'Interrupted', finished_at = now()
+            WHERE job_id = %s AND status = ANY(%s)
+            """,
+            (job_id, list(_OPEN_ITEM_STATUSES)),
+        )
+
+
+def _job_summary(row: tuple) -> dict:
+    (
+        job_id,
+        kind,
+        status,
+        admin_region_id,
+        params,
+        cancel_requested,
+        error,
+        created_at,
+        created_by,
+        started_at,
+        finished_at,
+        item_counts,
+    ) = row
+    counts = {item_status: 0 for item_status in ("pending", "running", "done", "skipped", "failed", "cancelled")}
+    counts.update(item_counts or {})
+    total = sum(counts.values())
+    return {
+        "id": job_id,
+        "kind": kind,
+        "status": status,
+        "admin_region_id": admin_region_id,
+        "params": params,
+        "cancel_requested": cancel_requested,
+        "error": error,
+        "created_at": created_at,
+        "created_by": created_by,
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "total_items": total,
+        "finished_items": total - counts["pending"] - counts["running"],
+        "items_by_status": counts,
+    }
+
+
+_JOB_SELECT = """
+    SELECT
+        j.id::text,
+        j.kind,
+        j.status,
+        j.admin_region_id::text,
+        j.params,
+        j.cancel_requested,
+        j.error,
+        j.created_at,
+        j.created_by::text,
+        j.started_at,
+        j.finished_at,
+        (
+            SELECT jsonb_object_agg(counts.status, counts.n)
+            FROM (
+                SELECT status, count(*) AS n
+                FROM background_job_item
+                WHERE job_id = j.id
+                GROUP BY status
+            ) counts
+        )
+    FROM background_job j
+"""
+
+
+def get_job(job_id: str, jwt_claims: str, *, with_items: bool = True) -> dict | None:
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            _expire_if_stale(cur, job_id)
+            cur.execute(_JOB_SELECT + " WHERE j.id = %s", (job_id,))
+            row = cur.fetchone()
+            if not row:
+                conn.commit()
+                return None
+            job = _job_summary(row)
+            if with_items:
+                cur.execute(
+                    """
+                    SELECT item_key, label, status, attempts, result, error, started_at, finished_at
+                    FROM background_job_item
+                    WHERE job_id = %s
+                    ORDER BY label, item_key
+                    """,
+                    (job_id,),
+                )
+                job["items"] = [
+                    {
+                        "key": item_key,
+                        "label": label,
+                        "status": status,
+                        "attempts": attempts,
+                        "result": result,
+                        "error": error,
+                        "started_at": started_at,
+                        "finished_at": finished_at,
+                    }
+                    for item_key, label, status, attempts, result, error, started_at, finished_at in cur.fetchall()
+                ]
+        conn.commit()
+    return job
+
+
+def list_jobs(admin_region_id: str | None, jwt_claims: str, limit: int = 20) -> list[dict]:
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            if admin_region_id:
+                cur.execute(
+                    _JOB_SELECT + " WHERE j.admin_region_id = %s ORDER BY j.created_at DESC LIMIT %s",
+                    (admin_region_id, limit),
+                )
+            else:
+                cur.execute(_JOB_SELECT + " ORDER BY j.created_at DESC LIMIT %s", (limit,))
+            return [_job_summary(row) for row in cur.fetchall()]
+
+
+def cancel_job(job_id: str, jwt_claims: str) -> None:
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT status FROM background_job WHERE id = %s FOR UPDATE",
+                (job_id,),
+            )
+            row = cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Job not found")
+            if row[0] not in _ACTIVE_JOB_STATUSES:
+                raise HTTPException(status_code=409, detail=f"Job already {row[0]}")
+            cur.execute(
+                """
+                UPDATE background_job_item
+                SET status = 'cancelled', finished_at = now()
+                WHERE job_id = %s AND status = 'pending'
+                """,
+                (job_id,),
+            )
+            cur.execute(
+                """
+                UPDATE background_job
+                SET cancel_requested = true,
+                    updated_at = now(),
+                    status = CASE WHEN running.n = 0 THEN 'cancelled' ELSE status END,
+                    finished_at = CASE WHEN running.n = 0 THEN now() ELSE finished_at END
+                FROM (
+                    SELECT count(*) AS n
+                    FROM background_job_item
+                    WHERE job_id = %s AND status = 'running'
+                ) running
+                WHERE id = %s
+                """,
+                (job_id, job_id),
+            )
+        conn.commit()
+
+
+def retry_job(job_id: str, jwt_claims: str, item_keys: list[str] | None = None) -> int:
+    """
+    Re-run the failed, skipped and cancelled items of a job (only `item_keys`
+    when given). Returns the number of items queued again.
+    """
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT kind, params FROM background_job WHERE id = %s FOR UPDATE",
+                (job_id,),
+            )
+            row = cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Job not found")
+            kind, params = row
+            if kind not in _handlers:
+                raise HTTPException(status_code=409, detail=f"Unknown job kind: {kind}")
+            cur.execute(
+                """
+                UPDATE background_job_item
+                SET status = 'pending', error = NULL, started_at = NULL, finished_at = NULL
+                WHERE job_id = %s
+                  AND status = ANY(%s)
+                  AND (%s::text[] IS NULL OR item_key = ANY(%s::text[]))
+                RETURNING item_key
+                """,
+                (job_id, list(_RETRYABLE_ITEM_STATUSES), item_keys, item_keys),
+            )
+            retried = [item_key for (item_key,) in cur.fetchall()]
+            if not retried:
+                raise HTTPException(status_code=409, detail="Nothing to retry")
+            cur.execute(
+                """
+                UPDATE background_job
+                SET status = CASE WHEN status = 'running' THEN status ELSE 'queued' END,
+                    cancel_requested = false, error = NULL, finished_at = NULL, updated_at = now()
+                WHERE id = %s
+                """,
+                (job_id,),
+            )
+        conn.commit()
+    _schedule(job_id, kind, params, retried, jwt_claims)
+    return len(retried)
@@ -0,0 +1,19 @@
+from datetime import date
+
+
+def month_bounds(value: date) -> tuple[date, date]:
+    """
+    First day of the month of `value` and first day of the following month.
+    """
+    start = value.replace(day=1)
+    if start.month == 12:
+        return start, start.replace(year=start.year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+
+def month_range(column: str = "d.delivery_date") -> str:
+    """
+    Sargable month filter on a date column (an index on it stays usable,
+    unlike date_trunc('month', column) = ...). Bind with *month_bounds(month).
+    """
+    return f"{column} >= %s AND {column} < %s"
@@ -1,5 +1,9 @@
 import base64
+from collections import OrderedDict
+from functools import lru_cache
 import json
+import logging
+import threading
 import time
 import urllib.request
 from typing import Any, Dict, Optional
@@ -11,9 +15,31 @@ from jose import JWTError, jwt
 from app.core.config import settings
 from app.schemas.me import MeResponse
 
+logger = logging.getLogger(__name__)
 security = HTTPBearer()
-_JWKS_CACHE: dict[str, Any] = {"expires_at": 0, "keys": []}
+_JWKS_CACHE: dict[str, Any] = {
+    "expires_at": 0,
+    "attempted_at": 0,
+    "keys": [],
+    "by_kid": {},
+    "refreshing": False,
+}
 _JWKS_TTL_SECONDS = 300
+_JWKS_RETRY_SECONDS = 30
+_JWKS_LOCK = threading.Lock()
+_JWKS_FETCH_LOCK = threading.Lock()
+# Variant of SUPABASE_JWT_SECRET (raw or base64-decoded) that last verified a token.
+_HS256_PREFERRED: dict[str, Optional[str]] = {"variant": None}
+
+
+@lru_cache(maxsize=4)
+def _hs256_keys(secret: str) -> tuple[tuple[str, Any], ...]:
+    keys: list[tuple[str, Any]] = [("raw", secret)]
+    try:
+        keys.append(("base64", base64.b64decode(secret)))
+    except Exception:
+        pass
+    return tuple(keys)
 
 
 def _decode_jwt(token: str) -> Dict[str, Any]:
@@ -26,30 +52,22 @@ def _decode_jwt(token: str) -> Dict[str, Any]:
 
     alg = header.get("alg")
     kid = header.get("kid")
-    try:
-        if alg in (None, "HS256"):
-            return jwt.decode(
-                token,
-                secret,
-                algorithms=["HS256"],
-                audience="authenticated",
-                options={"verify_aud": True},
-            )
-    except JWTError:
-        pass
-
-    try:
-        if alg in (None, "HS256"):
-            decoded_secret = base64.b64decode(secret)
-            return jwt.decode(
-                token,
-                decoded_secret,
-                algorithms=["HS256"],
-                audience="authenticated",
-                options={"verify_aud": True},
-            )
-    except Exception:
-        pass
+    if alg in (None, "HS256"):
+        preferred = _HS256_PREFERRED["variant"]
+        keys = sorted(_hs256_keys(secret), key=lambda item: item[0] != preferred)
+        for variant, key in keys:
+            try:
+                payload = jwt.decode(
+                    token,
+                    key,
+                    algorithms=["HS256"],
+                    audience="authenticated",
+                    options={"verify_aud": True},
+                )
+            except Exception:
+                continue
+            _HS256_PREFERRED["variant"] = variant
+            return payload
 
     if alg and alg.startswith("ES"):
         key = _get_jwks_key(kid)
@@ -72,11 +90,60 @@ def _decode_jwt(token: str) -> Dict[str, Any]:
     )
 
 
-def _get_jwks() -> dict[str, Any]:
-    now = time.time()
-    if _JWKS_CACHE["expires_at"] > now and _JWKS_CACHE["keys"]:
-        return _JWKS_CACHE
+class _PayloadCache:
+    """
+    Bounded token -> verified payload map. Entries never outlive the token's
+    `exp` (nor JWT_CACHE_TTL_SECONDS for tokens without one).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, Dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        if expires_at <= now:
+            return
+        with self._lock:
+            self._entries[token] = (expires_at, payload)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_PAYLOAD_CACHE = _PayloadCache(
+    settings.JWT_CACHE_MAX_ENTRIES,
+    settings.JWT_CACHE_TTL_SECONDS,
+)
+
+
+def _decode_jwt_cached(token: str) -> Dict[str, Any]:
+    payload = _PAYLOAD_CACHE.get(token)
+    if payload is None:
+        payload = _decode_jwt(token)
+        _PAYLOAD_CACHE.put(token, payload)
+    return payload
+
 
+def _fetch_jwks() -> list[dict[str, Any]]:
     jwks_url = f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
     headers = {}
     if settings.SUPABASE_SERVICE_KEY:
@@ -87,10 +154,51 @@ def _get_jwks() -> dict[str, Any]:
     req = urllib.request.Request(jwks_url, headers=headers)
     with urllib.request.urlopen(req, timeout=5) as response:
         data = json.loads(response.read().decode("utf-8"))
+    return data.get("keys", [])
 
-    keys = data.get("keys", [])
-    _JWKS_CACHE["keys"] = keys
-    _JWKS_CACHE["expires_at"] = now + _JWKS_TTL_SECONDS
+
+def _refresh_jwks() -> None:
+    """
+    Fetch the JWKS and rebuild the kid index. On failure the previous keys
+    are kept and the next attempt is delayed by _JWKS_RETRY_SECONDS.
+    """
+    _JWKS_CACHE["attempted_at"] = time.time()
+    try:
+        keys = _fetch_jwks()
+    except Exception as exc:
+        logger.warning("JWKS refresh failed, serving cached keys: %s", exc)
+        with _JWKS_LOCK:
+            _JWKS_CACHE["expires_at"] = time.time() + _JWKS_RETRY_SECONDS
+            _JWKS_CACHE["refreshing"] = False
+        return
+
+    with _JWKS_LOCK:
+        _JWKS_CACHE["keys"] = keys
+        _JWKS_CACHE["by_kid"] = {key["kid"]: key for key in keys if key.get("kid")}
+        _JWKS_CACHE["expires_at"] = time.time() + _JWKS_TTL_SECONDS
+        _JWKS_CACHE["refreshing"] = False
+
+
+def _refresh_jwks_in_background() -> None:
+    threading.Thread(target=_refresh_jwks, name="jwks-refresh", daemon=True).start()
+
+
+def _get_jwks() -> dict[str, Any]:
+    """
+    Cached JWKS. Once expired, the stale keys keep being served while a single
+    background thread refreshes them; only a cold cache fetches inline.
+    """
+    with _JWKS_LOCK:
+        if _JWKS_CACHE["keys"]:
+            if _JWKS_CACHE["expires_at"] <= time.time() and not _JWKS_CACHE["refreshing"]:
+                _JWKS_CACHE["refreshing"] = True
+                _refresh_jwks_in_background()
+            return _JWKS_CACHE
+
+    with _JWKS_FETCH_LOCK:
+        # Concurrent cold callers wait here for the first fetch instead of repeating it.
+        if not _JWKS_CACHE["keys"] and _JWKS_CACHE["expires_at"] <= time.time():
+            _refresh_jwks()
     return _JWKS_CACHE
 
 
@@ -98,13 +206,16 @@ def _get_jwks_key(kid: Optional[str]) -> Optional[dict[str, Any]]:
     if not kid:
         return None
     try:
-        keys = _get_jwks().get("keys", [])
+        key = _get_jwks()["by_kid"].get(kid)
     except Exception:
         return None
-    for key in keys:
-        if key.get("kid") == kid:
-            return key
-    return None
+    if key is None and time.time() - _JWKS_CACHE["attempted_at"] > _JWKS_RETRY_SECONDS:
+        # Unknown kid: the signing key may have rotated since the last fetch.
+        with _JWKS_FETCH_LOCK:
+            if kid not in _JWKS_CACHE["by_kid"]:
+                _refresh_jwks()
+        key = _JWKS_CACHE["by_kid"].get(kid)
+    return key
 
 
 def _first_value(data: Dict[str, Any], keys: list[str]) -> Any:
@@ -115,15 +226,29 @@ def _first_value(data: Dict[str, Any], keys: list[str]) -> Any:
     return None
 
 
-def get_current_user_claims(
+def get_token_payload(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-) -> str:
-    token = credentials.credentials
+) -> Dict[str, Any]:
+    """
+    Verified payload of the bearer token. FastAPI resolves it once per request,
+    so the claims and user dependencies share a single decode.
+    """
     try:
-        payload = _decode_jwt(token)
-        return json.dumps(payload)
+        return _decode_jwt_cached(credentials.credentials)
     except HTTPException:
         raise
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"get_token_payload error: {exc}",
+        ) from exc
+
+
+def get_current_user_claims(
+    payload: Dict[str, Any] = Depends(get_token_payload),
+) -> str:
+    try:
+        return json.dumps(payload)
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -132,11 +257,9 @@ def get_current_user_claims(
 
 
 def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    payload: Dict[str, Any] = Depends(get_token_payload),
 ) -> MeResponse:
-    token = credentials.credentials
     try:
-        payload = _decode_jwt(token)
         app_metadata = payload.get("app_metadata") or {}
         return MeResponse(
             user_id=str(payload.get("sub")),
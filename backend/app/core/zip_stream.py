@@ -0,0 +1,47 @@
+import io
+import zipfile
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Unseekable write target: zipfile then writes data descriptors after each
+    entry instead of seeking back, so bytes can leave as soon as written.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """
+    ZIP archive produced incrementally for a StreamingResponse: add entries
+    with writestr() (same signature as ZipFile.writestr) and yield drain()
+    after each one; close() returns the central directory. Only the entry
+    being written is held in memory, whatever the number of documents.
+    """
+
+    def __init__(self, compression: int = zipfile.ZIP_DEFLATED):
+        self._sink = _ChunkSink()
+        self._archive = zipfile.ZipFile(self._sink, "w", compression)
+
+    def writestr(self, name: str, data: bytes | str) -> None:
+        self._archive.writestr(name, data)
+
+    def drain(self) -> bytes:
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._archive.close()
+        return self._sink.drain()
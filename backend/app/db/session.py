@@ -1,23 +1,33 @@
 from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+import logging
+import socket
+import threading
 import time
+from urllib.parse import unquote, urlparse
+
 import psycopg
+from psycopg.pq import TransactionStatus
+from psycopg_pool import ConnectionPool
+from starlette.concurrency import run_in_threadpool
+
 from app.core.config import settings
 
-@contextmanager
-def get_db_connection(jwt_claims: str):
-    """
-    Manage the PostgreSQL connection with the JWT passed in the session.
-    """
-    # Force IPv4 by adding hostaddr (resolved manually).
-    # Parse DATABASE_URL to extract components and inject hostaddr.
+logger = logging.getLogger(__name__)
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _parse_database_url(database_url: str) -> dict:
     # Parse DATABASE_URL using urllib to handle special characters correctly
-    from urllib.parse import urlparse, unquote
-    
     try:
-        url = urlparse(settings.DATABASE_URL)
+        url = urlparse(database_url)
         if url.scheme != 'postgresql':
              raise ValueError("Scheme must be postgresql")
-        
+
         user = unquote(url.username) if url.username else None
         password = unquote(url.password) if url.password else None
         host = url.hostname
@@ -25,26 +35,14 @@ def get_db_connection(jwt_claims: str):
         dbname = url.path.lstrip('/')
     except Exception:
         raise ValueError("DATABASE_URL format invalide")
-    
+
     if not (user and host and dbname):
          raise ValueError("DATABASE_URL incomplete")
-    
-    # Manual DNS resolution to force IPv4.
-    import socket
-    try:
-        # Forcer IPv4 avec AF_INET
-        ipv4 = socket.getaddrinfo(host, None, socket.AF_INET)[0][4][0]
-        print(f"Resolved {host} -> IPv4: {ipv4}")
-    except socket.gaierror:
-        print(f"Unable to resolve {host} to IPv4, using hostname fallback...")
-        ipv4 = host  # Fallback to hostname on failure.
-    
-    # Construire la connection string avec hostaddr
-    conn_params = {
+
+    return {
         "user": user,
         "password": password,
         "host": host,
-        "hostaddr": ipv4,  # FORCE l'utilisation de l'IPv4
         "port": port,
         "dbname": dbname.split('?')[0],  # Remove query params (e.g. ?pgbouncer=true).
         "options": "-c search_path=public -c statement_timeout=30000",
@@ -54,33 +52,246 @@ def get_db_connection(jwt_claims: str):
         "keepalives_idle": 30,
         "keepalives_interval": 10,
         "keepalives_count": 5,
+        # Pooler endpoints can break server-side prepared statements.
+        "prepare_threshold": None,
     }
-    
-    # Pooler endpoints can break server-side prepared statements.
-    last_exc = None
-    conn = None
-    for attempt in range(2):
+
+
+class _ResolvedEndpoint:
+    """
+    IPv4 address of the database host, cached for DB_DNS_TTL_SECONDS.
+    Expired entries are served while a background thread refreshes them;
+    failed lookups keep the last known address.
+    """
+
+    def __init__(self, host: str, ttl_seconds: float):
+        self.host = host
+        self.ttl_seconds = ttl_seconds
+        self.address: str | None = None
+        self.expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _lookup(self) -> str | None:
         try:
-            conn = psycopg.connect(**conn_params, prepare_threshold=None)
-            with conn.cursor() as cur:
-                cur.execute("SELECT set_config('request.jwt.claims', %s, true)", (jwt_claims,))
-            break
-        except (psycopg.OperationalError, psycopg.InterfaceError) as exc:
-            last_exc = exc
-            if conn:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
-            message = str(exc)
-            if attempt == 0 and ("SSL connection has been closed unexpectedly" in message or "DbHandler exited" in message):
-                time.sleep(0.25)
-                continue
-            raise
-    if conn is None and last_exc:
-        raise last_exc
+            # Forcer IPv4 avec AF_INET
+            return socket.getaddrinfo(self.host, None, socket.AF_INET)[0][4][0]
+        except socket.gaierror as exc:
+            logger.warning("Unable to resolve %s to IPv4: %s", self.host, exc)
+            return None
+
+    def _refresh(self) -> None:
+        address = self._lookup()
+        with self._lock:
+            if address:
+                if address != self.address:
+                    logger.info("Resolved %s -> IPv4: %s", self.host, address)
+                self.address = address
+            self.expires_at = time.monotonic() + self.ttl_seconds
+            self._refreshing = False
+
+    def _refresh_in_background(self) -> None:
+        threading.Thread(
+            target=self._refresh,
+            name=f"dns-refresh-{self.host}",
+            daemon=True,
+        ).start()
+
+    def get(self) -> str:
+        with self._lock:
+            address = self.address
+            stale = time.monotonic() >= self.expires_at
+            refresh = bool(address and stale and not self._refreshing)
+            if refresh:
+                self._refreshing = True
+        if refresh:
+            self._refresh_in_background()
+        if address:
+            return address
+        # First lookup is synchronous; fall back to the hostname on failure.
+        with self._lock:
+            self._refreshing = True
+        self._refresh()
+        return self.address or self.host
+
+
+_endpoints: dict[str, _ResolvedEndpoint] = {}
+_endpoints_lock = threading.Lock()
+
+
+def _resolve_hostaddr(host: str) -> str:
+    endpoint = _endpoints.get(host)
+    if endpoint is None:
+        with _endpoints_lock:
+            endpoint = _endpoints.setdefault(
+                host, _ResolvedEndpoint(host, settings.DB_DNS_TTL_SECONDS)
+            )
+    return endpoint.get()
+
+
+class _IPv4Connection(psycopg.Connection):
+    """
+    Force IPv4 by injecting the cached hostaddr on every physical connect,
+    so pool reconnects pick up DNS changes without a lookup per request.
+    """
+
+    @classmethod
+    def connect(cls, conninfo: str = "", **kwargs):
+        host = kwargs.get("host")
+        if host:
+            kwargs["hostaddr"] = _resolve_hostaddr(host)
+        return super().connect(conninfo, **kwargs)
+
+
+def _reset_connection(conn: psycopg.Connection) -> None:
+    # Drop any session-level setting (jwt claims included) before reuse.
+    conn.autocommit = True
+    try:
+        conn.execute("RESET ALL")
+    finally:
+        conn.autocommit = False
+
+
+def _get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                connection_class=_IPv4Connection,
+                kwargs=_parse_database_url(settings.DATABASE_URL),
+                min_size=settings.DB_POOL_MIN_SIZE,
+                max_size=settings.DB_POOL_MAX_SIZE,
+                timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+                max_idle=settings.DB_POOL_MAX_IDLE_SECONDS,
+                max_lifetime=settings.DB_POOL_MAX_LIFETIME_SECONDS,
+                check=ConnectionPool.check_connection,
+                reset=_reset_connection,
+                name="dringdring",
+                open=True,
+            )
+    return _pool
 
+
+def open_pool() -> None:
+    """
+    Open the process-wide pool ahead of the first request.
+    """
+    _get_pool()
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool_stats() -> dict:
+    """
+    Pool usage counters (size, waiting requests, timeouts) for monitoring.
+    """
+    if _pool is None:
+        return {"open": False}
+    stats = _pool.get_stats()
+    stats["open"] = True
+    return stats
+
+
+class _RequestConnection:
+    """
+    Connection shared by the guards, identity resolution and route body of
+    one HTTP request. Borrowed lazily on first use and returned at the end of
+    the request; nested checkouts get their own pooled connection so an inner
+    commit never ends the outer transaction.
+    """
+
+    def __init__(self):
+        self.conn: psycopg.Connection | None = None
+        self.in_use = False
+        self.released = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> psycopg.Connection | None:
+        with self._lock:
+            if self.released or self.in_use:
+                return None
+            if self.conn is not None and self.conn.closed:
+                _get_pool().putconn(self.conn)
+                self.conn = None
+            if self.conn is None:
+                self.conn = _get_pool().getconn()
+            self.in_use = True
+            return self.conn
+
+    def done(self) -> None:
+        with self._lock:
+            self.in_use = False
+
+    def release(self) -> None:
+        with self._lock:
+            self.released = True
+            conn, self.conn = self.conn, None
+        if conn is not None:
+            _get_pool().putconn(conn)
+
+
+_request_connection: ContextVar[_RequestConnection | None] = ContextVar(
+    "request_connection", default=None
+)
+
+
+async def request_db_scope():
+    """
+    App-wide dependency: every get_db_connection() made while serving the
+    request reuses a single pooled connection.
+    """
+    scope = _RequestConnection()
+    _request_connection.set(scope)
+    try:
+        yield scope
+    finally:
+        _request_connection.set(None)
+        await run_in_threadpool(scope.release)
+
+
+@contextmanager
+def _claims_scope(conn: psycopg.Connection, jwt_claims: str):
     try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('request.jwt.claims', %s, true)", (jwt_claims,))
         yield conn
     finally:
-        conn.close()
+        # Claims are transaction-local: closing the transaction clears them
+        # and avoids the pool warning about connections returned mid-transaction.
+        if not conn.closed and conn.info.transaction_status != TransactionStatus.IDLE:
+            try:
+                conn.rollback()
+            except psycopg.Error:
+                pass
+
+
+@contextmanager
+def get_db_connection(jwt_claims: str, *, dedicated: bool = False):
+    """
+    Manage the PostgreSQL connection with the JWT passed in the session.
+    Inside a request the connection is shared (see request_db_scope);
+    otherwise it is borrowed from the process-wide pool and returned on exit.
+    `dedicated` always borrows a connection of its own, for work that
+    outlives the request (streamed responses keep reading after it ends).
+    """
+    scope = _request_connection.get()
+    shared = scope.acquire() if scope is not None and not dedicated else None
+    if shared is None:
+        with _get_pool().connection() as conn:
+            with _claims_scope(conn, jwt_claims):
+                yield conn
+        return
+
+    try:
+        with _claims_scope(shared, jwt_claims):
+            yield shared
+    finally:
+        scope.done()
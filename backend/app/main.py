@@ -1,8 +1,11 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routes import (
     health,
+    jobs,
     deliveries,
     pricing,
     reporting,
@@ -21,8 +24,35 @@ from app.routes import (
 )
 
 from app.core.config import settings as app_settings
+from app.db.session import close_pool, open_pool, request_db_scope
+from app.core.delivery_enrichment import shutdown_enrichment_workers
+from app.core.http_client import close_http_client
+from app.core.jobs import shutdown_job_workers
+from app.pdf.logo import warm_logo_cache
+from app.pdf.render_pool import shutdown_render_pool
+from app.storage.supabase_storage import close_storage_client
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    open_pool()
+    warm_logo_cache()
+    try:
+        yield
+    finally:
+        shutdown_job_workers()
+        shutdown_enrichment_workers()
+        shutdown_render_pool()
+        close_storage_client()
+        close_http_client()
+        close_pool()
 
-app = FastAPI(title="DringDring Backend")
+
+app = FastAPI(
+    title="DringDring Backend",
+    lifespan=lifespan,
+    dependencies=[Depends(request_db_scope)],
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,6 +71,7 @@ app.include_router(me.router, prefix="/api/v1")
 app.include_router(clients.router, prefix="/api/v1")
 app.include_router(shops.router, prefix="/api/v1")
 app.include_router(billing.router, prefix="/api/v1")
+app.include_router(jobs.router, prefix="/api/v1")
 app.include_router(regions.router, prefix="/api/v1")
 app.include_router(couriers.router, prefix="/api/v1")
 app.include_router(cities.router, prefix="/api/v1")
@@ -1,32 +1,151 @@
+"""
+Logos drawn on the PDFs.
+
+Two caches, so bulk runs neither re-read nor re-decode a logo per document:
+- storage logos (admin region billing logos) by storage path, for
+  LOGO_CACHE_TTL_SECONDS; the region logo routes invalidate their path,
+  failed downloads are remembered for _FAILED_LOGO_TTL_SECONDS so a storage
+  outage costs one retry cycle every few seconds, not one per document;
+- decoded images by content hash and drawing width, downscaled to
+  _LOGO_DPI and kept as small PNGs (content-addressed, never stale).
+"""
+
+from collections import OrderedDict
+import hashlib
 from io import BytesIO
 from pathlib import Path
+import threading
+import time
 
+from PIL import Image as PILImage
 from reportlab.lib.units import cm
 from reportlab.platypus import Image, Spacer
 
+from app.core.config import settings
+from app.storage.supabase_storage import download_file_bytes
 
-def build_logo_image(width_cm: float = 4.2, logo_bytes: bytes | None = None):
-    image_source: str | BytesIO
-    if logo_bytes:
-        image_source = BytesIO(logo_bytes)
-    else:
-        logo_path = (
-            Path(__file__).resolve().parents[1]
-            / "assets"
-            / "logo-Dring-Dring2.png"
-        )
-        if not logo_path.exists():
+LOGO_BUCKET = "billing-logos"
+
+_BUNDLED_LOGO = Path(__file__).resolve().parents[1] / "assets" / "logo-Dring-Dring2.png"
+# Widths (cm) the PDF builders draw the bundled logo at, warmed at startup.
+_BUILDER_WIDTHS_CM = (4.2, 3.6)
+_LOGO_DPI = 300
+_SCALED_MAX_ENTRIES = 64
+_PNG_MODES = {"1", "L", "LA", "I", "I;16", "P", "RGB", "RGBA"}
+_FAILED_LOGO_TTL_SECONDS = 5.0
+
+_bundled_logo: bytes | None = None
+_storage_logos: dict[str, tuple[float, bytes | None]] = {}
+_scaled_logos: OrderedDict[tuple[str, float], tuple[bytes, int, int] | None] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _read_bundled_logo() -> bytes | None:
+    global _bundled_logo
+    if _bundled_logo is None:
+        try:
+            _bundled_logo = _BUNDLED_LOGO.read_bytes()
+        except OSError:
             return None
-        image_source = str(logo_path)
+    return _bundled_logo
 
+
+def _scale(data: bytes, width_cm: float) -> tuple[bytes, int, int] | None:
+    """
+    (PNG bytes, width px, height px) of the logo, downscaled to _LOGO_DPI at
+    `width_cm`; the original bytes and size if it cannot be re-encoded, None
+    if the image cannot be decoded.
+    """
     try:
-        image = Image(image_source)
+        with PILImage.open(BytesIO(data)) as source:
+            source.load()
+            original = (data, source.width, source.height)
+            image = source
+            try:
+                if image.mode not in _PNG_MODES:
+                    # e.g. CMYK JPEGs, which PNG cannot store.
+                    image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+                max_width = round(width_cm / 2.54 * _LOGO_DPI)
+                if image.width > max_width:
+                    height = max(round(image.height * max_width / image.width), 1)
+                    image = image.resize((max_width, height), PILImage.LANCZOS)
+                buffer = BytesIO()
+                image.save(buffer, format="PNG")
+                return buffer.getvalue(), image.width, image.height
+            except Exception:
+                return original
     except Exception:
         return None
+
+
+def _scaled_logo(data: bytes, width_cm: float) -> tuple[bytes, int, int] | None:
+    key = (hashlib.sha256(data).hexdigest(), width_cm)
+    with _lock:
+        if key in _scaled_logos:
+            _scaled_logos.move_to_end(key)
+            return _scaled_logos[key]
+    scaled = _scale(data, width_cm)
+    with _lock:
+        _scaled_logos[key] = scaled
+        while len(_scaled_logos) > _SCALED_MAX_ENTRIES:
+            _scaled_logos.popitem(last=False)
+    return scaled
+
+
+def load_storage_logo(path: str | None) -> bytes | None:
+    """
+    Logo stored at `path` in the billing-logos bucket, None when unset or
+    unavailable (the PDFs are then rendered without it).
+    """
+    if not path:
+        return None
+    with _lock:
+        entry = _storage_logos.get(path)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    try:
+        data = download_file_bytes(bucket=LOGO_BUCKET, path=path)
+    except RuntimeError:
+        with _lock:
+            _storage_logos[path] = (time.monotonic() + _FAILED_LOGO_TTL_SECONDS, None)
+        return None
+    with _lock:
+        _storage_logos[path] = (time.monotonic() + settings.LOGO_CACHE_TTL_SECONDS, data)
+    return data
+
+
+def invalidate_storage_logo(path: str | None = None) -> None:
+    """
+    Forget the cached logo at `path` (or every storage logo) after an upload
+    or removal.
+    """
+    with _lock:
+        if path is None:
+            _storage_logos.clear()
+        else:
+            _storage_logos.pop(path, None)
+
+
+def warm_logo_cache() -> None:
+    data = _read_bundled_logo()
+    if data:
+        for width_cm in _BUILDER_WIDTHS_CM:
+            _scaled_logo(data, width_cm)
+
+
+def build_logo_image(width_cm: float = 4.2, logo_bytes: bytes | None = None):
+    data = logo_bytes or _read_bundled_logo()
+    if not data:
+        return None
+    scaled = _scaled_logo(data, width_cm)
+    if scaled is None:
+        return None
+    png_bytes, pixel_width, pixel_height = scaled
+
+    image = Image(BytesIO(png_bytes))
     target_width = width_cm * cm
-    scale = target_width / image.imageWidth
     image.drawWidth = target_width
-    image.drawHeight = image.imageHeight * scale
+    image.drawHeight = pixel_height * target_width / pixel_width
     image.hAlign = "LEFT"
     return image
 
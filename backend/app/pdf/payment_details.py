@@ -1,11 +1,12 @@
 from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
 from io import BytesIO, StringIO
 import re
 
 from reportlab.graphics.barcode import qr
 from reportlab.graphics.shapes import Drawing, Rect
 from reportlab.lib import colors
-from reportlab.lib.units import cm
+from reportlab.lib.units import cm, mm
 from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
 
 try:
@@ -27,6 +28,10 @@ except Exception:  # pragma: no cover - optional dependency
 
 from app.core.config import settings
 
+# Bulk runs re-render the same invoices (preview, freeze, ZIP exports); the
+# QR assembly dominated their CPU time.
+_QR_CACHE_SIZE = 512
+
 
 def _clean(value: str | None) -> str:
     if value is None:
@@ -219,6 +224,7 @@ def _build_qrbill_instance(
     return bill
 
 
+@lru_cache(maxsize=_QR_CACHE_SIZE)
 def _build_qr_payload_qrbill(
     *,
     iban: str,
@@ -308,6 +314,78 @@ def _build_qrbill_svg_flowable(
     return drawing
 
 
+@lru_cache(maxsize=_QR_CACHE_SIZE)
+def _qr_modules(payload: str) -> tuple[tuple[tuple[float, float, float, float], ...], float, float]:
+    """
+    Dark module runs (x, y, width, height) of the QR code of `payload`, with
+    the code's width and height, in unscaled QR units.
+
+    The widget re-encodes the payload on every getBounds()/draw() call, so it
+    is drawn once here and only the plain geometry is kept.
+    """
+    qr_code = qr.QrCodeWidget(payload, barLevel="H")
+    modules = tuple(
+        (shape.x, shape.y, shape.width, shape.height)
+        for shape in qr_code.draw().contents
+        if shape.fillColor is not None
+    )
+    return modules, qr_code.barWidth, qr_code.barHeight
+
+
+def _qr_code_with_cross(payload: str, size: float) -> Drawing:
+    """
+    QR code of `payload` with the Swiss cross overlay, `size` points wide.
+
+    Returns a new drawing on every call: flowables are laid out and drawn
+    from several render threads at once, so they are never shared.
+    """
+    modules, width, height = _qr_modules(payload)
+
+    scale = size / width
+    drawing = Drawing(size, size, transform=[scale, 0, 0, scale, 0, 0])
+    for x, y, module_width, module_height in modules:
+        drawing.add(
+            Rect(x, y, module_width, module_height, fillColor=colors.black, strokeColor=None)
+        )
+
+    # Cross in unscaled QR units, centred (7 mm per SIX spec).
+    cross_size = 7 * mm / scale
+    cross_scale = cross_size / 19
+    cross_origin_x = (width - cross_size) / 2
+    cross_origin_y = (height - cross_size) / 2
+    drawing.add(
+        Rect(
+            cross_origin_x,
+            cross_origin_y,
+            cross_size,
+            cross_size,
+            fillColor=colors.black,
+            strokeColor=None,
+        )
+    )
+    drawing.add(
+        Rect(
+            cross_origin_x + 8.3 * cross_scale,
+            cross_origin_y + 4 * cross_scale,
+            3.3 * cross_scale,
+            11 * cross_scale,
+            fillColor=colors.white,
+            strokeColor=None,
+        )
+    )
+    drawing.add(
+        Rect(
+            cross_origin_x + 4.4 * cross_scale,
+            cross_origin_y + 7.9 * cross_scale,
+            11 * cross_scale,
+            3.3 * cross_scale,
+            fillColor=colors.white,
+            strokeColor=None,
+        )
+    )
+    return drawing
+
+
 def build_payment_flowables(
     *,
     amount: Decimal | int | float | str | None,
@@ -418,48 +496,7 @@ def build_payment_flowables(
     # NOTE: We intentionally render the Swiss QR payload via ReportLab's QR widget
     # so we can guarantee the Swiss cross overlay is visible in the PDF.
 
-    qr_code = qr.QrCodeWidget(qr_payload, barLevel="H")
-    bounds = qr_code.getBounds()
-    width = bounds[2] - bounds[0]
-    height = bounds[3] - bounds[1]
-    size = 4.6 * cm
-    drawing = Drawing(size, size, transform=[size / width, 0, 0, size / height, 0, 0])
-    drawing.add(qr_code)
-
-    cross_size = size * (7 / 46)
-    cross_scale = cross_size / 19
-    cross_origin_x = (size - cross_size) / 2
-    cross_origin_y = (size - cross_size) / 2
-    drawing.add(
-        Rect(
-            cross_origin_x,
-            cross_origin_y,
-            cross_size,
-            cross_size,
-            fillColor=colors.black,
-            strokeColor=None,
-        )
-    )
-    drawing.add(
-        Rect(
-            cross_origin_x + 8.3 * cross_scale,
-            cross_origin_y + 4 * cross_scale,
-            3.3 * cross_scale,
-            11 * cross_scale,
-            fillColor=colors.white,
-            strokeColor=None,
-        )
-    )
-    drawing.add(
-        Rect(
-            cross_origin_x + 4.4 * cross_scale,
-            cross_origin_y + 7.9 * cross_scale,
-            11 * cross_scale,
-            3.3 * cross_scale,
-            fillColor=colors.white,
-            strokeColor=None,
-        )
-    )
+    drawing = _qr_code_with_cross(qr_payload, 4.6 * cm)
 
     layout = Table([[text_table, drawing]], colWidths=[12.2 * cm, 4.6 * cm])
     layout.setStyle(
@@ -0,0 +1,276 @@
+"""
+Content-addressed cache for generated and stored PDFs.
+
+Keys never point to different bytes, so entries are never invalidated:
+- stored (frozen) PDFs are keyed by the pdf_sha256 recorded when freezing;
+- rendered PDFs by a digest of the builder, the PDF template sources and the
+  builder keyword arguments (render_key); changed inputs make a new key.
+
+Tiers: a local disk directory bounded to PDF_CACHE_MAX_BYTES (least recently
+used files are evicted first), backed for immutable documents by the
+PDF_CACHE_BUCKET Supabase storage bucket so other instances and restarts
+reuse the renders.
+"""
+
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+from typing import Callable
+
+from app.core.config import settings
+from app.storage.supabase_storage import download_file_bytes, download_many, upload_pdf_bytes
+
+logger = logging.getLogger(__name__)
+
+_TEMPLATE_DIR = Path(__file__).resolve().parent
+# Invoices carry names, addresses and amounts: owner-only, even in the
+# shared temp dir.
+_DIR_MODE = 0o700
+_FILE_MODE = 0o600
+
+
+@lru_cache(maxsize=1)
+def _templates_digest() -> str:
+    # Any change to the PDF builders (new deploy) yields new render keys.
+    digest = hashlib.sha256()
+    for path in sorted(_TEMPLATE_DIR.glob("*.py")):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (date, Decimal)):
+        return str(value)
+    return value
+
+
+def render_key(cache_id: str, builder: Callable, kwargs: dict) -> str:
+    """
+    Key of the PDF `builder(**kwargs)` renders for document `cache_id`
+    (e.g. "city_invoice/<city id>").
+    """
+    payload = json.dumps(
+        [f"{builder.__module__}.{builder.__qualname__}", _templates_digest(), _canonical(kwargs)],
+        sort_keys=True,
+        default=str,
+    )
+    return f"{cache_id}/{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class _DiskTier:
+    """
+    Files under `root`, one per key. The index is rebuilt from the directory
+    (oldest modification first) on first use; hits touch the file so the
+    order survives restarts.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, int] | None = None
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.pdf"
+
+    def open_root(self) -> bool:
+        """
+        Create the root owner-only; False if it belongs to another user (a
+        directory planted in the shared temp dir), which disables the tier.
+        """
+        try:
+            self.root.mkdir(mode=_DIR_MODE, parents=True, exist_ok=True)
+            if hasattr(os, "getuid") and self.root.stat().st_uid != os.getuid():
+                logger.warning("PDF cache dir %s is owned by another user; disk cache disabled", self.root)
+                return False
+            os.chmod(self.root, _DIR_MODE)
+        except OSError as exc:
+            logger.warning("PDF cache dir %s unusable: %s", self.root, exc)
+            return False
+        return True
+
+    def _make_dirs(self, directory: Path) -> None:
+        # mkdir(parents=True) would create the intermediate levels with the
+        # default mode.
+        current = self.root
+        for part in directory.relative_to(self.root).parts:
+            current = current / part
+            current.mkdir(mode=_DIR_MODE, exist_ok=True)
+
+    def _index(self) -> OrderedDict[str, int]:
+        if self._entries is None:
+            found = []
+            for path in self.root.rglob("*.pdf"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                key = path.relative_to(self.root).as_posix()[: -len(".pdf")]
+                found.append((stat.st_mtime, key, stat.st_size))
+            found.sort()
+            self._entries = OrderedDict((key, size) for _mtime, key, size in found)
+            self._total = sum(self._entries.values())
+        return self._entries
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            entries = self._index()
+            if key in entries:
+                entries.move_to_end(key)
+            else:
+                entries[key] = len(data)
+                self._total += len(data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self._make_dirs(path.parent)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, _FILE_MODE)
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("PDF cache write failed for %s: %s", key, exc)
+            return
+        evicted = []
+        with self._lock:
+            entries = self._index()
+            self._total -= entries.pop(key, 0)
+            entries[key] = len(data)
+            self._total += len(data)
+            while self._total > self.max_bytes and entries:
+                old_key, size = entries.popitem(last=False)
+                self._total -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                self._path(old_key).unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._index()
+            return {
+                "entries": len(entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_disk: _DiskTier | bool | None = None
+_disk_lock = threading.Lock()
+
+
+def _disk_tier() -> _DiskTier | None:
+    global _disk
+    if settings.PDF_CACHE_MAX_BYTES <= 0:
+        return None
+    if _disk is None:
+        with _disk_lock:
+            if _disk is None:
+                root = settings.PDF_CACHE_DIR or os.path.join(tempfile.gettempdir(), "dringdring-pdf-cache")
+                disk = _DiskTier(Path(root), settings.PDF_CACHE_MAX_BYTES)
+                # An unusable root is not retried: the tier stays off.
+                _disk = disk if disk.open_root() else False
+    return _disk or None
+
+
+def get(key: str, *, remote: bool = False) -> bytes | None:
+    disk = _disk_tier()
+    data = disk.get(key) if disk else None
+    if data is None and remote:
+        try:
+            data = download_file_bytes(bucket=settings.PDF_CACHE_BUCKET, path=f"{key}.pdf")
+        except RuntimeError:
+            return None
+        if disk:
+            disk.put(key, data)
+    return data
+
+
+def put(key: str, data: bytes, *, remote: bool = False) -> None:
+    disk = _disk_tier()
+    if disk:
+        disk.put(key, data)
+    if remote:
+        try:
+            upload_pdf_bytes(bucket=settings.PDF_CACHE_BUCKET, path=f"{key}.pdf", data=data)
+        except RuntimeError as exc:
+            logger.warning("PDF cache upload failed for %s: %s", key, exc)
+
+
+def fetch_stored_pdf(*, bucket: str, path: str, sha256: str | None) -> bytes:
+    """
+    Frozen PDF from storage, served from the disk tier when its recorded hash
+    is known. Raises RuntimeError like download_file_bytes.
+    """
+    disk = _disk_tier() if sha256 else None
+    key = f"sha256/{sha256}"
+    if disk:
+        data = disk.get(key)
+        if data is not None:
+            return data
+    data = download_file_bytes(bucket=bucket, path=path)
+    if disk and hashlib.sha256(data).hexdigest() == sha256:
+        disk.put(key, data)
+    return data
+
+
+def fetch_stored_pdfs(*, bucket: str, entries: list[tuple[str, str | None]]) -> list[bytes | RuntimeError]:
+    """
+    fetch_stored_pdf() for several (path, sha256) entries, the storage
+    downloads running concurrently. Returns, in order, the bytes of each PDF
+    or the RuntimeError it failed with.
+    """
+    disk = _disk_tier()
+    results: list[bytes | RuntimeError | None] = [
+        disk.get(f"sha256/{sha256}") if disk and sha256 else None
+        for _path, sha256 in entries
+    ]
+    missing = [index for index, data in enumerate(results) if data is None]
+    downloads = download_many([(bucket, entries[index][0]) for index in missing])
+    for index, data in zip(missing, downloads):
+        sha256 = entries[index][1]
+        if disk and sha256 and isinstance(data, bytes) and hashlib.sha256(data).hexdigest() == sha256:
+            disk.put(f"sha256/{sha256}", data)
+        results[index] = data
+    return results
+
+
+def get_pdf_cache_stats() -> dict:
+    disk = _disk_tier()
+    return disk.stats() if disk else {"enabled": False}
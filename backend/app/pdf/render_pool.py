@@ -0,0 +1,302 @@
+"""
+Process pool rendering the PDFs of the multi-document ZIP exports.
+
+ReportLab is pure Python and holds the GIL, so rendering a region one document
+after the other keeps a single core (and a uvicorn worker) busy for minutes.
+Routes fetch the rows in the request thread, describe each document as a
+RenderJob (module-level builder + picklable keyword arguments) and iterate
+render_jobs(), which renders them across PDF_RENDER_WORKERS processes and
+returns the bytes in submission order.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
+from io import BytesIO
+from multiprocessing.queues import Queue as ProcessQueue
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator
+
+from app.core.config import settings
+from app.pdf import pdf_cache
+
+logger = logging.getLogger(__name__)
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+# Render timeouts run from the moment a worker picks a document up, not from
+# submission: documents may wait behind other exports' documents. Workers
+# report the job id they start on their pool's queue, the parent records
+# when it sees it.
+_START_POLL_SECONDS = 0.25
+_start_queues: dict[ProcessPoolExecutor, ProcessQueue] = {}
+_started_at: dict[int, float | None] = {}
+_started_lock = threading.Lock()
+_job_ids = itertools.count()
+
+# Worker side
+_worker_start_queue: ProcessQueue | None = None
+
+
+@dataclass(frozen=True)
+class RenderJob:
+    """
+    One document to render. `name` labels the ERROR_{name}.txt entry written
+    when rendering fails, `filename` is the archive entry of the PDF. Jobs
+    carrying `pdf_bytes` (a stored PDF) are passed through in order unrendered.
+    With a `cache_id` (e.g. "city_invoice/<id>") renders go through the PDF
+    cache; `cache_remote` also stores them in the storage tier, for documents
+    whose inputs are frozen.
+    """
+
+    name: str
+    filename: str
+    builder: Callable[..., BytesIO] | None = None
+    kwargs: dict = field(default_factory=dict)
+    pdf_bytes: bytes | None = None
+    cache_id: str | None = None
+    cache_remote: bool = False
+
+
+class PdfRenderTimeout(RuntimeError):
+    pass
+
+
+def _render(builder: Callable[..., BytesIO], kwargs: dict) -> bytes:
+    return builder(**kwargs).getvalue()
+
+
+def _init_worker(start_queue: ProcessQueue) -> None:
+    global _worker_start_queue
+    _worker_start_queue = start_queue
+
+
+def _render_in_worker(job_id: int, builder: Callable[..., BytesIO], kwargs: dict) -> bytes:
+    _worker_start_queue.put(job_id)
+    return _render(builder, kwargs)
+
+
+def _cache_key(job: RenderJob) -> str | None:
+    if job.cache_id is None or job.pdf_bytes is not None:
+        return None
+    return pdf_cache.render_key(job.cache_id, job.builder, job.kwargs)
+
+
+def _from_cache(job: RenderJob) -> RenderJob:
+    key = _cache_key(job)
+    if key is None:
+        return job
+    cached = pdf_cache.get(key, remote=job.cache_remote)
+    return job if cached is None else replace(job, pdf_bytes=cached)
+
+
+def _to_cache(job: RenderJob, pdf_bytes: bytes) -> None:
+    key = _cache_key(job)
+    if key is not None:
+        pdf_cache.put(key, pdf_bytes, remote=job.cache_remote)
+
+
+def render_one(job: RenderJob) -> bytes:
+    """
+    Render a single job in the calling thread, through the PDF cache.
+    """
+    job = _from_cache(job)
+    if job.pdf_bytes is not None:
+        return job.pdf_bytes
+    pdf_bytes = _render(job.builder, job.kwargs)
+    _to_cache(job, pdf_bytes)
+    return pdf_bytes
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is not None:
+        return _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that runs the DB pool threads is unsafe.
+            context = multiprocessing.get_context("spawn")
+            # One queue per pool: a terminated worker may leave it locked.
+            start_queue = context.Queue()
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PDF_RENDER_WORKERS,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(start_queue,),
+            )
+            _start_queues[_executor] = start_queue
+    return _executor
+
+
+def _retire_executor(executor: ProcessPoolExecutor) -> None:
+    """
+    Replace a pool whose worker hung or died. A worker cannot be interrupted
+    mid-document, so its processes are terminated; documents of concurrent
+    exports still running on it come back as errors.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+        _start_queues.pop(executor, None)
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    logger.warning("PDF render pool retired (%s workers terminated)", len(processes))
+
+
+def shutdown_render_pool() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+        _start_queues.pop(executor, None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(executor: ProcessPoolExecutor, job: RenderJob) -> tuple:
+    job_id = next(_job_ids)
+    with _started_lock:
+        _started_at[job_id] = None
+    try:
+        return executor.submit(_render_in_worker, job_id, job.builder, job.kwargs), job_id
+    except BaseException:
+        _forget(job_id)
+        raise
+
+
+def _forget(job_id: int) -> None:
+    with _started_lock:
+        _started_at.pop(job_id, None)
+
+
+def _start_time(executor: ProcessPoolExecutor, job_id: int) -> float | None:
+    """
+    When a worker of `executor` started job `job_id`, None while it is queued.
+    """
+    start_queue = _start_queues.get(executor)
+    with _started_lock:
+        while start_queue is not None:
+            try:
+                started_id = start_queue.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            # Late reports of abandoned jobs are dropped.
+            if started_id in _started_at and _started_at[started_id] is None:
+                _started_at[started_id] = time.monotonic()
+        return _started_at.get(job_id)
+
+
+def _result(future, executor: ProcessPoolExecutor, job_id: int, timeout: float) -> bytes:
+    """
+    Wait for a pooled render; FutureTimeoutError once it has been rendering
+    for `timeout` seconds. Queued time does not count.
+    """
+    while True:
+        started = _start_time(executor, job_id)
+        wait = _START_POLL_SECONDS if started is None else started + timeout - time.monotonic()
+        try:
+            return future.result(timeout=max(wait, 0.0))
+        except FutureTimeoutError:
+            if started is not None:
+                raise
+
+
+def _render_inline(jobs: Iterable[RenderJob]) -> Iterator[tuple[RenderJob, bytes | None, Exception | None]]:
+    for job in jobs:
+        try:
+            pdf_bytes = render_one(job)
+        except Exception as exc:
+            yield job, None, exc
+        else:
+            yield job, pdf_bytes, None
+
+
+def render_jobs(jobs: Iterable[RenderJob]) -> Iterator[tuple[RenderJob, bytes | None, Exception | None]]:
+    """
+    Yield (job, pdf_bytes, None) or (job, None, error) for each job, in order.
+
+    `jobs` is consumed lazily: at most PDF_RENDER_MAX_PENDING documents are in
+    flight, so a generator fetching rows per document overlaps the queries
+    with rendering without holding a whole region in memory. Each document
+    gets PDF_RENDER_TIMEOUT_SECONDS once a worker starts it; only a document
+    overrunning that retires the pool. PDF_RENDER_WORKERS=0 renders in the
+    calling thread.
+    """
+    if settings.PDF_RENDER_WORKERS <= 0:
+        yield from _render_inline(jobs)
+        return
+
+    timeout = settings.PDF_RENDER_TIMEOUT_SECONDS
+    max_pending = max(settings.PDF_RENDER_MAX_PENDING, 1)
+    executor = _get_executor()
+    hung: set[ProcessPoolExecutor] = set()
+    pending: deque = deque()
+    remaining = iter(jobs)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                job = next(remaining, None)
+                if job is None:
+                    exhausted = True
+                    break
+                job = _from_cache(job)
+                if job.pdf_bytes is not None:
+                    pending.append((job, None, None, None))
+                    continue
+                try:
+                    future, job_id = _submit(executor, job)
+                except BrokenProcessPool:
+                    _retire_executor(executor)
+                    executor = _get_executor()
+                    future, job_id = _submit(executor, job)
+                pending.append((job, future, executor, job_id))
+            if not pending:
+                return
+
+            job, future, owner, job_id = pending.popleft()
+            if future is None:
+                yield job, job.pdf_bytes, None
+                continue
+            try:
+                pdf_bytes = _result(future, owner, job_id, timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                # Retired once the batch is done so the other workers finish their documents.
+                hung.add(owner)
+                yield job, None, PdfRenderTimeout(f"PDF rendering timed out after {timeout:g}s")
+            except BrokenProcessPool as exc:
+                # Every document still queued on that pool fails the same way.
+                if owner is executor:
+                    _retire_executor(owner)
+                    executor = _get_executor()
+                yield job, None, exc
+            except Exception as exc:
+                yield job, None, exc
+            else:
+                _to_cache(job, pdf_bytes)
+                yield job, pdf_bytes, None
+            finally:
+                _forget(job_id)
+    finally:
+        for _job, future, owner, job_id in pending:
+            if future is None:
+                continue
+            if not future.cancel() and not future.done():
+                # Abandoned export: still retire a pool stuck on its document.
+                started = _start_time(owner, job_id)
+                if started is not None and time.monotonic() - started > timeout:
+                    hung.add(owner)
+            _forget(job_id)
+        for owner in hung:
+            _retire_executor(owner)
@@ -17,8 +17,7 @@ import re
 from reportlab.lib.units import mm
 from reportlab.lib import colors
 from reportlab.pdfgen import canvas as pdf_canvas
-from reportlab.graphics.barcode import qr
-from reportlab.graphics.shapes import Drawing, Rect
+from reportlab.graphics.shapes import Drawing
 
 # Import QR data generation from existing module
 from app.pdf.payment_details import (
@@ -26,6 +25,7 @@ from app.pdf.payment_details import (
     _clean_iban,
     _format_amount,
     _build_qr_payload_qrbill,
+    _qr_code_with_cross,
 )
 
 
@@ -106,62 +106,10 @@ def _generate_qr_code_with_cross(qr_data: str, size: float) -> Drawing:
         size: Size of the QR code in points
         
     Returns:
-        ReportLab Drawing with QR code and Swiss Cross
+        ReportLab Drawing with QR code and Swiss Cross (a new drawing on
+        every call; the QR modules are cached per payload)
     """
-    # Create QR code widget
-    qr_code = qr.QrCodeWidget(qr_data, barLevel="H")
-    bounds = qr_code.getBounds()
-    width = bounds[2] - bounds[0]
-    height = bounds[3] - bounds[1]
-    
-    # Create drawing with proper scaling
-    scale = size / width
-    drawing = Drawing(size, size, transform=[scale, 0, 0, scale, 0, 0])
-    drawing.add(qr_code)
-    
-    # Add Swiss Cross overlay (work in unscaled QR units)
-    cross_size = SWISS_CROSS_SIZE / scale
-    cross_scale = cross_size / 19  # Standard cross proportions
-    cross_origin_x = (width - cross_size) / 2
-    cross_origin_y = (height - cross_size) / 2
-    
-    # Black square background
-    drawing.add(
-        Rect(
-            cross_origin_x,
-            cross_origin_y,
-            cross_size,
-            cross_size,
-            fillColor=colors.black,
-            strokeColor=None,
-        )
-    )
-    
-    # White cross (vertical bar)
-    drawing.add(
-        Rect(
-            cross_origin_x + 8.3 * cross_scale,
-            cross_origin_y + 4 * cross_scale,
-            3.3 * cross_scale,
-            11 * cross_scale,
-            fillColor=colors.white,
-            strokeColor=None,
-        )
-    )
-    
-    # White cross (horizontal bar)
-    drawing.add(
-        Rect(
-            cross_origin_x + 4.4 * cross_scale,
-            cross_origin_y + 7.9 * cross_scale,
-            11 * cross_scale,
-            3.3 * cross_scale,
-            fillColor=colors.white,
-            strokeColor=None,
-        )
-    )
-    
-    return drawing
+    return _qr_code_with_cross(qr_data, size)
 
 
 # ============================================================================
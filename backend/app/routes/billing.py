@@ -1,8 +1,6 @@
 from datetime import date, datetime
-import csv
 import hashlib
 import io
-import zipfile
 import re
 
 from fastapi import APIRouter, Depends, Query, HTTPException
@@ -15,9 +13,15 @@ from app.schemas.me import MeResponse
 from app.core.billing_processing import freeze_shop_billing_period
 from app.core.billing_reference import generate_reference
 from app.core.billing_aggregator import aggregate_billing_run
+from app.core.jobs import register_job_kind, submit_job
 from app.core.config import settings
+from app.core.csv_stream import CsvStream
+from app.core.zip_stream import ZipStream
 from app.pdf.invoice_qr_bill import build_recipient_invoice_with_qr_bill
-from app.storage.supabase_storage import download_file_bytes, upload_pdf_bytes
+from app.pdf.logo import load_storage_logo
+from app.pdf.pdf_cache import fetch_stored_pdf
+from app.pdf.render_pool import RenderJob, render_jobs, render_one
+from app.storage.supabase_storage import upload_pdf_bytes
 
 router = APIRouter(prefix="/billing", tags=["billing"])
 
@@ -69,151 +73,234 @@ def _safe_pdf_filename(value: str | None, fallback: str) -> str:
     return f"{base}.pdf"
 
 
-def _build_billing_document_pdf_bytes(document_id: str, preview: int, jwt_claims: str) -> tuple[bytes, str]:
-    with get_db_connection(jwt_claims) as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    d.id,
-                    d.recipient_type,
-                    d.recipient_id,
-                    d.period_month,
-                    d.amount_ttc,
-                    d.vat_rate,
-                    d.status,
-                    d.pdf_url,
-                    d.recipient_name_snapshot,
-                    d.recipient_street_snapshot,
-                    d.recipient_house_num_snapshot,
-                    d.recipient_postal_code_snapshot,
-                    d.recipient_city_snapshot,
-                    d.recipient_country_snapshot,
-                    CASE
-                        WHEN d.recipient_type = 'INTERNAL' THEN COALESCE(ar.billing_name, ar.name, 'Association')
-                        ELSE COALESCE(h.name, c.name, s.name, 'Destinataire')
-                    END AS recipient_name,
-                    h.address, h.contact_person, h.email, h.phone,
-                    c.address, c.contact_person, c.email, c.phone,
-                    s.address, s.contact_person, s.email, s.phone,
-                    c.id AS city_id,
-                    s.city_id AS shop_city_id,
-                    r.admin_region_id,
-                    ar.billing_name,
-                    ar.billing_iban,
-                    ar.billing_street,
-                    ar.billing_house_num,
-                    ar.billing_postal_code,
-                    ar.billing_city,
-                    ar.billing_country,
-                    ar.address,
-                    ar.internal_billing_name,
-                    ar.internal_billing_iban,
-                    ar.internal_billing_street,
-                    ar.internal_billing_house_num,
-                    ar.internal_billing_postal_code,
-                    ar.internal_billing_city,
-                    ar.internal_billing_country,
-                    ar.internal_billing_logo_path,
-                    ar.billing_logo_path,
-                    d.creditor_name_snapshot,
-                    d.creditor_iban_snapshot,
-                    d.creditor_street_snapshot,
-                    d.creditor_house_num_snapshot,
-                    d.creditor_postal_code_snapshot,
-                    d.creditor_city_snapshot,
-                    d.creditor_country_snapshot,
-                    d.reference_snapshot,
-                    d.payment_message_snapshot
-                FROM billing_document d
-                JOIN billing_run r ON r.id = d.run_id
-                JOIN admin_region ar ON ar.id = r.admin_region_id
-                LEFT JOIN hq h ON d.recipient_type = 'HQ' AND h.id = d.recipient_id
-                LEFT JOIN city c ON d.recipient_type = 'COMMUNE' AND c.id = d.recipient_id
-                LEFT JOIN shop s ON d.recipient_type = 'SHOP_INDEP' AND s.id = d.recipient_id
-                WHERE d.id = %s
-                """,
-                (document_id,),
+_BILLING_DOCUMENT_BATCH_SIZE = 100
+
+_BILLING_DOCUMENT_SELECT = """
+    SELECT
+        d.id::text,
+        d.recipient_type,
+        d.recipient_id,
+        d.period_month,
+        d.amount_ttc,
+        d.vat_rate,
+        d.status,
+        d.pdf_url,
+        d.recipient_name_snapshot,
+        d.recipient_street_snapshot,
+        d.recipient_house_num_snapshot,
+        d.recipient_postal_code_snapshot,
+        d.recipient_city_snapshot,
+        d.recipient_country_snapshot,
+        CASE
+            WHEN d.recipient_type = 'INTERNAL' THEN COALESCE(ar.billing_name, ar.name, 'Association')
+            ELSE COALESCE(h.name, c.name, s.name, 'Destinataire')
+        END AS recipient_name,
+        h.address, h.contact_person, h.email, h.phone,
+        c.address, c.contact_person, c.email, c.phone,
+        s.address, s.contact_person, s.email, s.phone,
+        c.id AS city_id,
+        s.city_id AS shop_city_id,
+        r.admin_region_id,
+        ar.billing_name,
+        ar.billing_iban,
+        ar.billing_street,
+        ar.billing_house_num,
+        ar.billing_postal_code,
+        ar.billing_city,
+        ar.billing_country,
+        ar.address,
+        ar.internal_billing_name,
+        ar.internal_billing_iban,
+        ar.internal_billing_street,
+        ar.internal_billing_house_num,
+        ar.internal_billing_postal_code,
+        ar.internal_billing_city,
+        ar.internal_billing_country,
+        ar.internal_billing_logo_path,
+        ar.billing_logo_path,
+        d.creditor_name_snapshot,
+        d.creditor_iban_snapshot,
+        d.creditor_street_snapshot,
+        d.creditor_house_num_snapshot,
+        d.creditor_postal_code_snapshot,
+        d.creditor_city_snapshot,
+        d.creditor_country_snapshot,
+        d.reference_snapshot,
+        d.payment_message_snapshot,
+        CASE
+            WHEN d.recipient_type = 'COMMUNE' THEN (
+                SELECT cp.postal_code
+                FROM city_postal_code cp
+                WHERE cp.city_id = c.id
+                ORDER BY cp.postal_code
+                LIMIT 1
             )
-            doc = cur.fetchone()
-            if not doc:
-                raise HTTPException(status_code=404, detail="Billing document not found")
-
-            (
-                _doc_id,
-                recipient_type,
-                recipient_id,
-                period_month,
-                amount_ttc,
-                vat_rate,
-                status,
-                pdf_url,
-                recipient_name_snapshot,
-                recipient_street_snapshot,
-                recipient_house_num_snapshot,
-                recipient_postal_code_snapshot,
-                recipient_city_snapshot,
-                recipient_country_snapshot,
-                recipient_name_fallback,
-                hq_address,
-                hq_contact,
-                hq_email,
-                hq_phone,
-                city_address,
-                city_contact,
-                city_email,
-                city_phone,
-                shop_address,
-                shop_contact,
-                shop_email,
-                shop_phone,
-                city_id,
-                shop_city_id,
-                admin_region_id,
-                billing_name,
-                billing_iban,
-                billing_street,
-                billing_house_num,
-                billing_postal_code,
-                billing_city,
-                billing_country,
-                admin_region_address,
-                internal_billing_name,
-                internal_billing_iban,
-                internal_billing_street,
-                internal_billing_house_num,
-                internal_billing_postal_code,
-                internal_billing_city,
-                internal_billing_country,
-                internal_billing_logo_path,
-                billing_logo_path,
-                creditor_name_snapshot,
-                creditor_iban_snapshot,
-                creditor_street_snapshot,
-                creditor_house_num_snapshot,
-                creditor_postal_code_snapshot,
-                creditor_city_snapshot,
-                creditor_country_snapshot,
-                reference_snapshot,
-                payment_message_snapshot,
-            ) = doc
+        END AS commune_postal_code,
+        c.name AS commune_city_name,
+        sc.name AS shop_city_name,
+        d.pdf_sha256
+    FROM billing_document d
+    JOIN billing_run r ON r.id = d.run_id
+    JOIN admin_region ar ON ar.id = r.admin_region_id
+    LEFT JOIN hq h ON d.recipient_type = 'HQ' AND h.id = d.recipient_id
+    LEFT JOIN city c ON d.recipient_type = 'COMMUNE' AND c.id = d.recipient_id
+    LEFT JOIN shop s ON d.recipient_type = 'SHOP_INDEP' AND s.id = d.recipient_id
+    LEFT JOIN city sc ON sc.id = s.city_id
+    WHERE d.id = ANY(%s::uuid[])
+"""
+
+
+def _fetch_billing_document_headers(cur, document_ids: list[str]) -> dict[str, tuple]:
+    cur.execute(_BILLING_DOCUMENT_SELECT, (document_ids,))
+    return {row[0]: row for row in cur.fetchall()}
+
+
+def _fetch_billing_document_lines(cur, document_ids: list[str]) -> dict[str, list[tuple]]:
+    lines: dict[str, list[tuple]] = {document_id: [] for document_id in document_ids}
+    if not document_ids:
+        return lines
+    cur.execute(
+        """
+        SELECT
+            l.document_id::text,
+            (l.meta->>'delivery_date')::date,
+            l.meta->>'shop_name',
+            l.meta->>'client_name',
+            l.meta->>'commune_name',
+            l.meta->>'bags',
+            l.amount_due
+        FROM billing_document_line l
+        WHERE l.document_id = ANY(%s::uuid[])
+        ORDER BY l.document_id, (l.meta->>'delivery_date')::date
+        """,
+        (document_ids,),
+    )
+    for document_id, *row in cur.fetchall():
+        lines[document_id].append(tuple(row))
+    return lines
 
-            cur.execute(
-                """
-                SELECT
-                    (l.meta->>'delivery_date')::date,
-                    l.meta->>'shop_name',
-                    l.meta->>'client_name',
-                    l.meta->>'commune_name',
-                    l.meta->>'bags',
-                    l.amount_due
-                FROM billing_document_line l
-                WHERE l.document_id = %s
-                ORDER BY (l.meta->>'delivery_date')::date
-                """,
-                (document_id,),
-            )
-            rows = cur.fetchall()
+
+def _has_stored_pdf(doc: tuple, preview: int) -> bool:
+    status, pdf_url = doc[6], doc[7]
+    return bool(not preview and status == "frozen" and pdf_url)
+
+
+def _iter_billing_document_plans(document_ids: list[str], preview: int, jwt_claims: str):
+    """
+    Yield (document_id, plan, None) or (document_id, None, error) for each
+    document, in order. Documents are loaded _BILLING_DOCUMENT_BATCH_SIZE at a
+    time: one query for the headers (creditor data and address fallbacks
+    included) and one for the lines of the documents to render. No
+    connection is held between batches.
+    """
+    for start in range(0, len(document_ids), _BILLING_DOCUMENT_BATCH_SIZE):
+        batch = document_ids[start:start + _BILLING_DOCUMENT_BATCH_SIZE]
+        with get_db_connection(jwt_claims) as conn:
+            with conn.cursor() as cur:
+                headers = _fetch_billing_document_headers(cur, batch)
+                lines = _fetch_billing_document_lines(
+                    cur,
+                    [doc_id for doc_id, doc in headers.items() if not _has_stored_pdf(doc, preview)],
+                )
+        for document_id in batch:
+            doc = headers.get(document_id)
+            if doc is None:
+                yield document_id, None, HTTPException(status_code=404, detail="Billing document not found")
+                continue
+            try:
+                plan = _plan_billing_document_pdf(
+                    document_id, doc, lines.get(document_id), preview, jwt_claims
+                )
+            except Exception as exc:
+                yield document_id, None, exc
+            else:
+                yield document_id, plan, None
+
+
+def _prepare_billing_document_pdf(document_id: str, preview: int, jwt_claims: str) -> dict:
+    _document_id, plan, error = next(_iter_billing_document_plans([document_id], preview, jwt_claims))
+    if error is not None:
+        raise error
+    return plan
+
+
+def _plan_billing_document_pdf(
+    document_id: str,
+    doc: tuple,
+    rows: list[tuple] | None,
+    preview: int,
+    jwt_claims: str,
+) -> dict:
+    """
+    Everything needed to render one billing document. Returns the archive
+    filename, the stored PDF when it can be reused ("pdf_bytes"), otherwise
+    the keyword arguments of build_recipient_invoice_with_qr_bill
+    ("render_kwargs") and the storage path to persist the result to
+    ("pdf_path", None for previews). `rows` is None when the stored PDF was
+    expected; the lines are then only fetched if its download fails.
+    """
+    (
+        _doc_id,
+        recipient_type,
+        recipient_id,
+        period_month,
+        amount_ttc,
+        vat_rate,
+        status,
+        pdf_url,
+        recipient_name_snapshot,
+        recipient_street_snapshot,
+        recipient_house_num_snapshot,
+        recipient_postal_code_snapshot,
+        recipient_city_snapshot,
+        recipient_country_snapshot,
+        recipient_name_fallback,
+        hq_address,
+        hq_contact,
+        hq_email,
+        hq_phone,
+        city_address,
+        city_contact,
+        city_email,
+        city_phone,
+        shop_address,
+        shop_contact,
+        shop_email,
+        shop_phone,
+        city_id,
+        shop_city_id,
+        admin_region_id,
+        billing_name,
+        billing_iban,
+        billing_street,
+        billing_house_num,
+        billing_postal_code,
+        billing_city,
+        billing_country,
+        admin_region_address,
+        internal_billing_name,
+        internal_billing_iban,
+        internal_billing_street,
+        internal_billing_house_num,
+        internal_billing_postal_code,
+        internal_billing_city,
+        internal_billing_country,
+        internal_billing_logo_path,
+        billing_logo_path,
+        creditor_name_snapshot,
+        creditor_iban_snapshot,
+        creditor_street_snapshot,
+        creditor_house_num_snapshot,
+        creditor_postal_code_snapshot,
+        creditor_city_snapshot,
+        creditor_country_snapshot,
+        reference_snapshot,
+        payment_message_snapshot,
+        commune_postal_code,
+        commune_city_name,
+        shop_city_name,
+        pdf_sha256,
+    ) = doc
 
     recipient_label = {
         "COMMUNE": "Commune partenaire",
@@ -236,29 +323,10 @@ def _build_billing_document_pdf_bytes(document_id: str, preview: int, jwt_claims
         fallback_postal_code = billing_postal_code
         fallback_city = billing_city
     elif recipient_type == "COMMUNE" and city_id:
-        with get_db_connection(jwt_claims) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT postal_code
-                    FROM city_postal_code
-                    WHERE city_id = %s
-                    ORDER BY postal_code
-                    LIMIT 1
-                    """,
-                    (city_id,),
-                )
-                row = cur.fetchone()
-                fallback_postal_code = row[0] if row else None
-                cur.execute("SELECT name FROM city WHERE id = %s", (city_id,))
-                row = cur.fetchone()
-                fallback_city = row[0] if row else None
+        fallback_postal_code = commune_postal_code
+        fallback_city = commune_city_name
     elif recipient_type == "SHOP_INDEP" and shop_city_id:
-        with get_db_connection(jwt_claims) as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT name FROM city WHERE id = %s", (shop_city_id,))
-                row = cur.fetchone()
-                fallback_city = row[0] if row else None
+        fallback_city = shop_city_name
 
     if not is_internal and billing_street is None and admin_region_address:
         billing_street, billing_house_num = _split_address(admin_region_address)
@@ -278,12 +346,16 @@ def _build_billing_document_pdf_bytes(document_id: str, preview: int, jwt_claims
 
     filename = f"facture-{recipient_label}-{recipient_name}-{period_month.strftime('%Y-%m')}.pdf"
     filename = filename.replace(" ", "_")
-    if not preview and status == "frozen" and pdf_url:
+    if _has_stored_pdf(doc, preview):
         try:
-            pdf_bytes = download_file_bytes(bucket="billing-pdf", path=pdf_url)
-            return pdf_bytes, filename
+            pdf_bytes = fetch_stored_pdf(bucket="billing-pdf", path=pdf_url, sha256=pdf_sha256)
+            return {"filename": filename, "pdf_bytes": pdf_bytes}
         except RuntimeError:
             pdf_bytes = None
+    if rows is None:
+        with get_db_connection(jwt_claims) as conn:
+            with conn.cursor() as cur:
+                rows = _fetch_billing_document_lines(cur, [document_id])[document_id]
 
     creditor_name = creditor_name_snapshot or (internal_billing_name if is_internal else billing_name)
     creditor_iban = creditor_iban_snapshot or (internal_billing_iban if is_internal else billing_iban)
@@ -329,14 +401,9 @@ def _build_billing_document_pdf_bytes(document_id: str, preview: int, jwt_claims
     payment_message = payment_message_snapshot or f"Facturation DringDring {period_month.strftime('%Y-%m')}"
 
     logo_path = internal_billing_logo_path if is_internal else billing_logo_path
-    logo_bytes = None
-    if logo_path:
-        try:
-            logo_bytes = download_file_bytes(bucket="billing-logos", path=logo_path)
-        except RuntimeError:
-            logo_bytes = None
+    logo_bytes = load_storage_logo(logo_path)
 
-    buffer = build_recipient_invoice_with_qr_bill(
+    render_kwargs = dict(
         recipient_label=recipient_label,
         recipient_name=recipient_name,
         recipient_street=debtor_street,
@@ -358,29 +425,88 @@ def _build_billing_document_pdf_bytes(document_id: str, preview: int, jwt_claims
         creditor_country=creditor_country if has_billing_override else None,
         logo_bytes=logo_bytes,
     )
-    buffer.seek(0)
-    pdf_bytes = buffer.getvalue()
-
+    pdf_path = None
     if not preview:
-        pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
         pdf_path = pdf_url or f"billing-documents/{period_month.strftime('%Y-%m')}/{document_id}.pdf"
-        upload_pdf_bytes(bucket="billing-pdf", path=pdf_path, data=pdf_bytes)
-        with get_db_connection(jwt_claims) as conn:
-            with conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        UPDATE billing_document
-                        SET pdf_url = %s,
-                            pdf_sha256 = %s,
-                            pdf_generated_at = now(),
-                            status = 'frozen'
-                        WHERE id = %s
-                        """,
-                        (pdf_path, pdf_hash, document_id),
-                    )
-
-    return pdf_bytes, filename
+    return {
+        "filename": filename,
+        "pdf_bytes": None,
+        "render_kwargs": render_kwargs,
+        "pdf_path": pdf_path,
+        # Renders from frozen snapshots (or about to be frozen) never change.
+        "cache_remote": not preview or status == "frozen",
+    }
+
+
+def _store_billing_document_pdf(document_id: str, pdf_path: str, pdf_bytes: bytes, jwt_claims: str) -> None:
+    pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    upload_pdf_bytes(bucket="billing-pdf", path=pdf_path, data=pdf_bytes)
+    with get_db_connection(jwt_claims) as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE billing_document
+                    SET pdf_url = %s,
+                        pdf_sha256 = %s,
+                        pdf_generated_at = now(),
+                        status = 'frozen'
+                    WHERE id = %s
+                    """,
+                    (pdf_path, pdf_hash, document_id),
+                )
+
+
+def _billing_render_job(document_id: str, filename: str, plan: dict) -> RenderJob:
+    return RenderJob(
+        name=document_id,
+        filename=filename,
+        builder=build_recipient_invoice_with_qr_bill,
+        kwargs=plan.get("render_kwargs") or {},
+        pdf_bytes=plan["pdf_bytes"],
+        cache_id=f"billing_document/{document_id}",
+        cache_remote=plan.get("cache_remote", False),
+    )
+
+
+def _build_billing_document_pdf_bytes(document_id: str, preview: int, jwt_claims: str) -> tuple[bytes, str]:
+    plan = _prepare_billing_document_pdf(document_id, preview, jwt_claims)
+    if plan["pdf_bytes"] is not None:
+        return plan["pdf_bytes"], plan["filename"]
+    pdf_bytes = render_one(_billing_render_job(document_id, plan["filename"], plan))
+    if plan["pdf_path"]:
+        _store_billing_document_pdf(document_id, plan["pdf_path"], pdf_bytes, jwt_claims)
+    return pdf_bytes, plan["filename"]
+
+
+def _run_freeze_shop_job(params: dict, shop_id: str, jwt_claims: str) -> dict:
+    with get_db_connection(jwt_claims) as conn:
+        with conn.cursor() as cur:
+            result = freeze_shop_billing_period(
+                cur=cur,
+                shop_id=shop_id,
+                period_month=date.fromisoformat(params["period_month"]),
+                frozen_by_user_id=params["frozen_by_user_id"],
+                frozen_by_email=params["frozen_by_email"],
+                frozen_comment=params.get("frozen_comment"),
+            )
+        conn.commit()
+    return result
+
+
+def _run_aggregate_region_job(params: dict, admin_region_id: str, jwt_claims: str) -> dict:
+    return aggregate_billing_run(
+        admin_region_id=admin_region_id,
+        period_month=date.fromisoformat(params["period_month"]),
+        created_by=params["created_by"],
+        jwt_claims=jwt_claims,
+        incremental=params.get("incremental", False),
+    )
+
+
+register_job_kind("billing.freeze_shop", _run_freeze_shop_job)
+register_job_kind("billing.aggregate_region", _run_aggregate_region_job)
+
 
 @router.post("/region/freeze")
 def freeze_region_billing(
@@ -391,11 +517,10 @@ def freeze_region_billing(
 ):
     """
     Bulk freeze for all shops in the region for the given month.
+    Returns a background job (one item per shop) to poll at /jobs/{job_id}.
     """
     period_month = _parse_month(month)
-    
-    results = []
-    
+
     if user.role == "admin_region":
         if not user.admin_region_id:
             raise HTTPException(status_code=400, detail="Admin region id missing")
@@ -406,63 +531,43 @@ def freeze_region_billing(
         target_region_id = None
 
     with get_db_connection(jwt_claims) as conn:
-        with conn:
-            with conn.cursor() as cur:
-                # 1. Get all shops for this region (super_admin can pass a region, otherwise all)
-                if target_region_id:
-                    cur.execute(
-                        """
-                        SELECT s.id, s.name
-                        FROM shop s
-                        JOIN city c ON c.id = s.city_id
-                        WHERE c.admin_region_id = %s
-                        """,
-                        (target_region_id,),
-                    )
-                else:
-                    cur.execute("SELECT id, name FROM shop")
-                shops = cur.fetchall()
-                
-                if not shops:
-                    return {"message": "No shops found in region", "processed": 0}
-
-                # 2. Iterate and freeze
-                for shop_id, shop_name in shops:
-                    try:
-                        freeze_shop_billing_period(
-                            cur=cur,
-                            shop_id=str(shop_id),
-                            period_month=period_month,
-                            frozen_by_user_id=user.user_id,
-                            frozen_by_email=user.email,
-                            frozen_comment="Regional Bulk Freeze"
-                        )
-                        results.append({
-                            "shop_id": shop_id,
-                            "name": shop_name,
-                            "status": "frozen",
-                            "error": None
-                        })
-                    except HTTPException as e:
-                        # Capture known errors (e.g. 409 already frozen, 400 no deliveries)
-                        results.append({
-                            "shop_id": shop_id,
-                            "name": shop_name,
-                            "status": "skipped",
-                            "error": str(e.detail)
-                        })
-                    except Exception as e:
-                        results.append({
-                            "shop_id": shop_id,
-                            "name": shop_name,
-                            "status": "failed",
-                            "error": str(e)
-                        })
-                        
+        with conn.cursor() as cur:
+            # Super_admin can pass a region, otherwise all shops
+            if target_region_id:
+                cur.execute(
+                    """
+                    SELECT s.id::text, s.name
+                    FROM shop s
+                    JOIN city c ON c.id = s.city_id
+                    WHERE c.admin_region_id = %s
+                    """,
+                    (target_region_id,),
+                )
+            else:
+                cur.execute("SELECT id::text, name FROM shop")
+            shops = cur.fetchall()
+
+    if not shops:
+        return {"message": "No shops found in region", "processed": 0}
+
+    job_id = submit_job(
+        kind="billing.freeze_shop",
+        items=[(shop_id, shop_name) for shop_id, shop_name in shops],
+        params={
+            "period_month": period_month.isoformat(),
+            "frozen_by_user_id": user.user_id,
+            "frozen_by_email": user.email,
+            "frozen_comment": "Regional Bulk Freeze",
+        },
+        admin_region_id=target_region_id,
+        created_by=user.user_id,
+        jwt_claims=jwt_claims,
+    )
     return {
         "month": month,
         "total_shops": len(shops),
-        "results": results
+        "job_id": job_id,
+        "status": "queued",
     }
 
 
@@ -470,11 +575,14 @@ def freeze_region_billing(
 def aggregate_region_billing(
     month: str = Query(pattern=r"^\d{4}-\d{2}$"),
     admin_region_id: str | None = Query(default=None),
+    incremental: bool = Query(default=False),
     user: MeResponse = Depends(require_admin_user),
     jwt_claims: str = Depends(get_current_user_claims),
 ):
     """
-    Build payor-centric billing documents for the region and month.
+    Build payor-centric billing documents for the region and month, as a
+    background job to poll at /jobs/{job_id} (its item result is the summary).
+    With incremental=true, only documents whose deliveries changed are rebuilt.
     """
     period_month = _parse_month(month)
 
@@ -490,17 +598,23 @@ def aggregate_region_billing(
     if not target_region_id:
         raise HTTPException(status_code=400, detail="Admin region id missing")
 
-    summary = aggregate_billing_run(
+    job_id = submit_job(
+        kind="billing.aggregate_region",
+        items=[(target_region_id, None)],
+        params={
+            "period_month": period_month.isoformat(),
+            "created_by": user.user_id,
+            "incremental": incremental,
+        },
         admin_region_id=target_region_id,
-        period_month=period_month,
         created_by=user.user_id,
         jwt_claims=jwt_claims,
     )
-
     return {
         "month": month,
         "admin_region_id": target_region_id,
-        "summary": summary,
+        "job_id": job_id,
+        "status": "queued",
     }
 
 
@@ -704,14 +818,8 @@ def export_billing_documents(
             ORDER BY l.meta->>'delivery_date'
         """
 
-        with get_db_connection(jwt_claims) as conn:
-            with conn.cursor() as cur:
-                cur.execute(sql, params)
-                rows = cur.fetchall()
-
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(
+        return CsvStream(jwt_claims, sql, params).response(
+            f"facturation-details-{month}.csv",
             [
                 "Type",
                 "Payeur",
@@ -722,27 +830,9 @@ def export_billing_documents(
                 "Sacs",
                 "Montant a facturer",
                 "Delivery ID",
-            ]
+            ],
+            lambda row: [*row[:7], f"{float(row[7] or 0):.2f}", row[8]],
         )
-        for row in rows:
-            writer.writerow(
-                [
-                    row[0],
-                    row[1],
-                    row[2],
-                    row[3],
-                    row[4],
-                    row[5],
-                    row[6],
-                    f"{float(row[7] or 0):.2f}",
-                    row[8],
-                ]
-            )
-
-        output.seek(0)
-        filename = f"facturation-details-{month}.csv"
-        headers = {"Content-Disposition": f"attachment; filename={filename}"}
-        return StreamingResponse(iter([output.getvalue()]), media_type="text/csv", headers=headers)
 
     sql = f"""
         SELECT
@@ -770,14 +860,18 @@ def export_billing_documents(
         ORDER BY d.recipient_type, recipient_name
     """
 
-    with get_db_connection(jwt_claims) as conn:
-        with conn.cursor() as cur:
-            cur.execute(sql, params)
-            rows = cur.fetchall()
+    def _format_row(row):
+        return [
+            row[0],
+            row[1],
+            int(row[5] or 0),
+            f"{float(row[2] or 0):.2f}",
+            f"{float(row[3] or 0):.2f}",
+            f"{float(row[4] or 0):.2f}",
+        ]
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(
+    return CsvStream(jwt_claims, sql, params).response(
+        f"facturation-documents-{month}.csv",
         [
             "Type",
             "Destinataire",
@@ -785,24 +879,9 @@ def export_billing_documents(
             "Montant HT",
             "Montant TVA",
             "Montant TTC",
-        ]
+        ],
+        _format_row,
     )
-    for row in rows:
-        writer.writerow(
-            [
-                row[0],
-                row[1],
-                int(row[5] or 0),
-                f"{float(row[2] or 0):.2f}",
-                f"{float(row[3] or 0):.2f}",
-                f"{float(row[4] or 0):.2f}",
-            ]
-        )
-
-    output.seek(0)
-    filename = f"facturation-documents-{month}.csv"
-    headers = {"Content-Disposition": f"attachment; filename={filename}"}
-    return StreamingResponse(iter([output.getvalue()]), media_type="text/csv", headers=headers)
 
 
 @router.get("/documents/{document_id}/pdf")
@@ -851,23 +930,40 @@ def download_billing_documents_zip(
     if not doc_ids:
         raise HTTPException(status_code=404, detail="No billing documents found for this period")
 
-    zip_buffer = io.BytesIO()
-    used_names: set[str] = set()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as archive:
-        for doc_id in doc_ids:
-            pdf_bytes, filename = _build_billing_document_pdf_bytes(
-                document_id=doc_id,
-                preview=preview,
-                jwt_claims=jwt_claims,
-            )
-            base = filename[:-4] if filename.lower().endswith(".pdf") else filename
-            safe_name = _safe_pdf_filename(base, doc_id)
-            if safe_name in used_names:
-                safe_name = _safe_pdf_filename(f"{base}_{doc_id}", doc_id)
-            used_names.add(safe_name)
-            archive.writestr(safe_name, pdf_bytes)
-
-    zip_buffer.seek(0)
+    def _stream():
+        zip_file = ZipStream()
+        used_names: set[str] = set()
+        pdf_paths: dict[str, str | None] = {}
+
+        def _jobs():
+            for doc_id, plan, error in _iter_billing_document_plans(doc_ids, preview, jwt_claims):
+                if error is not None:
+                    zip_file.writestr(f"ERROR_{doc_id}.txt", f"Could not generate PDF: {str(error)}")
+                    continue
+                filename = plan["filename"]
+                base = filename[:-4] if filename.lower().endswith(".pdf") else filename
+                safe_name = _safe_pdf_filename(base, doc_id)
+                if safe_name in used_names:
+                    safe_name = _safe_pdf_filename(f"{base}_{doc_id}", doc_id)
+                used_names.add(safe_name)
+                pdf_paths[doc_id] = plan.get("pdf_path")
+                # Stored PDFs pass through as is, the rest is rendered in the pool.
+                yield _billing_render_job(doc_id, safe_name, plan)
+
+        for job, pdf_bytes, error in render_jobs(_jobs()):
+            pdf_path = pdf_paths.pop(job.name)
+            try:
+                if error is not None:
+                    raise error
+                if pdf_path:
+                    _store_billing_document_pdf(job.name, pdf_path, pdf_bytes, jwt_claims)
+            except Exception as exc:
+                zip_file.writestr(f"ERROR_{job.name}.txt", f"Could not generate PDF: {str(exc)}")
+            else:
+                zip_file.writestr(job.filename, pdf_bytes)
+            yield zip_file.drain()
+        yield zip_file.close()
+
     filename = f"factures-{recipient_type.lower()}-{period_month.strftime('%Y-%m')}.zip"
     headers = {"Content-Disposition": f"attachment; filename={filename}"}
-    return StreamingResponse(zip_buffer, media_type="application/zip", headers=headers)
+    return StreamingResponse(_stream(), media_type="application/zip", headers=headers)
@@ -1,12 +1,9 @@
 from datetime import date, datetime, timezone, timedelta, time
 from decimal import Decimal
-import csv
 import hashlib
-import io
 from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import StreamingResponse
 
 from app.core.guards import (
     require_hq_or_admin_user_for_shop,
@@ -15,8 +12,9 @@ from app.core.guards import (
     require_customer_user,
     require_admin_user,
 )
-from app.core.config import settings
-from app.core.geo import compute_co2_saved_kg, compute_distance_km, geocode_swiss_address
+from app.core.csv_stream import CsvStream
+from app.core.delivery_enrichment import enqueue_enrichment
+from app.core.periods import month_bounds, month_range
 from app.core.security import get_current_user_claims
 from app.core.tariff_engine import compute_financials, parse_rule
 from app.core.tariff_validation import validate_tariff_rule
@@ -51,8 +49,7 @@ def create_delivery(
                     # FETCH TERRITORY from Shop ID (Security / Integrity)
                     cur.execute(
                         """
-                        SELECT s.hq_id, s.city_id, s.tariff_version_id, c.canton_id, c.admin_region_id,
-                               s.lat, s.lng, s.address
+                        SELECT s.hq_id, s.city_id, s.tariff_version_id, c.canton_id, c.admin_region_id
                         FROM shop s
                         JOIN city c ON c.id = s.city_id
                         WHERE s.id = %s
@@ -63,7 +60,7 @@ def create_delivery(
                     if not shop_row:
                         raise HTTPException(status_code=404, detail="Shop not found")
 
-                    hq_id, shop_city_id, tariff_version_id, canton_id, admin_region_id_from_city, shop_lat, shop_lng, shop_address = shop_row
+                    hq_id, shop_city_id, tariff_version_id, canton_id, admin_region_id_from_city = shop_row
 
                     # Fallback or strict lookup for admin_region if not stored in city?
                     # The vision says city belongs to admin_region.
@@ -131,30 +128,6 @@ def create_delivery(
                                 detail="City mismatch for shop",
                             )
 
-                    conn.commit()
-
-                    if (shop_lat is None or shop_lng is None) and shop_address:
-                        geocoded = geocode_swiss_address(shop_address)
-                        if geocoded:
-                            shop_lat, shop_lng = geocoded
-                            cur.execute(
-                                "UPDATE shop SET lat = %s, lng = %s WHERE id = %s",
-                                (shop_lat, shop_lng, str(payload.shop_id)),
-                            )
-
-                    distance_km = None
-                    co2_saved_kg = None
-                    if shop_lat is not None and shop_lng is not None:
-                        query = f"{payload.address}, {payload.postal_code} {payload.city_name}".strip(", ")
-                        geocoded = geocode_swiss_address(query) if query else None
-                        if geocoded:
-                            client_lat, client_lng = geocoded
-                            distance_km = compute_distance_km(
-                                shop_lat, shop_lng, client_lat, client_lng
-                            )
-                            distance_km *= settings.RETURN_TRIP_MULTIPLIER
-                            co2_saved_kg = compute_co2_saved_kg(distance_km)
-
                     _insert_delivery_record(
                         cur,
                         delivery_id=delivery_id,
@@ -165,8 +138,6 @@ def create_delivery(
                         canton_id=str(canton_id),
                         delivery_date=payload.delivery_date,
                         client_id=None,
-                        distance_km=distance_km,
-                        co2_saved_kg=co2_saved_kg,
                     )
 
                     import random
@@ -243,6 +214,7 @@ def create_delivery(
         print(f"SQL Error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+    enqueue_enrichment(delivery_id, jwt_claims)
     return {"delivery_id": str(delivery_id)}
 
 
@@ -264,8 +236,7 @@ def create_delivery_for_shop(
                 with conn.cursor() as cur:
                     cur.execute(
                         """
-                        SELECT s.hq_id, s.city_id, s.tariff_version_id, c.canton_id,
-                               s.lat, s.lng, s.address
+                        SELECT s.hq_id, s.city_id, s.tariff_version_id, c.canton_id
                         FROM shop s
                         JOIN city c ON c.id = s.city_id
                         WHERE s.id = %s
@@ -277,7 +248,7 @@ def create_delivery_for_shop(
                     if not row:
                         raise HTTPException(status_code=404, detail="Shop not found")
 
-                    hq_id, city_id, tariff_version_id, canton_id, shop_lat, shop_lng, shop_address = row
+                    hq_id, city_id, tariff_version_id, canton_id = row
                     if not tariff_version_id:
                         raise HTTPException(
                             status_code=400,
@@ -287,7 +258,7 @@ def create_delivery_for_shop(
                     cur.execute(
                         """
                         SELECT cl.id, cl.name, cl.address, cl.postal_code, cl.city_name,
-                               cl.is_cms, cl.city_id, cl.lat, cl.lng, c.parent_city_id
+                               cl.is_cms, cl.city_id, c.parent_city_id
                         FROM client cl
                         JOIN city c ON c.id = cl.city_id
                         WHERE cl.id = %s
@@ -306,8 +277,6 @@ def create_delivery_for_shop(
                         client_city_name,
                         client_is_cms,
                         client_city_id,
-                        client_lat,
-                        client_lng,
                         client_parent_city_id,
                     ) = client_row
 
@@ -359,34 +328,6 @@ def create_delivery_for_shop(
                             detail="No active tariff version for this date",
                         )
 
-                    conn.commit()
-
-                    if (shop_lat is None or shop_lng is None) and shop_address:
-                        geocoded = geocode_swiss_address(shop_address)
-                        if geocoded:
-                            shop_lat, shop_lng = geocoded
-                            cur.execute(
-                                "UPDATE shop SET lat = %s, lng = %s WHERE id = %s",
-                                (shop_lat, shop_lng, str(shop_id)),
-                            )
-
-                    if (client_lat is None or client_lng is None) and client_address:
-                        query = f"{client_address}, {client_postal_code} {client_city_name}".strip(", ")
-                        geocoded = geocode_swiss_address(query) if query else None
-                        if geocoded:
-                            client_lat, client_lng = geocoded
-                            cur.execute(
-                                "UPDATE client SET lat = %s, lng = %s WHERE id = %s",
-                                (client_lat, client_lng, str(client_id)),
-                            )
-
-                    distance_km = None
-                    co2_saved_kg = None
-                    if shop_lat is not None and shop_lng is not None and client_lat is not None and client_lng is not None:
-                        distance_km = compute_distance_km(shop_lat, shop_lng, client_lat, client_lng)
-                        distance_km *= settings.RETURN_TRIP_MULTIPLIER
-                        co2_saved_kg = compute_co2_saved_kg(distance_km)
-
                     client = {
                         "id": str(client_id),
                         "name": client_name,
@@ -407,14 +348,13 @@ def create_delivery_for_shop(
                         client=client,
                         payload=payload,
                         tariff_version=tariff_version,
-                        distance_km=distance_km,
-                        co2_saved_kg=co2_saved_kg,
                     )
     except HTTPException:
         raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
+    enqueue_enrichment(delivery_id, jwt_claims)
     return {"delivery_id": str(delivery_id)}
 
 
@@ -585,7 +525,7 @@ def list_shop_deliveries(
     with get_db_connection(jwt_claims) as conn:
         with conn.cursor() as cur:
             cur.execute(
-                """
+                f"""
                 SELECT
                     d.id AS delivery_id,
                     d.delivery_date,
@@ -605,20 +545,13 @@ def list_shop_deliveries(
                     f.share_admin_region
                 FROM delivery d
                 JOIN delivery_logistics l ON l.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status, updated_at
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 LEFT JOIN delivery_financial f ON f.delivery_id = d.id
                 WHERE d.shop_id = %s
-                  AND date_trunc('month', d.delivery_date)
-                    = date_trunc('month', %s::date)
+                  AND {month_range()}
                 ORDER BY d.delivery_date DESC
                 """,
-                (shop_id, month_date),
+                (shop_id, *month_bounds(month_date)),
             )
             rows = _rows_to_dicts(cur)
             is_frozen = _is_period_frozen(cur, shop_id, month_date)
@@ -637,43 +570,61 @@ def export_shop_deliveries(
 
     period_month = _parse_month(month)
 
-    with get_db_connection(jwt_claims) as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    d.delivery_date,
-                    l.client_name,
-                    l.address,
-                    l.city_name,
-                    l.bags,
-                    l.basket_value,
-                    f.share_admin_region,
-                    st.status,
-                    d.id::text AS delivery_id
-                FROM delivery d
-                JOIN delivery_logistics l ON l.delivery_id = d.id
-                LEFT JOIN delivery_financial f ON f.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
-                WHERE d.shop_id = %s
-                  AND date_trunc('month', d.delivery_date)
-                    = date_trunc('month', %s::date)
-                  AND COALESCE(st.status, '') <> 'cancelled'
-                ORDER BY d.delivery_date
-                """,
-                (shop_id, period_month),
-            )
-            rows = cur.fetchall()
+    stream = CsvStream(
+        jwt_claims,
+        f"""
+        SELECT
+            d.delivery_date,
+            l.client_name,
+            l.address,
+            l.city_name,
+            l.bags,
+            l.basket_value,
+            f.share_admin_region,
+            st.status,
+            d.id::text AS delivery_id
+        FROM delivery d
+        JOIN delivery_logistics l ON l.delivery_id = d.id
+        LEFT JOIN delivery_financial f ON f.delivery_id = d.id
+        LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+        WHERE d.shop_id = %s
+          AND {month_range()}
+          AND COALESCE(st.status, '') <> 'cancelled'
+        ORDER BY d.delivery_date
+        """,
+        (shop_id, *month_bounds(period_month)),
+    )
+
+    def _format_row(row):
+        (
+            delivery_date,
+            client_name,
+            address,
+            city_name,
+            bags,
+            basket_value,
+            share_admin_region,
+            status,
+            delivery_id,
+        ) = row
+        if isinstance(delivery_date, (datetime, date)):
+            delivery_date_value = delivery_date.strftime("%Y-%m-%d")
+        else:
+            delivery_date_value = str(delivery_date or "")
+        return [
+            delivery_date_value,
+            client_name or "",
+            address or "",
+            city_name or "",
+            bags or 0,
+            "" if basket_value is None else f"{float(basket_value or 0):.2f}",
+            f"{float(share_admin_region or 0):.2f}",
+            status or "",
+            delivery_id or "",
+        ]
 
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=";")
-    writer.writerow(
+    return stream.response(
+        f"livraisons-commerce-{month}.csv",
         [
             "Date",
             "Client",
@@ -684,41 +635,10 @@ def export_shop_deliveries(
             "Montant facture (TTC)",
             "Statut",
             "Delivery ID",
-        ]
+        ],
+        _format_row,
+        delimiter=";",
     )
-    for (
-        delivery_date,
-        client_name,
-        address,
-        city_name,
-        bags,
-        basket_value,
-        share_admin_region,
-        status,
-        delivery_id,
-    ) in rows:
-        if isinstance(delivery_date, (datetime, date)):
-            delivery_date_value = delivery_date.strftime("%Y-%m-%d")
-        else:
-            delivery_date_value = str(delivery_date or "")
-        writer.writerow(
-            [
-                delivery_date_value,
-                client_name or "",
-                address or "",
-                city_name or "",
-                bags or 0,
-                "" if basket_value is None else f"{float(basket_value or 0):.2f}",
-                f"{float(share_admin_region or 0):.2f}",
-                status or "",
-                delivery_id or "",
-            ]
-        )
-
-    output.seek(0)
-    filename = f"livraisons-commerce-{month}.csv"
-    headers = {"Content-Disposition": f"attachment; filename={filename}"}
-    return StreamingResponse(iter([output.getvalue()]), media_type="text/csv", headers=headers)
 
 
 @router.patch("/shop/{delivery_id}")
@@ -875,14 +795,9 @@ def update_delivery_status(
                         """
                         SELECT
                             d.courier_id,
-                            COALESCE((
-                                SELECT status
-                                FROM delivery_status
-                                WHERE delivery_id = d.id
-                                ORDER BY updated_at DESC
-                                LIMIT 1
-                            ), 'created') AS current_status
+                            COALESCE(st.status, 'created') AS current_status
                         FROM delivery d
+                        LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                         WHERE d.id = %s
                         """,
                         (delivery_id,),
@@ -999,13 +914,7 @@ def list_courier_deliveries(
                     FROM delivery d
                     JOIN shop s ON s.id = d.shop_id
                     JOIN delivery_logistics l ON l.delivery_id = d.id
-                    LEFT JOIN LATERAL (
-                        SELECT status, updated_at
-                        FROM delivery_status
-                        WHERE delivery_id = d.id
-                        ORDER BY updated_at DESC
-                        LIMIT 1
-                    ) st ON true
+                    LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                     WHERE d.delivery_date = %s::date
                       AND d.courier_id = %s
                     ORDER BY d.delivery_date, s.name
@@ -1039,13 +948,7 @@ def list_customer_deliveries(
                 FROM delivery d
                 JOIN shop s ON s.id = d.shop_id
                 JOIN delivery_logistics l ON l.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status, updated_at
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 WHERE d.client_id = %s
                 ORDER BY d.delivery_date DESC
                 """,
@@ -1068,10 +971,8 @@ def _get_latest_status(cur, delivery_id: str) -> tuple[str | None, datetime | No
     cur.execute(
         """
         SELECT status, updated_at
-        FROM delivery_status
+        FROM delivery_current_status
         WHERE delivery_id = %s
-        ORDER BY updated_at DESC
-        LIMIT 1
         """,
         (delivery_id,),
     )
@@ -1418,8 +1319,6 @@ def _create_delivery_core(
     client: dict,
     payload: ShopDeliveryCreate,
     tariff_version,
-    distance_km: float | None = None,
-    co2_saved_kg: float | None = None,
 ):
     tariff_version_id, rule_type, rule, share = tariff_version
     rule_data = parse_rule(rule)
@@ -1448,8 +1347,6 @@ def _create_delivery_core(
         canton_id=canton_id,
         delivery_date=payload.delivery_date,
         client_id=client["id"],
-        distance_km=distance_km,
-        co2_saved_kg=co2_saved_kg,
     )
 
     import random
@@ -71,7 +71,7 @@ def list_dispatch_deliveries(
             with conn.cursor() as cur:
                 # Join with Shop to get Shop layout
                 # Join with delivery_logistics for details
-                # Join with delivery_status for current status
+                # Join with delivery_current_status for current status
                 # Join with Courier to get contact info
                 # Join with Client to get phone, floor, door code
                 cur.execute(
@@ -104,13 +104,7 @@ def list_dispatch_deliveries(
                     JOIN delivery_logistics l ON l.delivery_id = d.id
                     LEFT JOIN client cl ON cl.id = d.client_id
                     LEFT JOIN courier co ON co.id = d.courier_id
-                    LEFT JOIN LATERAL (
-                        SELECT status, updated_at
-                        FROM delivery_status
-                        WHERE delivery_id = d.id
-                        ORDER BY updated_at DESC
-                        LIMIT 1
-                    ) st ON true
+                    LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                     WHERE c.admin_region_id = %s
                       AND d.delivery_date >= %s
                       AND d.delivery_date <= %s
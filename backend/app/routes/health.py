@@ -1,7 +1,34 @@
 from fastapi import APIRouter
 
+from app.core.geo import get_distance_cache_stats, get_geocode_cache_stats
+from app.core.http_client import get_http_client_stats
+from app.core.identity import get_identity_cache_stats
+from app.db.session import get_pool_stats
+from app.pdf.pdf_cache import get_pdf_cache_stats
+
 router = APIRouter(prefix="/health", tags=["health"])
 
 @router.get("")
 def health():
     return {"status": "ok"}
+
+
+@router.get("/db")
+def health_db():
+    return {"status": "ok", "pool": get_pool_stats()}
+
+
+@router.get("/cache")
+def health_cache():
+    return {
+        "status": "ok",
+        "identity": get_identity_cache_stats(),
+        "pdf": get_pdf_cache_stats(),
+        "geocode": get_geocode_cache_stats(),
+        "route_distance": get_distance_cache_stats(),
+    }
+
+
+@router.get("/http")
+def health_http():
+    return {"status": "ok", "http": get_http_client_stats()}
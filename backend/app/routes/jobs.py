@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.guards import require_admin_user
+from app.core.jobs import cancel_job, get_job, list_jobs, retry_job
+from app.core.security import get_current_user_claims
+from app.schemas.me import MeResponse
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _get_visible_job(job_id: str, user: MeResponse, jwt_claims: str, *, with_items: bool = True) -> dict:
+    job = get_job(job_id, jwt_claims, with_items=with_items)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if user.role == "admin_region" and job["admin_region_id"] != str(user.admin_region_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("")
+def list_background_jobs(
+    admin_region_id: str | None = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100),
+    user: MeResponse = Depends(require_admin_user),
+    jwt_claims: str = Depends(get_current_user_claims),
+):
+    if user.role == "admin_region":
+        if not user.admin_region_id:
+            raise HTTPException(status_code=400, detail="Admin region id missing")
+        admin_region_id = str(user.admin_region_id)
+    return list_jobs(admin_region_id, jwt_claims, limit=limit)
+
+
+@router.get("/{job_id}")
+def get_background_job(
+    job_id: str,
+    user: MeResponse = Depends(require_admin_user),
+    jwt_claims: str = Depends(get_current_user_claims),
+):
+    """
+    Job status and progress, with the outcome of each item (shop).
+    """
+    return _get_visible_job(job_id, user, jwt_claims)
+
+
+@router.post("/{job_id}/cancel")
+def cancel_background_job(
+    job_id: str,
+    user: MeResponse = Depends(require_admin_user),
+    jwt_claims: str = Depends(get_current_user_claims),
+):
+    _get_visible_job(job_id, user, jwt_claims, with_items=False)
+    cancel_job(job_id, jwt_claims)
+    return _get_visible_job(job_id, user, jwt_claims, with_items=False)
+
+
+@router.post("/{job_id}/retry")
+def retry_background_job(
+    job_id: str,
+    item_key: list[str] | None = Query(default=None),
+    user: MeResponse = Depends(require_admin_user),
+    jwt_claims: str = Depends(get_current_user_claims),
+):
+    """
+    Re-run the failed, skipped and cancelled items (only `item_key` ones when given).
+    """
+    _get_visible_job(job_id, user, jwt_claims, with_items=False)
+    retried = retry_job(job_id, jwt_claims, item_key)
+    return {"job_id": job_id, "retried": retried}
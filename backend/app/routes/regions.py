@@ -7,6 +7,7 @@ from app.core.guards import require_super_admin_user, require_admin_user
 from app.core.security import get_current_user_claims
 from app.db.session import get_db_connection
 from app.schemas.me import MeResponse
+from app.pdf.logo import LOGO_BUCKET, invalidate_storage_logo
 from app.storage.supabase_storage import upload_file_bytes
 
 router = APIRouter(prefix="/regions", tags=["regions"])
@@ -238,6 +239,18 @@ def update_admin_region_billing(
     }
 
 
+_LOGO_EXTENSIONS = (".png", ".jpg")
+
+
+def _region_logo_path(admin_region_id: str, name: str, extension: str) -> str:
+    return f"admin-region/{admin_region_id}/{name}{extension}"
+
+
+def _invalidate_region_logos(admin_region_id: str, name: str) -> None:
+    for extension in _LOGO_EXTENSIONS:
+        invalidate_storage_logo(_region_logo_path(admin_region_id, name, extension))
+
+
 @router.post("/me/logo")
 async def upload_admin_region_logo(
     file: UploadFile = File(...),
@@ -259,17 +272,18 @@ async def upload_admin_region_logo(
     if not data:
         raise HTTPException(status_code=400, detail="Empty upload")
 
-    logo_path = f"admin-region/{target_region_id}/logo{extension}"
+    logo_path = _region_logo_path(target_region_id, "logo", extension)
 
     try:
         upload_file_bytes(
-            bucket="billing-logos",
+            bucket=LOGO_BUCKET,
             path=logo_path,
             data=data,
             content_type=content_type,
         )
     except RuntimeError as exc:
         raise HTTPException(status_code=502, detail=str(exc)) from exc
+    invalidate_storage_logo(logo_path)
 
     with get_db_connection(jwt_claims) as conn:
         with conn.cursor() as cur:
@@ -312,6 +326,7 @@ def clear_admin_region_logo(
             if not row:
                 raise HTTPException(status_code=404, detail="Admin region not found")
             conn.commit()
+    _invalidate_region_logos(target_region_id, "logo")
 
     return {"billing_logo_path": row[0]}
 
@@ -446,17 +461,18 @@ async def upload_admin_region_internal_logo(
     if not data:
         raise HTTPException(status_code=400, detail="Empty upload")
 
-    logo_path = f"admin-region/{target_region_id}/internal-logo{extension}"
+    logo_path = _region_logo_path(target_region_id, "internal-logo", extension)
 
     try:
         upload_file_bytes(
-            bucket="billing-logos",
+            bucket=LOGO_BUCKET,
             path=logo_path,
             data=data,
             content_type=content_type,
         )
     except RuntimeError as exc:
         raise HTTPException(status_code=502, detail=str(exc)) from exc
+    invalidate_storage_logo(logo_path)
 
     with get_db_connection(jwt_claims) as conn:
         with conn.cursor() as cur:
@@ -499,5 +515,6 @@ def clear_admin_region_internal_logo(
             if not row:
                 raise HTTPException(status_code=404, detail="Admin region not found")
             conn.commit()
+    _invalidate_region_logos(target_region_id, "internal-logo")
 
     return {"internal_billing_logo_path": row[0]}
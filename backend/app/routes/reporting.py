@@ -1,13 +1,14 @@
-import csv
 import io
-import zipfile
 from datetime import date, datetime
 from decimal import Decimal
+from typing import Iterator
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
 
+from app.core.config import settings
+from app.core.csv_stream import CsvStream
 from app.core.guards import (
     require_admin_user,
     require_city_user,
@@ -15,17 +16,23 @@ from app.core.guards import (
     require_hq_user,
 )
 from app.core.identity import resolve_identity
+from app.core.periods import month_bounds, month_range
 from app.core.security import get_current_user, get_current_user_claims
+from app.core.zip_stream import ZipStream
 from app.db.session import get_db_connection
 from app.pdf.client_monthly_report import build_client_monthly_pdf
 from app.pdf.invoice_report import build_recipient_invoice_pdf
+from app.pdf.pdf_cache import fetch_stored_pdf, fetch_stored_pdfs
+from app.pdf.render_pool import RenderJob, render_jobs
 from app.pdf.shop_monthly_report import build_shop_monthly_pdf
 from app.schemas.me import MeResponse
-from app.storage.supabase_storage import download_pdf_bytes
 
 
 router = APIRouter(prefix="/reports", tags=["reporting"])
 
+# Shops, cities or clients whose rows a ZIP export fetches per connection.
+_ZIP_FETCH_BATCH_SIZE = 25
+
 
 @router.get("/city-billing")
 def get_city_billing(
@@ -130,7 +137,7 @@ def get_city_billing_deliveries(
 
             month_date = _parse_month(month)
             cur.execute(
-                """
+                f"""
                 SELECT
                     d.id AS delivery_id,
                     d.delivery_date,
@@ -154,19 +161,13 @@ def get_city_billing_deliveries(
                 JOIN city c ON c.id = s.city_id
                 JOIN delivery_logistics l ON l.delivery_id = d.id
                 LEFT JOIN delivery_financial f ON f.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 WHERE s.city_id = %s
-                  AND date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                  AND {month_range()}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 ORDER BY s.name, d.delivery_date
                 """,
-                (city_id, month_date),
+                (city_id, *month_bounds(month_date)),
             )
             return _rows_to_dicts(cur)
 
@@ -187,92 +188,31 @@ def get_hq_billing_zip(
         with conn.cursor() as cur:
             if preview:
                 cur.execute(
-                    """
+                    f"""
                     SELECT s.id, s.name, c.name
                     FROM shop s
                     JOIN city c ON c.id = s.city_id
                     JOIN delivery d ON d.shop_id = s.id
-                    LEFT JOIN LATERAL (
-                        SELECT status
-                        FROM delivery_status
-                        WHERE delivery_id = d.id
-                        ORDER BY updated_at DESC
-                        LIMIT 1
-                    ) st ON true
+                    LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                     WHERE s.hq_id = %s
-                      AND date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                      AND {month_range()}
                       AND COALESCE(st.status, '') <> 'cancelled'
                     GROUP BY s.id, s.name, c.name
                     ORDER BY s.name
                     """,
-                    (str(user.hq_id), month_date),
+                    (str(user.hq_id), *month_bounds(month_date)),
                 )
                 shops = cur.fetchall()
                 if not shops:
                     raise HTTPException(status_code=404, detail="No deliveries for this period")
-
-                zip_buffer = io.BytesIO()
-                with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                    for shop_id, shop_name, shop_city in shops:
-                        try:
-                            cur.execute(
-                                """
-                                SELECT
-                                    d.delivery_date,
-                                    l.client_name,
-                                    l.city_name,
-                                    l.bags,
-                                    f.total_price,
-                                    f.share_admin_region,
-                                    f.share_city
-                                FROM delivery d
-                                JOIN delivery_logistics l ON l.delivery_id = d.id
-                                JOIN delivery_financial f ON f.delivery_id = d.id
-                                LEFT JOIN LATERAL (
-                                    SELECT status
-                                    FROM delivery_status
-                                    WHERE delivery_id = d.id
-                                    ORDER BY updated_at DESC
-                                    LIMIT 1
-                                ) st ON true
-                                WHERE d.shop_id = %s
-                                  AND d.delivery_date >= %s::date
-                                  AND d.delivery_date < (%s::date + INTERVAL '1 month')
-                                  AND COALESCE(st.status, '') <> 'cancelled'
-                                ORDER BY d.delivery_date
-                                """,
-                                (shop_id, month_date, month_date),
-                            )
-                            deliveries = cur.fetchall()
-                            if not deliveries:
-                                zip_file.writestr(
-                                    f"EMPTY_{shop_name}.txt",
-                                    "No deliveries for this period.",
-                                )
-                                continue
-                            pdf_buffer = build_shop_monthly_pdf(
-                                shop_name=shop_name,
-                                shop_city=shop_city,
-                                hq_name=None,
-                                period_month=month_date,
-                                frozen_at=None,
-                                frozen_by=None,
-                                frozen_by_name=None,
-                                deliveries=deliveries,
-                                is_preview=True,
-                            )
-                            safe_shop = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in shop_name)
-                            filename = f"{safe_shop}_{month}_PREVIEW.pdf"
-                            zip_file.writestr(filename, pdf_buffer.getvalue())
-                        except Exception as e:
-                            zip_file.writestr(f"ERROR_{shop_name}.txt", f"Could not generate PDF: {str(e)}")
             else:
                 # 1. Select all frozen PDFs for this HQ/Month
                 cur.execute(
                     """
                     SELECT
                         s.name,
-                        bp.pdf_url
+                        bp.pdf_url,
+                        bp.pdf_sha256
                     FROM view_hq_billing_shops v
                     JOIN shop s ON s.id = v.shop_id
                     JOIN billing_period bp
@@ -288,34 +228,99 @@ def get_hq_billing_zip(
                 if not rows:
                     raise HTTPException(status_code=404, detail="No billing documents found for this period")
 
-                # 2. Build ZIP
-                zip_buffer = io.BytesIO()
-                with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                    for shop_name, pdf_url in rows:
-                        try:
-                            # Fetch PDF bytes from storage
-                            # pdf_url is the path inside 'billing-pdf' bucket
-                            pdf_bytes = download_pdf_bytes(bucket="billing-pdf", path=pdf_url)
-                            
-                            safe_shop = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in shop_name)
-                            filename = f"{safe_shop}_{month}.pdf"
-                            
-                            zip_file.writestr(filename, pdf_bytes)
-                        except Exception as e:
-                            print(f"Error zipping PDF for {shop_name}: {e}")
-                            # We might want to continue or fail. Let's add a placeholder error file
-                            zip_file.writestr(f"ERROR_{shop_name}.txt", f"Could not retrieve PDF: {str(e)}")
-
-            zip_buffer.seek(0)
-            
-            filename = f"Billing_HQ_{month}.zip"
-            return StreamingResponse(
-                zip_buffer,
-                media_type="application/zip",
-                headers={
-                    "Content-Disposition": f'attachment; filename="{filename}"',
-                },
+    def _fetch_deliveries(cur, shop_id, *_shop):
+        cur.execute(
+            """
+            SELECT
+                d.delivery_date,
+                l.client_name,
+                l.city_name,
+                l.bags,
+                f.total_price,
+                f.share_admin_region,
+                f.share_city
+            FROM delivery d
+            JOIN delivery_logistics l ON l.delivery_id = d.id
+            JOIN delivery_financial f ON f.delivery_id = d.id
+            LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+            WHERE d.shop_id = %s
+              AND d.delivery_date >= %s::date
+              AND d.delivery_date < (%s::date + INTERVAL '1 month')
+              AND COALESCE(st.status, '') <> 'cancelled'
+            ORDER BY d.delivery_date
+            """,
+            (shop_id, month_date, month_date),
+        )
+        return cur.fetchall()
+
+    def _stream_preview():
+        zip_file = ZipStream()
+
+        def _jobs():
+            for (shop_id, shop_name, shop_city), deliveries, error in _fetch_per_item(
+                shops, _fetch_deliveries, jwt_claims
+            ):
+                if error is not None:
+                    zip_file.writestr(f"ERROR_{shop_name}.txt", f"Could not generate PDF: {str(error)}")
+                    continue
+                if not deliveries:
+                    zip_file.writestr(
+                        f"EMPTY_{shop_name}.txt",
+                        "No deliveries for this period.",
+                    )
+                    continue
+                safe_shop = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in shop_name)
+                yield RenderJob(
+                    name=shop_name,
+                    filename=f"{safe_shop}_{month}_PREVIEW.pdf",
+                    builder=build_shop_monthly_pdf,
+                    cache_id=f"shop_report/{shop_id}",
+                    kwargs=dict(
+                        shop_name=shop_name,
+                        shop_city=shop_city,
+                        hq_name=None,
+                        period_month=month_date,
+                        frozen_at=None,
+                        frozen_by=None,
+                        frozen_by_name=None,
+                        deliveries=deliveries,
+                        is_preview=True,
+                    ),
+                )
+
+        yield from _stream_rendered_pdfs(zip_file, _jobs())
+        yield zip_file.close()
+
+    def _stream_frozen():
+        # 2. Stream the ZIP; stored PDFs are downloaded a few at a time, concurrently
+        zip_file = ZipStream()
+        batch_size = max(settings.STORAGE_MAX_CONCURRENCY, 1)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            # pdf_url is the path inside 'billing-pdf' bucket
+            fetched = fetch_stored_pdfs(
+                bucket="billing-pdf",
+                entries=[(pdf_url, pdf_sha256) for _shop_name, pdf_url, pdf_sha256 in batch],
             )
+            for (shop_name, _pdf_url, _pdf_sha256), pdf_bytes in zip(batch, fetched):
+                if isinstance(pdf_bytes, Exception):
+                    print(f"Error zipping PDF for {shop_name}: {pdf_bytes}")
+                    # Placeholder error file instead of failing the whole archive
+                    zip_file.writestr(f"ERROR_{shop_name}.txt", f"Could not retrieve PDF: {str(pdf_bytes)}")
+                else:
+                    safe_shop = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in shop_name)
+                    zip_file.writestr(f"{safe_shop}_{month}.pdf", pdf_bytes)
+                yield zip_file.drain()
+        yield zip_file.close()
+
+    filename = f"Billing_HQ_{month}.zip"
+    return StreamingResponse(
+        _stream_preview() if preview else _stream_frozen(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        },
+    )
 
 
 @router.get("/admin-billing/zip")
@@ -340,108 +345,40 @@ def get_admin_billing_zip(
 
     with get_db_connection(jwt_claims) as conn:
         with conn.cursor() as cur:
+            vat_rate = _get_vat_rate(cur, month_date)
             if preview:
-                vat_rate = _get_vat_rate(cur, month_date)
                 if target_region_id:
                     cur.execute(
-                        """
+                        f"""
                         SELECT s.id, s.name, c.name
                         FROM shop s
                         JOIN city c ON c.id = s.city_id
                         JOIN delivery d ON d.shop_id = s.id
-                        WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                        WHERE {month_range()}
                           AND c.admin_region_id = %s
                           AND s.hq_id IS NULL
                         GROUP BY s.id, s.name, c.name
                         ORDER BY s.name
                         """,
-                        (month_date, target_region_id),
+                        (*month_bounds(month_date), target_region_id),
                     )
                 else:
                     cur.execute(
-                        """
+                        f"""
                         SELECT s.id, s.name, c.name
                         FROM shop s
                         JOIN city c ON c.id = s.city_id
                         JOIN delivery d ON d.shop_id = s.id
-                        WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                        WHERE {month_range()}
                           AND s.hq_id IS NULL
                         GROUP BY s.id, s.name, c.name
                         ORDER BY s.name
                         """,
-                        (month_date,),
+                        (*month_bounds(month_date),),
                     )
                 shops = cur.fetchall()
                 if not shops:
                     raise HTTPException(status_code=404, detail="No deliveries for this period")
-
-                zip_buffer = io.BytesIO()
-                with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                    for shop_id, shop_name, shop_city in shops:
-                        try:
-                            cur.execute(
-                                """
-                                SELECT
-                                    d.delivery_date,
-                                    l.client_name,
-                                    l.city_name,
-                                    l.bags,
-                                    f.total_price,
-                                    f.share_admin_region,
-                                    f.share_city
-                                FROM delivery d
-                                JOIN delivery_logistics l ON l.delivery_id = d.id
-                                JOIN delivery_financial f ON f.delivery_id = d.id
-                                WHERE d.shop_id = %s
-                                  AND d.delivery_date >= %s::date
-                                  AND d.delivery_date < (%s::date + INTERVAL '1 month')
-                                ORDER BY d.delivery_date
-                                """,
-                                (shop_id, month_date, month_date),
-                            )
-                            deliveries = cur.fetchall()
-                            if not deliveries:
-                                zip_file.writestr(
-                                    f"EMPTY_{shop_name}.txt",
-                                    "No deliveries for this period.",
-                                )
-                                continue
-                            invoice_rows = [
-                                (
-                                    delivery_date,
-                                    shop_name,
-                                    client_name,
-                                    city_label,
-                                    bags,
-                                    share_admin_region,
-                                )
-                                for (
-                                    delivery_date,
-                                    client_name,
-                                    city_label,
-                                    bags,
-                                    _total_price,
-                                    share_admin_region,
-                                    _share_city,
-                                ) in deliveries
-                            ]
-                            pdf_buffer = build_recipient_invoice_pdf(
-                                recipient_label="Commerce",
-                                recipient_name=shop_name,
-                                period_month=month_date,
-                                rows=invoice_rows,
-                                vat_rate=vat_rate,
-                                is_preview=True,
-                                payment_message=f"Facturation commerce DringDring {month_date.strftime('%Y-%m')}",
-                            )
-                            safe_shop = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in shop_name)
-                            filename = f"{safe_shop}_{month}_PREVIEW.pdf"
-                            zip_file.writestr(filename, pdf_buffer.getvalue())
-                        except Exception as e:
-                            zip_file.writestr(
-                                f"ERROR_{shop_name}.txt",
-                                f"Could not generate PDF: {str(e)}",
-                            )
             else:
                 if target_region_id:
                     cur.execute(
@@ -475,84 +412,96 @@ def get_admin_billing_zip(
                 if not shops:
                     raise HTTPException(status_code=404, detail="No billing documents found for this period")
 
-                zip_buffer = io.BytesIO()
-                with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                    vat_rate = _get_vat_rate(cur, month_date)
-                    for shop_id, shop_name, shop_city in shops:
-                        try:
-                            cur.execute(
-                                """
-                                SELECT
-                                    d.delivery_date,
-                                    l.client_name,
-                                    l.city_name,
-                                    l.bags,
-                                    f.total_price,
-                                    f.share_admin_region,
-                                    f.share_city
-                                FROM delivery d
-                                JOIN delivery_logistics l ON l.delivery_id = d.id
-                                JOIN delivery_financial f ON f.delivery_id = d.id
-                                WHERE d.shop_id = %s
-                                  AND d.delivery_date >= %s::date
-                                  AND d.delivery_date < (%s::date + INTERVAL '1 month')
-                                ORDER BY d.delivery_date
-                                """,
-                                (shop_id, month_date, month_date),
-                            )
-                            deliveries = cur.fetchall()
-                            if not deliveries:
-                                zip_file.writestr(
-                                    f"EMPTY_{shop_name}.txt",
-                                    "No deliveries for this period.",
-                                )
-                                continue
-                            invoice_rows = [
-                                (
-                                    delivery_date,
-                                    shop_name,
-                                    client_name,
-                                    city_label,
-                                    bags,
-                                    share_admin_region,
-                                )
-                                for (
-                                    delivery_date,
-                                    client_name,
-                                    city_label,
-                                    bags,
-                                    _total_price,
-                                    share_admin_region,
-                                    _share_city,
-                                ) in deliveries
-                            ]
-                            pdf_buffer = build_recipient_invoice_pdf(
-                                recipient_label="Commerce",
-                                recipient_name=shop_name,
-                                period_month=month_date,
-                                rows=invoice_rows,
-                                vat_rate=vat_rate,
-                                is_preview=False,
-                                payment_message=f"Facturation commerce DringDring {month_date.strftime('%Y-%m')}",
-                            )
-                            safe_shop = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in shop_name)
-                            filename = f"{safe_shop}_{month}.pdf"
-                            zip_file.writestr(filename, pdf_buffer.getvalue())
-                        except Exception as e:
-                            zip_file.writestr(
-                                f"ERROR_{shop_name}.txt",
-                                f"Could not generate PDF: {str(e)}",
-                            )
-
-            zip_buffer.seek(0)
-            filename = f"Billing_Admin_{month}.zip"
-            return StreamingResponse(
-                zip_buffer,
-                media_type="application/zip",
-                headers={
-                    "Content-Disposition": f'attachment; filename="{filename}"',
-                },
-            )
+    def _fetch_deliveries(cur, shop_id, *_shop):
+        cur.execute(
+            """
+            SELECT
+                d.delivery_date,
+                l.client_name,
+                l.city_name,
+                l.bags,
+                f.total_price,
+                f.share_admin_region,
+                f.share_city
+            FROM delivery d
+            JOIN delivery_logistics l ON l.delivery_id = d.id
+            JOIN delivery_financial f ON f.delivery_id = d.id
+            WHERE d.shop_id = %s
+              AND d.delivery_date >= %s::date
+              AND d.delivery_date < (%s::date + INTERVAL '1 month')
+            ORDER BY d.delivery_date
+            """,
+            (shop_id, month_date, month_date),
+        )
+        return cur.fetchall()
+
+    def _stream():
+        zip_file = ZipStream()
+
+        def _jobs():
+            for (shop_id, shop_name, shop_city), deliveries, error in _fetch_per_item(
+                shops, _fetch_deliveries, jwt_claims
+            ):
+                if error is not None:
+                    zip_file.writestr(
+                        f"ERROR_{shop_name}.txt",
+                        f"Could not generate PDF: {str(error)}",
+                    )
+                    continue
+                if not deliveries:
+                    zip_file.writestr(
+                        f"EMPTY_{shop_name}.txt",
+                        "No deliveries for this period.",
+                    )
+                    continue
+                invoice_rows = [
+                    (
+                        delivery_date,
+                        shop_name,
+                        client_name,
+                        city_label,
+                        bags,
+                        share_admin_region,
+                    )
+                    for (
+                        delivery_date,
+                        client_name,
+                        city_label,
+                        bags,
+                        _total_price,
+                        share_admin_region,
+                        _share_city,
+                    ) in deliveries
+                ]
+                safe_shop = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in shop_name)
+                suffix = "_PREVIEW" if preview else ""
+                yield RenderJob(
+                    name=shop_name,
+                    filename=f"{safe_shop}_{month}{suffix}.pdf",
+                    builder=build_recipient_invoice_pdf,
+                    cache_id=f"shop_invoice/{shop_id}",
+                    kwargs=dict(
+                        recipient_label="Commerce",
+                        recipient_name=shop_name,
+                        period_month=month_date,
+                        rows=invoice_rows,
+                        vat_rate=vat_rate,
+                        is_preview=preview,
+                        payment_message=f"Facturation commerce DringDring {month_date.strftime('%Y-%m')}",
+                    ),
+                )
+
+        yield from _stream_rendered_pdfs(zip_file, _jobs())
+        yield zip_file.close()
+
+    filename = f"Billing_Admin_{month}.zip"
+    return StreamingResponse(
+        _stream(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        },
+    )
 
 
 @router.get("/city-billing/zip")
@@ -580,141 +529,135 @@ def get_city_billing_zip(
             vat_rate = _get_vat_rate(cur, month_date)
             if target_region_id:
                 cur.execute(
-                    """
+                    f"""
                     SELECT DISTINCT c.id, c.name
                     FROM city c
                     JOIN shop s ON s.city_id = c.id
                     JOIN delivery d ON d.shop_id = s.id
-                    LEFT JOIN LATERAL (
-                        SELECT status
-                        FROM delivery_status
-                        WHERE delivery_id = d.id
-                        ORDER BY updated_at DESC
-                        LIMIT 1
-                    ) st ON true
-                    WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                    LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+                    WHERE {month_range()}
                       AND c.admin_region_id = %s
                       AND COALESCE(st.status, '') <> 'cancelled'
                     ORDER BY c.name
                     """,
-                    (month_date, target_region_id),
+                    (*month_bounds(month_date), target_region_id),
                 )
             else:
                 cur.execute(
-                    """
+                    f"""
                     SELECT DISTINCT c.id, c.name
                     FROM city c
                     JOIN shop s ON s.city_id = c.id
                     JOIN delivery d ON d.shop_id = s.id
-                    LEFT JOIN LATERAL (
-                        SELECT status
-                        FROM delivery_status
-                        WHERE delivery_id = d.id
-                        ORDER BY updated_at DESC
-                        LIMIT 1
-                    ) st ON true
-                    WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                    LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+                    WHERE {month_range()}
                       AND COALESCE(st.status, '') <> 'cancelled'
                     ORDER BY c.name
                     """,
-                    (month_date,),
+                    (*month_bounds(month_date),),
                 )
             cities = cur.fetchall()
 
             if not cities:
                 raise HTTPException(status_code=404, detail="No city billing documents found for this period")
 
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                for city_id, city_name in cities:
-                    try:
-                        if not preview:
-                            _assert_city_period_fully_frozen(cur, city_id, month_date)
-                        cur.execute(
-                            """
-                            SELECT
-                                s.id AS shop_id,
-                                s.name AS shop_name,
-                                d.delivery_date,
-                                l.client_name,
-                                l.city_name,
-                                l.bags,
-                                f.total_price,
-                                f.share_city,
-                                f.share_admin_region
-                            FROM delivery d
-                            JOIN shop s ON s.id = d.shop_id
-                            JOIN delivery_logistics l ON l.delivery_id = d.id
-                            JOIN delivery_financial f ON f.delivery_id = d.id
-                            LEFT JOIN LATERAL (
-                                SELECT status
-                                FROM delivery_status
-                                WHERE delivery_id = d.id
-                                ORDER BY updated_at DESC
-                                LIMIT 1
-                            ) st ON true
-                            WHERE s.city_id = %s
-                              AND date_trunc('month', d.delivery_date) = %s::date
-                              AND COALESCE(st.status, '') <> 'cancelled'
-                            ORDER BY s.name, d.delivery_date
-                            """,
-                            (city_id, month_date),
-                        )
-                        rows = cur.fetchall()
-                        if not rows:
-                            zip_file.writestr(
-                                f"EMPTY_{city_name}.txt",
-                                "No deliveries for this period.",
-                            )
-                            continue
-                        invoice_rows = [
-                            (
-                                delivery_date,
-                                shop_name,
-                                client_name,
-                                city_label,
-                                bags,
-                                share_city,
-                            )
-                            for (
-                                _shop_id,
-                                shop_name,
-                                delivery_date,
-                                client_name,
-                                city_label,
-                                bags,
-                                _total_price,
-                                share_city,
-                                _share_admin_region,
-                            ) in rows
-                        ]
-                        pdf_buffer = build_recipient_invoice_pdf(
-                            recipient_label="Commune partenaire",
-                            recipient_name=city_name,
-                            period_month=month_date,
-                            rows=invoice_rows,
-                            vat_rate=vat_rate,
-                            is_preview=preview,
-                            payment_message=f"Facturation commune DringDring {month_date.strftime('%Y-%m')}",
-                        )
-                        safe_city = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in city_name)
-                        filename = f"{safe_city}_{month}.pdf"
-                        zip_file.writestr(filename, pdf_buffer.getvalue())
-                    except Exception as exc:
-                        zip_file.writestr(
-                            f"ERROR_{city_name}.txt",
-                            f"Could not generate PDF: {str(exc)}",
-                        )
+    def _fetch_rows(cur, city_id, _city_name):
+        if not preview:
+            _assert_city_period_fully_frozen(cur, city_id, month_date)
+        cur.execute(
+            f"""
+            SELECT
+                s.id AS shop_id,
+                s.name AS shop_name,
+                d.delivery_date,
+                l.client_name,
+                l.city_name,
+                l.bags,
+                f.total_price,
+                f.share_city,
+                f.share_admin_region
+            FROM delivery d
+            JOIN shop s ON s.id = d.shop_id
+            JOIN delivery_logistics l ON l.delivery_id = d.id
+            JOIN delivery_financial f ON f.delivery_id = d.id
+            LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+            WHERE s.city_id = %s
+              AND {month_range()}
+              AND COALESCE(st.status, '') <> 'cancelled'
+            ORDER BY s.name, d.delivery_date
+            """,
+            (city_id, *month_bounds(month_date)),
+        )
+        return cur.fetchall()
+
+    def _stream():
+        zip_file = ZipStream()
+
+        def _jobs():
+            for (city_id, city_name), rows, error in _fetch_per_item(
+                cities, _fetch_rows, jwt_claims
+            ):
+                if error is not None:
+                    zip_file.writestr(
+                        f"ERROR_{city_name}.txt",
+                        f"Could not generate PDF: {str(error)}",
+                    )
+                    continue
+                if not rows:
+                    zip_file.writestr(
+                        f"EMPTY_{city_name}.txt",
+                        "No deliveries for this period.",
+                    )
+                    continue
+                invoice_rows = [
+                    (
+                        delivery_date,
+                        shop_name,
+                        client_name,
+                        city_label,
+                        bags,
+                        share_city,
+                    )
+                    for (
+                        _shop_id,
+                        shop_name,
+                        delivery_date,
+                        client_name,
+                        city_label,
+                        bags,
+                        _total_price,
+                        share_city,
+                        _share_admin_region,
+                    ) in rows
+                ]
+                safe_city = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in city_name)
+                yield RenderJob(
+                    name=city_name,
+                    filename=f"{safe_city}_{month}.pdf",
+                    builder=build_recipient_invoice_pdf,
+                    cache_id=f"city_invoice/{city_id}",
+                    kwargs=dict(
+                        recipient_label="Commune partenaire",
+                        recipient_name=city_name,
+                        period_month=month_date,
+                        rows=invoice_rows,
+                        vat_rate=vat_rate,
+                        is_preview=preview,
+                        payment_message=f"Facturation commune DringDring {month_date.strftime('%Y-%m')}",
+                    ),
+                )
 
-            zip_buffer.seek(0)
-            filename = f"Billing_Cities_{month}.zip"
-            return StreamingResponse(
-                zip_buffer,
-                media_type="application/zip",
-                headers={
-                    "Content-Disposition": f'attachment; filename="{filename}"',
-                },
-            )
+        yield from _stream_rendered_pdfs(zip_file, _jobs())
+        yield zip_file.close()
+
+    filename = f"Billing_Cities_{month}.zip"
+    return StreamingResponse(
+        _stream(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        },
+    )
 
 
 @router.get("/client-billing/zip")
@@ -742,90 +685,102 @@ def get_client_billing_zip(
             vat_rate = _get_vat_rate(cur, month_date)
             if target_region_id:
                 cur.execute(
-                    """
+                    f"""
                     SELECT DISTINCT c.id, c.name, c.address, c.postal_code, c.city_name
                     FROM client c
                     JOIN city ct ON ct.id = c.city_id
                     JOIN delivery d ON d.client_id = c.id
-                    WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                    WHERE {month_range()}
                       AND ct.admin_region_id = %s
                     ORDER BY c.name
                     """,
-                    (month_date, target_region_id),
+                    (*month_bounds(month_date), target_region_id),
                 )
             else:
                 cur.execute(
-                    """
+                    f"""
                     SELECT DISTINCT c.id, c.name, c.address, c.postal_code, c.city_name
                     FROM client c
                     JOIN delivery d ON d.client_id = c.id
-                    WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                    WHERE {month_range()}
                     ORDER BY c.name
                     """,
-                    (month_date,),
+                    (*month_bounds(month_date),),
                 )
             clients = cur.fetchall()
 
             if not clients:
                 raise HTTPException(status_code=404, detail="No client billing documents found for this period")
 
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                for client_id, client_name, client_address, postal_code, city_name in clients:
-                    try:
-                        cur.execute(
-                            """
-                            SELECT
-                                d.delivery_date,
-                                s.name AS shop_name,
-                                l.bags,
-                                f.total_price,
-                                f.share_client
-                            FROM delivery d
-                            JOIN shop s ON s.id = d.shop_id
-                            JOIN delivery_logistics l ON l.delivery_id = d.id
-                            JOIN delivery_financial f ON f.delivery_id = d.id
-                            WHERE d.client_id = %s
-                              AND date_trunc('month', d.delivery_date) = %s::date
-                            ORDER BY d.delivery_date
-                            """,
-                            (client_id, month_date),
-                        )
-                        rows = cur.fetchall()
-                        if not rows:
-                            zip_file.writestr(
-                                f"EMPTY_{client_name}.txt",
-                                "No deliveries for this period.",
-                            )
-                            continue
-                        pdf_buffer = build_client_monthly_pdf(
-                            client_name=client_name,
-                            client_address=client_address,
-                            client_postal_code=postal_code,
-                            client_city=city_name,
-                            period_month=month_date,
-                            deliveries=rows,
-                            vat_rate=vat_rate,
-                            is_preview=preview,
-                        )
-                        safe_client = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in client_name)
-                        filename = f"{safe_client}_{month}.pdf"
-                        zip_file.writestr(filename, pdf_buffer.getvalue())
-                    except Exception as exc:
-                        zip_file.writestr(
-                            f"ERROR_{client_name}.txt",
-                            f"Could not generate PDF: {str(exc)}",
-                        )
+    def _fetch_rows(cur, client_id, *_client):
+        cur.execute(
+            f"""
+            SELECT
+                d.delivery_date,
+                s.name AS shop_name,
+                l.bags,
+                f.total_price,
+                f.share_client
+            FROM delivery d
+            JOIN shop s ON s.id = d.shop_id
+            JOIN delivery_logistics l ON l.delivery_id = d.id
+            JOIN delivery_financial f ON f.delivery_id = d.id
+            WHERE d.client_id = %s
+              AND {month_range()}
+            ORDER BY d.delivery_date
+            """,
+            (client_id, *month_bounds(month_date)),
+        )
+        return cur.fetchall()
+
+    def _stream():
+        zip_file = ZipStream()
+
+        def _jobs():
+            for (client_id, client_name, client_address, postal_code, city_name), rows, error in _fetch_per_item(
+                clients, _fetch_rows, jwt_claims
+            ):
+                if error is not None:
+                    zip_file.writestr(
+                        f"ERROR_{client_name}.txt",
+                        f"Could not generate PDF: {str(error)}",
+                    )
+                    continue
+                if not rows:
+                    zip_file.writestr(
+                        f"EMPTY_{client_name}.txt",
+                        "No deliveries for this period.",
+                    )
+                    continue
+                safe_client = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in client_name)
+                yield RenderJob(
+                    name=client_name,
+                    filename=f"{safe_client}_{month}.pdf",
+                    builder=build_client_monthly_pdf,
+                    cache_id=f"client_invoice/{client_id}",
+                    kwargs=dict(
+                        client_name=client_name,
+                        client_address=client_address,
+                        client_postal_code=postal_code,
+                        client_city=city_name,
+                        period_month=month_date,
+                        deliveries=rows,
+                        vat_rate=vat_rate,
+                        is_preview=preview,
+                    ),
+                )
 
-            zip_buffer.seek(0)
-            filename = f"Billing_Clients_{month}.zip"
-            return StreamingResponse(
-                zip_buffer,
-                media_type="application/zip",
-                headers={
-                    "Content-Disposition": f'attachment; filename=\"{filename}\"',
-                },
-            )
+        yield from _stream_rendered_pdfs(zip_file, _jobs())
+        yield zip_file.close()
+
+    filename = f"Billing_Clients_{month}.zip"
+    return StreamingResponse(
+        _stream(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename=\"{filename}\"',
+        },
+    )
 
 
 @router.get("/hq-billing")
@@ -889,14 +844,9 @@ def get_hq_billing(
                         LEFT JOIN hq h ON h.id = s.hq_id
                         LEFT JOIN delivery d
                           ON d.shop_id = s.id
-                         AND date_trunc('month', d.delivery_date) = (SELECT month FROM period)
-                        LEFT JOIN LATERAL (
-                            SELECT status
-                            FROM delivery_status
-                            WHERE delivery_id = d.id
-                            ORDER BY updated_at DESC
-                            LIMIT 1
-                        ) st ON true
+                         AND d.delivery_date >= (SELECT month FROM period)
+                         AND d.delivery_date < (SELECT month FROM period) + INTERVAL '1 month'
+                        LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                         LEFT JOIN delivery_logistics l ON l.delivery_id = d.id
                         LEFT JOIN delivery_financial f ON f.delivery_id = d.id
                         LEFT JOIN billing_period bp
@@ -1009,19 +959,13 @@ def get_hq_billing_deliveries(
                   LEFT JOIN city p ON p.id = c.parent_city_id
                 JOIN delivery_logistics l ON l.delivery_id = d.id
                 LEFT JOIN delivery_financial f ON f.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
-                WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+                WHERE {month_range()}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 {filter_clause}
                 ORDER BY s.name, d.delivery_date
                 """,
-                (include_basket_value, month_date, *filter_params),
+                (include_basket_value, *month_bounds(month_date), *filter_params),
             )
             return _rows_to_dicts(cur)
 
@@ -1040,7 +984,7 @@ def get_hq_billing_shops(
         with conn.cursor() as cur:
             month_date = _parse_month(month)
             cur.execute(
-                """
+                f"""
                 SELECT
                     h.name AS hq_name,
                     s.id AS shop_id,
@@ -1056,18 +1000,12 @@ def get_hq_billing_shops(
                 JOIN city c ON c.id = s.city_id
                 LEFT JOIN hq h ON h.id = s.hq_id
                 JOIN delivery_financial f ON f.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 LEFT JOIN billing_period bp
                   ON bp.shop_id = s.id
                  AND bp.period_month = date_trunc('month', d.delivery_date)::date
                 WHERE s.hq_id = %s
-                  AND date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                  AND {month_range()}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 GROUP BY
                     h.name,
@@ -1078,7 +1016,7 @@ def get_hq_billing_shops(
                     bp.id
                 ORDER BY c.name, s.name
                 """,
-                (str(user.hq_id), month_date),
+                (str(user.hq_id), *month_bounds(month_date)),
             )
             return _rows_to_dicts(cur)
 
@@ -1136,7 +1074,8 @@ def get_shop_monthly_pdf(
                     bp.frozen_at,
                     bp.frozen_by,
                     COALESCE(bp.frozen_by_name, u.email),
-                    bp.pdf_url
+                    bp.pdf_url,
+                    bp.pdf_sha256
                 FROM billing_period bp
                 LEFT JOIN auth.users u ON u.id = bp.frozen_by
                 WHERE bp.shop_id = %s
@@ -1297,7 +1236,7 @@ def get_shop_monthly_pdf(
                 # Actually upload_pdf_bytes used bucket="billing-pdf".
                 # pdf_url stored was just the path "shop/{id}/{month}.pdf".
                 try:
-                    pdf_bytes = download_pdf_bytes(bucket="billing-pdf", path=pdf_url)
+                    pdf_bytes = fetch_stored_pdf(bucket="billing-pdf", path=pdf_url, sha256=frozen[4])
 
                     filename = f"DringDring_Shop_{shop_id}_{month}_FROZEN.pdf" # Fallback name
                     # We could try to fetch shop name for better filename,
@@ -1382,23 +1321,17 @@ def get_hq_monthly_pdf(
                 JOIN city c ON c.id = s.city_id
                 LEFT JOIN hq h ON h.id = s.hq_id
                 JOIN delivery_financial f ON f.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 LEFT JOIN billing_period bp
                   ON bp.shop_id = s.id
                  AND bp.period_month = date_trunc('month', d.delivery_date)::date
-                WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                WHERE {month_range()}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 {filter_clause}
                 GROUP BY h.name, s.id, s.name, c.name
                 ORDER BY s.name
                 """,
-                (period_month, *filter_params),
+                (*month_bounds(period_month), *filter_params),
             )
             rows = cur.fetchall()
             vat_rate = _get_vat_rate(cur, period_month)
@@ -1418,19 +1351,13 @@ def get_hq_monthly_pdf(
                 LEFT JOIN hq h ON h.id = s.hq_id
                 JOIN delivery_logistics l ON l.delivery_id = d.id
                 JOIN delivery_financial f ON f.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
-                WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+                WHERE {month_range()}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 {filter_clause}
                 ORDER BY s.name, d.delivery_date
                 """,
-                (period_month, *filter_params),
+                (*month_bounds(period_month), *filter_params),
             )
             delivery_rows = cur.fetchall()
 
@@ -1537,7 +1464,7 @@ def get_city_monthly_pdf(
             city_name = city_row[0]
 
             cur.execute(
-                """
+                f"""
                 SELECT
                     s.id AS shop_id,
                     s.name AS shop_name,
@@ -1552,19 +1479,13 @@ def get_city_monthly_pdf(
                 JOIN shop s ON s.id = d.shop_id
                 JOIN delivery_logistics l ON l.delivery_id = d.id
                 JOIN delivery_financial f ON f.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 WHERE s.city_id = %s
-                  AND date_trunc('month', d.delivery_date) = %s::date
+                  AND {month_range()}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 ORDER BY s.name, d.delivery_date
                 """,
-                (city_id, period_month),
+                (city_id, *month_bounds(period_month)),
             )
             rows = cur.fetchall()
             vat_rate = _get_vat_rate(cur, period_month)
@@ -1623,37 +1544,36 @@ def export_city_billing(
     jwt_claims: str = Depends(get_current_user_claims),
     month: str | None = Query(default=None, pattern=r"^\d{4}-\d{2}$"),
 ):
-    with get_db_connection(jwt_claims) as conn:
-        with conn.cursor() as cur:
-            month_date = _parse_month(month)
-            cur.execute(
-                """
-                SELECT * FROM view_city_billing_shops
-                WHERE date_trunc('month', billing_month) = date_trunc('month', %s::date)
-                """,
-                (month_date,),
-            )
-            return _export_csv(
-                cur,
-                export_columns=[
-                    "shop_name",
-                    "city_name",
-                    "billing_month",
-                    "total_deliveries",
-                    "total_subvention_due",
-                    "total_volume_chf",
-                ],
-                column_labels={
-                    "shop_name": "Commerce",
-                    "city_name": "Commune partenaire",
-                    "billing_month": "Periode",
-                    "total_deliveries": "Livraisons",
-                    "total_subvention_due": "Subvention (CHF)",
-                    "total_volume_chf": "Total CHF",
-                },
-                filename_base="facturation-commune",
-                month_column="billing_month",
-            )
+    month_date = _parse_month(month)
+    stream = CsvStream(
+        jwt_claims,
+        """
+        SELECT * FROM view_city_billing_shops
+        WHERE date_trunc('month', billing_month) = date_trunc('month', %s::date)
+        """,
+        (month_date,),
+    )
+    return _export_csv(
+        stream,
+        export_columns=[
+            "shop_name",
+            "city_name",
+            "billing_month",
+            "total_deliveries",
+            "total_subvention_due",
+            "total_volume_chf",
+        ],
+        column_labels={
+            "shop_name": "Commerce",
+            "city_name": "Commune partenaire",
+            "billing_month": "Periode",
+            "total_deliveries": "Livraisons",
+            "total_subvention_due": "Subvention (CHF)",
+            "total_volume_chf": "Total CHF",
+        },
+        filename_base="facturation-commune",
+        month_column="billing_month",
+    )
 
 
 @router.get("/hq-billing/export")
@@ -1663,81 +1583,74 @@ def export_hq_billing(
     month: str | None = Query(default=None, pattern=r"^\d{4}-\d{2}$"),
     admin_region_id: str | None = Query(default=None),
 ):
-    with get_db_connection(jwt_claims) as conn:
-        with conn.cursor() as cur:
-            month_date = _parse_month(month)
+    month_date = _parse_month(month)
 
-            filter_clause = ""
-            filter_params: list[str] = []
-            amount_expr = "SUM(f.share_city + f.share_admin_region)"
+    filter_clause = ""
+    filter_params: list[str] = []
+    amount_expr = "SUM(f.share_city + f.share_admin_region)"
 
-            if user.role == "hq":
-                if not user.hq_id:
-                    raise HTTPException(status_code=400, detail="HQ id missing")
-                filter_clause = "AND s.hq_id = %s"
-                filter_params.append(str(user.hq_id))
-                amount_expr = "SUM(f.share_admin_region)"
-            elif user.role == "admin_region":
-                if not user.admin_region_id:
-                    raise HTTPException(status_code=400, detail="Admin region id missing")
-                filter_clause = "AND c.admin_region_id = %s"
-                filter_params.append(str(user.admin_region_id))
-            elif user.role == "super_admin" and admin_region_id:
-                filter_clause = "AND c.admin_region_id = %s"
-                filter_params.append(str(admin_region_id))
+    if user.role == "hq":
+        if not user.hq_id:
+            raise HTTPException(status_code=400, detail="HQ id missing")
+        filter_clause = "AND s.hq_id = %s"
+        filter_params.append(str(user.hq_id))
+        amount_expr = "SUM(f.share_admin_region)"
+    elif user.role == "admin_region":
+        if not user.admin_region_id:
+            raise HTTPException(status_code=400, detail="Admin region id missing")
+        filter_clause = "AND c.admin_region_id = %s"
+        filter_params.append(str(user.admin_region_id))
+    elif user.role == "super_admin" and admin_region_id:
+        filter_clause = "AND c.admin_region_id = %s"
+        filter_params.append(str(admin_region_id))
 
-            cur.execute(
-                f"""
-                SELECT
-                    s.name AS shop_name,
-                    c.name AS city_name,
-                    date_trunc('month', d.delivery_date)::date AS billing_month,
-                    COUNT(d.id) AS total_deliveries,
-                    COALESCE({amount_expr}, 0) AS total_subvention_due,
-                    COALESCE(SUM(f.total_price), 0) AS total_volume_chf
-                FROM delivery d
-                JOIN shop s ON s.id = d.shop_id
-                JOIN city c ON c.id = s.city_id
-                JOIN delivery_financial f ON f.delivery_id = d.id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
-                WHERE date_trunc('month', d.delivery_date) = date_trunc('month', %s::date)
-                  AND COALESCE(st.status, '') <> 'cancelled'
-                {filter_clause}
-                GROUP BY
-                    s.name,
-                    c.name,
-                    date_trunc('month', d.delivery_date)::date
-                ORDER BY c.name, s.name
-                """,
-                (month_date, *filter_params),
-            )
-            return _export_csv(
-                cur,
-                export_columns=[
-                    "shop_name",
-                    "city_name",
-                    "billing_month",
-                    "total_deliveries",
-                    "total_subvention_due",
-                    "total_volume_chf",
-                ],
-                column_labels={
-                    "shop_name": "Commerce",
-                    "city_name": "Commune partenaire",
-                    "billing_month": "Periode",
-                    "total_deliveries": "Livraisons",
-                    "total_subvention_due": "Montant du (CHF)",
-                    "total_volume_chf": "Total CHF",
-                },
-                filename_base="facturation-groupe",
-                month_column="billing_month",
-            )
+    stream = CsvStream(
+        jwt_claims,
+        f"""
+        SELECT
+            s.name AS shop_name,
+            c.name AS city_name,
+            date_trunc('month', d.delivery_date)::date AS billing_month,
+            COUNT(d.id) AS total_deliveries,
+            COALESCE({amount_expr}, 0) AS total_subvention_due,
+            COALESCE(SUM(f.total_price), 0) AS total_volume_chf
+        FROM delivery d
+        JOIN shop s ON s.id = d.shop_id
+        JOIN city c ON c.id = s.city_id
+        JOIN delivery_financial f ON f.delivery_id = d.id
+        LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+        WHERE {month_range()}
+          AND COALESCE(st.status, '') <> 'cancelled'
+        {filter_clause}
+        GROUP BY
+            s.name,
+            c.name,
+            date_trunc('month', d.delivery_date)::date
+        ORDER BY c.name, s.name
+        """,
+        (*month_bounds(month_date), *filter_params),
+    )
+    return _export_csv(
+        stream,
+        export_columns=[
+            "shop_name",
+            "city_name",
+            "billing_month",
+            "total_deliveries",
+            "total_subvention_due",
+            "total_volume_chf",
+        ],
+        column_labels={
+            "shop_name": "Commerce",
+            "city_name": "Commune partenaire",
+            "billing_month": "Periode",
+            "total_deliveries": "Livraisons",
+            "total_subvention_due": "Montant du (CHF)",
+            "total_volume_chf": "Total CHF",
+        },
+        filename_base="facturation-groupe",
+        month_column="billing_month",
+    )
 
 
 def _get_vat_rate(cur, period_month: date) -> Decimal:
@@ -1800,24 +1713,60 @@ def _assert_city_period_fully_frozen(cur, city_id: str, period_month: date) -> N
         )
 
 
-def _export_csv(cur, export_columns, column_labels, filename_base, month_column=None):
-    columns = [desc[0] for desc in cur.description]
-    rows = cur.fetchall()
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=";")
-    writer.writerow([column_labels.get(col, col) for col in export_columns])
+def _fetch_per_item(items: list, fetch, jwt_claims: str) -> Iterator[tuple]:
+    """
+    Yield (item, rows, None) or (item, None, error) for each item, in order,
+    with rows = fetch(cur, *item). Items are fetched _ZIP_FETCH_BATCH_SIZE at
+    a time on a short-lived connection: none is held while the documents
+    render and the archive streams. Each fetch runs in a savepoint, so one
+    failed query does not fail the rest of the batch.
+    """
+    for start in range(0, len(items), _ZIP_FETCH_BATCH_SIZE):
+        batch = items[start:start + _ZIP_FETCH_BATCH_SIZE]
+        results = []
+        with get_db_connection(jwt_claims, dedicated=True) as conn:
+            with conn.cursor() as cur:
+                for item in batch:
+                    try:
+                        with conn.transaction():
+                            results.append((item, fetch(cur, *item), None))
+                    except Exception as exc:
+                        results.append((item, None, exc))
+        yield from results
 
-    for row in rows:
+
+def _stream_rendered_pdfs(zip_file: ZipStream, jobs) -> Iterator[bytes]:
+    """
+    Render the jobs in the PDF pool and add each result to the archive (or an
+    ERROR_<name>.txt entry when rendering failed or timed out), yielding the
+    archive bytes produced so far after every document.
+    """
+    for job, pdf_bytes, error in render_jobs(jobs):
+        if error is not None:
+            zip_file.writestr(
+                f"ERROR_{job.name}.txt",
+                f"Could not generate PDF: {str(error)}",
+            )
+        else:
+            zip_file.writestr(job.filename, pdf_bytes)
+        yield zip_file.drain()
+
+
+def _export_csv(stream: CsvStream, export_columns, column_labels, filename_base, month_column=None):
+    columns = stream.columns
+
+    def _format_row(row):
         row_dict = dict(zip(columns, row))
-        csv_row = []
-        for col in export_columns:
-            csv_row.append(_csv_value(row_dict.get(col)))
-        writer.writerow(csv_row)
-
-    filename = _build_filename(filename_base, rows, columns, month_column)
-    response = Response(content=output.getvalue(), media_type="text/csv")
-    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-    return response
+        return [_csv_value(row_dict.get(col)) for col in export_columns]
+
+    # Exports cover one month: the first chunk is enough to name the file.
+    filename = _build_filename(filename_base, stream.first_rows, columns, month_column)
+    return stream.response(
+        filename,
+        [column_labels.get(col, col) for col in export_columns],
+        _format_row,
+        delimiter=";",
+    )
 
 
 def _csv_value(value):
@@ -4,9 +4,8 @@ from pydantic import BaseModel
 import uuid
 import logging
 
-import httpx
-
 from app.core.guards import require_admin_user, require_hq_user
+from app.core import http_client
 from app.core.config import settings
 from app.core.security import get_current_user_claims
 from app.db.session import get_db_connection
@@ -393,7 +392,7 @@ def create_shop(
                     "hq_id": shop.hq_id,
                 },
             }
-            response = httpx.post(url, headers=headers, json=payload, timeout=10)
+            response = http_client.post(url, headers=headers, json=payload, timeout=10)
             if response.status_code < 400:
                 user_created = True
             else:
@@ -11,6 +11,7 @@ from app.core.guards import (
     require_customer_user,
     require_hq_user,
 )
+from app.core.periods import month_bounds, month_range
 from app.core.security import get_current_user, get_current_user_claims
 from app.db.session import get_db_connection
 
@@ -85,11 +86,8 @@ def get_eco_stats(
 
     with get_db_connection(jwt_claims) as conn:
         with conn.cursor() as cur:
-            where = [
-                "d.delivery_date >= %s",
-                "d.delivery_date < (%s::date + interval '1 month')",
-            ]
-            params = [month_start, month_start]
+            where = [month_range()]
+            params = [*month_bounds(month_start)]
 
             if role_filter and role_filter[1]:
                 where.append(f"d.{role_filter[0]} = %s")
@@ -102,13 +100,7 @@ def get_eco_stats(
                     COALESCE(SUM(COALESCE(d.co2_saved_kg, 0)), 0) AS co2_saved_kg,
                     COUNT(*) AS deliveries
                 FROM delivery d
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 WHERE {" AND ".join(where)}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 """,
@@ -139,7 +131,7 @@ def get_shop_stats(
     with get_db_connection(jwt_claims) as conn:
         with conn.cursor() as cur:
             cur.execute(
-                """
+                f"""
                 WITH base AS (
                     SELECT
                         d.id,
@@ -153,16 +145,9 @@ def get_shop_stats(
                     FROM delivery d
                     JOIN delivery_logistics l ON l.delivery_id = d.id
                     LEFT JOIN delivery_financial f ON f.delivery_id = d.id
-                    LEFT JOIN LATERAL (
-                        SELECT status
-                        FROM delivery_status
-                        WHERE delivery_id = d.id
-                        ORDER BY updated_at DESC
-                        LIMIT 1
-                    ) st ON true
+                    LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                     WHERE d.shop_id = %s
-                      AND date_trunc('month', d.delivery_date)
-                        = date_trunc('month', %s::date)
+                      AND {month_range()}
                       AND COALESCE(st.status, '') <> 'cancelled'
                 ),
                 client_counts AS (
@@ -195,12 +180,12 @@ def get_shop_stats(
                     (SELECT delivery_day FROM peak_day) AS peak_day,
                     (SELECT deliveries FROM peak_day) AS peak_day_deliveries
                 """,
-                (str(shop_id), month_start),
+                (str(shop_id), *month_bounds(month_start)),
             )
             stats_row = cur.fetchone()
 
             cur.execute(
-                """
+                f"""
                 WITH base AS (
                     SELECT
                         d.client_id,
@@ -209,16 +194,9 @@ def get_shop_stats(
                         COALESCE(st.status, '') AS status
                     FROM delivery d
                     JOIN delivery_logistics l ON l.delivery_id = d.id
-                    LEFT JOIN LATERAL (
-                        SELECT status
-                        FROM delivery_status
-                        WHERE delivery_id = d.id
-                        ORDER BY updated_at DESC
-                        LIMIT 1
-                    ) st ON true
+                    LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                     WHERE d.shop_id = %s
-                      AND date_trunc('month', d.delivery_date)
-                        = date_trunc('month', %s::date)
+                      AND {month_range()}
                       AND d.client_id IS NOT NULL
                       AND COALESCE(st.status, '') <> 'cancelled'
                 )
@@ -232,7 +210,7 @@ def get_shop_stats(
                 ORDER BY deliveries DESC, bags DESC
                 LIMIT 3
                 """,
-                (str(shop_id), month_start),
+                (str(shop_id), *month_bounds(month_start)),
             )
             top_clients = [
                 {
@@ -245,22 +223,15 @@ def get_shop_stats(
             ]
 
             cur.execute(
-                """
+                f"""
                 SELECT COUNT(*)
                 FROM delivery d
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 WHERE d.shop_id = %s
-                  AND date_trunc('month', d.delivery_date)
-                    = date_trunc('month', %s::date)
+                  AND {month_range()}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 """,
-                (str(shop_id), prev_month_start),
+                (str(shop_id), *month_bounds(prev_month_start)),
             )
             prev_deliveries = int(cur.fetchone()[0] or 0)
 
@@ -325,7 +296,7 @@ def get_city_stats(
     with get_db_connection(jwt_claims) as conn:
         with conn.cursor() as cur:
             cur.execute(
-                """
+                f"""
                 WITH base AS (
                     SELECT
                         d.id,
@@ -341,16 +312,9 @@ def get_city_stats(
                     JOIN delivery_logistics l ON l.delivery_id = d.id
                     JOIN city c ON c.id = d.city_id
                     LEFT JOIN delivery_financial f ON f.delivery_id = d.id
-                    LEFT JOIN LATERAL (
-                        SELECT status
-                        FROM delivery_status
-                        WHERE delivery_id = d.id
-                        ORDER BY updated_at DESC
-                        LIMIT 1
-                    ) st ON true
+                    LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                     WHERE (c.id = %s OR c.parent_city_id = %s)
-                      AND date_trunc('month', d.delivery_date)
-                        = date_trunc('month', %s::date)
+                      AND {month_range()}
                       AND COALESCE(st.status, '') <> 'cancelled'
                 ),
                 daily_counts AS (
@@ -370,28 +334,21 @@ def get_city_stats(
                     (SELECT COALESCE(SUM(share_city), 0) FROM base) AS total_subvention,
                     (SELECT COALESCE(SUM(total_price), 0) FROM base) AS total_volume
                 """,
-                (str(city_id), str(city_id), month_start),
+                (str(city_id), str(city_id), *month_bounds(month_start)),
             )
             stats_row = cur.fetchone()
 
             cur.execute(
-                """
+                f"""
                 SELECT COUNT(*)
                 FROM delivery d
                 JOIN city c ON c.id = d.city_id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 WHERE (c.id = %s OR c.parent_city_id = %s)
-                  AND date_trunc('month', d.delivery_date)
-                    = date_trunc('month', %s::date)
+                  AND {month_range()}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 """,
-                (str(city_id), str(city_id), prev_month_start),
+                (str(city_id), str(city_id), *month_bounds(prev_month_start)),
             )
             prev_deliveries = int(cur.fetchone()[0] or 0)
 
@@ -453,7 +410,7 @@ def get_hq_stats(
     with get_db_connection(jwt_claims) as conn:
         with conn.cursor() as cur:
             cur.execute(
-                """
+                f"""
                 WITH base AS (
                     SELECT
                         d.id,
@@ -471,16 +428,9 @@ def get_hq_stats(
                     JOIN shop s ON s.id = d.shop_id
                     JOIN delivery_logistics l ON l.delivery_id = d.id
                     LEFT JOIN delivery_financial f ON f.delivery_id = d.id
-                    LEFT JOIN LATERAL (
-                        SELECT status
-                        FROM delivery_status
-                        WHERE delivery_id = d.id
-                        ORDER BY updated_at DESC
-                        LIMIT 1
-                    ) st ON true
+                    LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                     WHERE s.hq_id = %s
-                      AND date_trunc('month', d.delivery_date)
-                        = date_trunc('month', %s::date)
+                      AND {month_range()}
                       AND COALESCE(st.status, '') <> 'cancelled'
                 ),
                 daily_counts AS (
@@ -501,28 +451,21 @@ def get_hq_stats(
                     (SELECT COALESCE(AVG(NULLIF(basket_value, 0)), 0) FROM base) AS average_basket_value,
                     (SELECT COUNT(*) FROM daily_counts) AS active_days
                 """,
-                (str(hq_id), month_start),
+                (str(hq_id), *month_bounds(month_start)),
             )
             stats_row = cur.fetchone()
 
             cur.execute(
-                """
+                f"""
                 SELECT COUNT(*)
                 FROM delivery d
                 JOIN shop s ON s.id = d.shop_id
-                LEFT JOIN LATERAL (
-                    SELECT status
-                    FROM delivery_status
-                    WHERE delivery_id = d.id
-                    ORDER BY updated_at DESC
-                    LIMIT 1
-                ) st ON true
+                LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
                 WHERE s.hq_id = %s
-                  AND date_trunc('month', d.delivery_date)
-                    = date_trunc('month', %s::date)
+                  AND {month_range()}
                   AND COALESCE(st.status, '') <> 'cancelled'
                 """,
-                (str(hq_id), prev_month_start),
+                (str(hq_id), *month_bounds(prev_month_start)),
             )
             prev_deliveries = int(cur.fetchone()[0] or 0)
 
@@ -583,7 +526,7 @@ def get_customer_stats(
     with get_db_connection(jwt_claims) as conn:
         with conn.cursor() as cur:
             cur.execute(
-                """
+                f"""
                 WITH base AS (
                     SELECT
                         d.id,
@@ -596,8 +539,7 @@ def get_customer_stats(
                     JOIN delivery_logistics l ON l.delivery_id = d.id
                     JOIN shop s ON s.id = d.shop_id
                     WHERE d.client_id = %s
-                      AND date_trunc('month', d.delivery_date)
-                        = date_trunc('month', %s::date)
+                      AND {month_range()}
                 ),
                 shop_counts AS (
                     SELECT shop_id, shop_name, COUNT(*) AS deliveries
@@ -632,7 +574,7 @@ def get_customer_stats(
                     (SELECT day_of_week FROM top_day) AS top_day,
                     (SELECT deliveries FROM top_day) AS top_day_deliveries
                 """,
-                (str(client_id), month_start),
+                (str(client_id), *month_bounds(month_start)),
             )
             row = cur.fetchone()
 
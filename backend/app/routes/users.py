@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import httpx
 import logging
 
+from app.core import http_client
 from app.core.config import settings
 from app.core.guards import require_super_admin
+from app.core.identity import invalidate_identity
 from app.core.security import get_current_user_claims
 from app.db.session import get_db_connection
 from app.schemas.me import MeResponse
@@ -35,7 +36,7 @@ def list_users(
     }
 
     try:
-        response = httpx.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, headers=headers, timeout=10)
         response.raise_for_status()
         
         users_data = response.json().get("users", [])
@@ -58,6 +59,8 @@ def list_users(
             
         return results
         
+    except http_client.HostUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to fetch users: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -106,7 +109,7 @@ def update_user_role(
     }
 
     try:
-        response = httpx.put(url, headers=headers, json=body, timeout=10)
+        response = http_client.put(url, headers=headers, json=body, timeout=10)
         response.raise_for_status()
         with get_db_connection(jwt_claims) as conn:
             with conn:
@@ -131,7 +134,10 @@ def update_user_role(
                             payload.hq_id,
                         ),
                     )
+        invalidate_identity(user_id)
         return {"message": "User updated", "user": response.json()}
+    except http_client.HostUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to update user: {e}")
         raise HTTPException(status_code=500, detail=str(e))
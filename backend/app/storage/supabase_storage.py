@@ -1,49 +1,155 @@
+"""
+Supabase storage access.
+
+Every transfer goes through one process-wide HTTP/1.1 keep-alive client
+(STORAGE_MAX_CONNECTIONS connections) instead of a new connection per
+object. Transient failures (network errors, 408/429/5xx) are retried
+STORAGE_RETRIES times with exponential backoff; uploads are upserts, so a
+retry never duplicates an object. upload_many()/download_many() run
+STORAGE_MAX_CONCURRENCY transfers at a time.
+
+With STORAGE_LOCAL_DIR set, objects are files under <dir>/<bucket>/<path>
+instead (tests, local development without Supabase).
+
+All failures raise RuntimeError.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
 import json
-import urllib.error
-import urllib.request
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Iterable
+
+import httpx
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
 
-def upload_file_bytes(*, bucket: str, path: str, data: bytes, content_type: str) -> str:
+_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+# Buckets known to exist: "Bucket not found" is only answered by creating
+# the bucket once, not on every failed upload.
+_known_buckets: set[str] = set()
+
+
+class _StorageError(RuntimeError):
+    def __init__(self, message: str, status_code: int | None = None, detail: str = ""):
+        super().__init__(message)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _get_client() -> httpx.Client:
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                timeout=httpx.Timeout(settings.STORAGE_TIMEOUT_SECONDS, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=settings.STORAGE_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.STORAGE_MAX_CONNECTIONS,
+                ),
+            )
+    return _client
+
+
+def close_storage_client() -> None:
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+def _credentials() -> tuple[str, str]:
     supabase_url = settings.SUPABASE_URL
     service_key = settings.SUPABASE_SERVICE_KEY
     if not supabase_url or not service_key:
         raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY")
+    return supabase_url.rstrip("/"), service_key
+
+
+def _request(action: str, method: str, url: str, *, headers: dict, content: bytes | None = None) -> bytes:
+    attempts = max(settings.STORAGE_RETRIES, 0) + 1
+    for attempt in range(attempts):
+        try:
+            response = _get_client().request(method, url, headers=headers, content=content)
+        except httpx.TransportError as exc:
+            error = _StorageError(f"Supabase {action} failed: {exc}")
+        else:
+            if response.status_code < 400:
+                return response.content
+            detail = response.text
+            error = _StorageError(
+                f"Supabase {action} failed ({response.status_code}): {detail}",
+                status_code=response.status_code,
+                detail=detail,
+            )
+            if response.status_code not in _RETRY_STATUSES:
+                raise error
+        if attempt + 1 < attempts:
+            delay = settings.STORAGE_RETRY_BACKOFF_SECONDS * 2 ** attempt
+            logger.warning("%s; retrying in %.1fs", error, delay)
+            time.sleep(delay)
+    raise error
+
+
+def _local_path(bucket: str, path: str) -> Path:
+    root = Path(settings.STORAGE_LOCAL_DIR).resolve()
+    target = (root / bucket / path).resolve()
+    if root not in target.parents:
+        raise RuntimeError(f"Invalid storage path: {bucket}/{path}")
+    return target
 
-    base_url = supabase_url.rstrip("/")
+
+def upload_file_bytes(*, bucket: str, path: str, data: bytes, content_type: str) -> str:
+    if settings.STORAGE_LOCAL_DIR:
+        target = _local_path(bucket, path)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, target)
+        except OSError as exc:
+            raise RuntimeError(f"Local storage upload failed: {exc}") from exc
+        return path
+
+    base_url, service_key = _credentials()
 
     def _upload() -> None:
-        object_url = f"{base_url}/storage/v1/object/{bucket}/{path}"
-        headers = {
-            "Authorization": f"Bearer {service_key}",
-            "apikey": service_key,
-            "Content-Type": content_type,
-            "x-upsert": "true",
-        }
-        request = urllib.request.Request(
-            object_url,
-            data=data,
-            headers=headers,
-            method="POST",
+        _request(
+            "upload",
+            "POST",
+            f"{base_url}/storage/v1/object/{bucket}/{path}",
+            headers={
+                "Authorization": f"Bearer {service_key}",
+                "apikey": service_key,
+                "Content-Type": content_type,
+                "x-upsert": "true",
+            },
+            content=data,
         )
-        with urllib.request.urlopen(request, timeout=30) as response:
-            response.read()
 
     try:
         _upload()
-    except urllib.error.HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="ignore")
-        if "Bucket not found" in detail:
-            _ensure_bucket(base_url=base_url, service_key=service_key, bucket=bucket)
-            _upload()
-        else:
-            raise RuntimeError(
-                f"Supabase upload failed ({exc.code}): {detail}"
-            ) from exc
-    except urllib.error.URLError as exc:
-        raise RuntimeError(f"Supabase upload failed: {exc.reason}") from exc
-
+    except _StorageError as exc:
+        if "Bucket not found" not in exc.detail:
+            raise
+        if bucket in _known_buckets:
+            # Deleted behind our back: recreated on the next upload.
+            _known_buckets.discard(bucket)
+            raise
+        _ensure_bucket(base_url=base_url, service_key=service_key, bucket=bucket)
+        _upload()
+    _known_buckets.add(bucket)
     return path
 
 
@@ -57,61 +163,83 @@ def upload_pdf_bytes(*, bucket: str, path: str, data: bytes) -> str:
 
 
 def download_pdf_bytes(*, bucket: str, path: str) -> bytes:
-    supabase_url = settings.SUPABASE_URL
-    service_key = settings.SUPABASE_SERVICE_KEY
-    if not supabase_url or not service_key:
-        raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY")
-
-    base_url = supabase_url.rstrip("/")
-    object_url = f"{base_url}/storage/v1/object/{bucket}/{path}"
-    headers = {
-        "Authorization": f"Bearer {service_key}",
-        "apikey": service_key,
-    }
-    
-    request = urllib.request.Request(
-        object_url,
-        headers=headers,
-        method="GET",
+    if settings.STORAGE_LOCAL_DIR:
+        try:
+            return _local_path(bucket, path).read_bytes()
+        except OSError as exc:
+            raise RuntimeError(f"Local storage download failed: {bucket}/{path}: {exc.strerror}") from exc
+
+    base_url, service_key = _credentials()
+    return _request(
+        "download",
+        "GET",
+        f"{base_url}/storage/v1/object/{bucket}/{path}",
+        headers={
+            "Authorization": f"Bearer {service_key}",
+            "apikey": service_key,
+        },
     )
-    
-    try:
-        with urllib.request.urlopen(request, timeout=30) as response:
-            return response.read()
-    except urllib.error.HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="ignore")
-        raise RuntimeError(
-            f"Supabase download failed ({exc.code}): {detail}"
-        ) from exc
-    except urllib.error.URLError as exc:
-        raise RuntimeError(f"Supabase download failed: {exc.reason}") from exc
 
 
 def download_file_bytes(*, bucket: str, path: str) -> bytes:
     return download_pdf_bytes(bucket=bucket, path=path)
 
 
+def _run_concurrently(transfer, items: list) -> list:
+    if not items:
+        return []
+    workers = max(min(settings.STORAGE_MAX_CONCURRENCY, len(items)), 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage") as executor:
+        return list(executor.map(transfer, items))
+
+
+def upload_many(items: Iterable[tuple[str, str, bytes, str]]) -> list[RuntimeError | None]:
+    """
+    Upload (bucket, path, data, content_type) objects concurrently. Returns,
+    in order, None for each stored object or the RuntimeError it failed with.
+    """
+
+    def _upload(item) -> RuntimeError | None:
+        bucket, path, data, content_type = item
+        try:
+            upload_file_bytes(bucket=bucket, path=path, data=data, content_type=content_type)
+        except RuntimeError as exc:
+            return exc
+        return None
+
+    return _run_concurrently(_upload, list(items))
+
+
+def download_many(items: Iterable[tuple[str, str]]) -> list[bytes | RuntimeError]:
+    """
+    Download (bucket, path) objects concurrently. Returns, in order, the
+    bytes of each object or the RuntimeError it failed with.
+    """
+
+    def _download(item) -> bytes | RuntimeError:
+        bucket, path = item
+        try:
+            return download_file_bytes(bucket=bucket, path=path)
+        except RuntimeError as exc:
+            return exc
+
+    return _run_concurrently(_download, list(items))
+
+
 def _ensure_bucket(*, base_url: str, service_key: str, bucket: str) -> None:
-    bucket_url = f"{base_url}/storage/v1/bucket"
-    payload = json.dumps({"id": bucket, "name": bucket, "public": False}).encode("utf-8")
-    headers = {
-        "Authorization": f"Bearer {service_key}",
-        "apikey": service_key,
-        "Content-Type": "application/json",
-    }
-    request = urllib.request.Request(
-        bucket_url,
-        data=payload,
-        headers=headers,
-        method="POST",
-    )
     try:
-        with urllib.request.urlopen(request, timeout=30) as response:
-            response.read()
-    except urllib.error.HTTPError as exc:
-        if exc.code in (400, 409):
-            return
-        detail = exc.read().decode("utf-8", errors="ignore")
-        raise RuntimeError(
-            f"Supabase bucket create failed ({exc.code}): {detail}"
-        ) from exc
+        _request(
+            "bucket create",
+            "POST",
+            f"{base_url}/storage/v1/bucket",
+            headers={
+                "Authorization": f"Bearer {service_key}",
+                "apikey": service_key,
+                "Content-Type": "application/json",
+            },
+            content=json.dumps({"id": bucket, "name": bucket, "public": False}).encode("utf-8"),
+        )
+    except _StorageError as exc:
+        if exc.status_code not in (400, 409):
+            raise
+    _known_buckets.add(bucket)
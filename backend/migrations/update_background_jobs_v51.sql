@@ -0,0 +1,66 @@
+-- Background jobs: long region operations (bulk freeze, billing aggregation)
+-- run out of the HTTP request, one item per unit of work (shop or region)
+
+CREATE TABLE IF NOT EXISTS public.background_job (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  kind TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued'
+    CHECK (status IN ('queued', 'running', 'completed', 'cancelled', 'failed')),
+  admin_region_id UUID REFERENCES public.admin_region(id) ON DELETE CASCADE,
+  params JSONB NOT NULL DEFAULT '{}'::jsonb,
+  cancel_requested BOOLEAN NOT NULL DEFAULT false,
+  error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  created_by UUID,
+  started_at TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.background_job_item (
+  job_id UUID NOT NULL REFERENCES public.background_job(id) ON DELETE CASCADE,
+  item_key TEXT NOT NULL,
+  label TEXT,
+  status TEXT NOT NULL DEFAULT 'pending'
+    CHECK (status IN ('pending', 'running', 'done', 'skipped', 'failed', 'cancelled')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  result JSONB,
+  error TEXT,
+  started_at TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ,
+  PRIMARY KEY (job_id, item_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_background_job_region_created
+  ON public.background_job (admin_region_id, created_at DESC);
+
+ALTER TABLE public.background_job ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.background_job_item ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS background_job_manage_policy ON public.background_job;
+CREATE POLICY background_job_manage_policy ON public.background_job
+  FOR ALL
+  USING (
+    current_setting('request.jwt.claims', true)::jsonb ->> 'role' = 'service_role'
+    OR current_setting('request.jwt.claims', true)::jsonb -> 'app_metadata' ->> 'role'
+      IN ('super_admin', 'admin_region')
+  )
+  WITH CHECK (
+    current_setting('request.jwt.claims', true)::jsonb ->> 'role' = 'service_role'
+    OR current_setting('request.jwt.claims', true)::jsonb -> 'app_metadata' ->> 'role'
+      IN ('super_admin', 'admin_region')
+  );
+
+DROP POLICY IF EXISTS background_job_item_manage_policy ON public.background_job_item;
+CREATE POLICY background_job_item_manage_policy ON public.background_job_item
+  FOR ALL
+  USING (
+    current_setting('request.jwt.claims', true)::jsonb ->> 'role' = 'service_role'
+    OR current_setting('request.jwt.claims', true)::jsonb -> 'app_metadata' ->> 'role'
+      IN ('super_admin', 'admin_region')
+  )
+  WITH CHECK (
+    current_setting('request.jwt.claims', true)::jsonb ->> 'role' = 'service_role'
+    OR current_setting('request.jwt.claims', true)::jsonb -> 'app_metadata' ->> 'role'
+      IN ('super_admin', 'admin_region')
+  );
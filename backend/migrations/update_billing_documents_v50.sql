@@ -0,0 +1,4 @@
+-- Content hash of each billing document (header + lines) so incremental
+-- aggregation only rewrites documents whose deliveries changed
+ALTER TABLE public.billing_document
+ADD COLUMN IF NOT EXISTS lines_sha256 TEXT;
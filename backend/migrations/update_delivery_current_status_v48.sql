@@ -0,0 +1,168 @@
+-- Current delivery status projection (one row per delivery), kept in sync from
+-- the delivery_status history so listings join it instead of sorting history per row
+
+CREATE TABLE IF NOT EXISTS public.delivery_current_status (
+    delivery_id UUID PRIMARY KEY REFERENCES public.delivery(id) ON DELETE CASCADE,
+    status TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_delivery_current_status_status
+ON public.delivery_current_status (status);
+
+CREATE INDEX IF NOT EXISTS idx_delivery_status_delivery_id_updated_at
+ON public.delivery_status (delivery_id, updated_at DESC);
+
+-- Recompute the projection row of one delivery from its history.
+-- With only_if_newer, an older concurrent insert never overwrites a newer status.
+CREATE OR REPLACE FUNCTION public.refresh_delivery_current_status(
+  p_delivery_id UUID,
+  only_if_newer BOOLEAN DEFAULT false
+)
+RETURNS void AS $$
+BEGIN
+  IF p_delivery_id IS NULL THEN
+    RETURN;
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM public.delivery_status WHERE delivery_id = p_delivery_id) THEN
+    DELETE FROM public.delivery_current_status WHERE delivery_id = p_delivery_id;
+    RETURN;
+  END IF;
+
+  INSERT INTO public.delivery_current_status AS dcs (delivery_id, status, updated_at)
+  SELECT delivery_id, status, updated_at
+  FROM public.delivery_status
+  WHERE delivery_id = p_delivery_id
+  ORDER BY updated_at DESC
+  LIMIT 1
+  ON CONFLICT (delivery_id) DO UPDATE
+  SET status = EXCLUDED.status,
+      updated_at = EXCLUDED.updated_at
+  WHERE NOT only_if_newer
+     OR (EXCLUDED.updated_at >= dcs.updated_at) IS NOT FALSE;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION public.sync_delivery_current_status()
+RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM public.refresh_delivery_current_status(NEW.delivery_id, true);
+    RETURN NEW;
+  END IF;
+
+  PERFORM public.refresh_delivery_current_status(OLD.delivery_id);
+  IF TG_OP = 'UPDATE' THEN
+    IF NEW.delivery_id IS DISTINCT FROM OLD.delivery_id THEN
+      PERFORM public.refresh_delivery_current_status(NEW.delivery_id);
+    END IF;
+    RETURN NEW;
+  END IF;
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Only the trigger runs these (as their owner); they are not an RPC endpoint.
+REVOKE EXECUTE ON FUNCTION public.refresh_delivery_current_status(UUID, BOOLEAN) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION public.sync_delivery_current_status() FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+    REVOKE EXECUTE ON FUNCTION public.refresh_delivery_current_status(UUID, BOOLEAN) FROM anon;
+    REVOKE EXECUTE ON FUNCTION public.sync_delivery_current_status() FROM anon;
+  END IF;
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+    REVOKE EXECUTE ON FUNCTION public.refresh_delivery_current_status(UUID, BOOLEAN) FROM authenticated;
+    REVOKE EXECUTE ON FUNCTION public.sync_delivery_current_status() FROM authenticated;
+  END IF;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_delivery_current_status ON public.delivery_status;
+CREATE TRIGGER trg_delivery_current_status
+AFTER INSERT OR UPDATE OR DELETE ON public.delivery_status
+FOR EACH ROW EXECUTE FUNCTION public.sync_delivery_current_status();
+
+-- Backfill from existing history
+INSERT INTO public.delivery_current_status (delivery_id, status, updated_at)
+SELECT DISTINCT ON (delivery_id) delivery_id, status, updated_at
+FROM public.delivery_status
+WHERE delivery_id IS NOT NULL
+ORDER BY delivery_id, updated_at DESC
+ON CONFLICT (delivery_id) DO UPDATE
+SET status = EXCLUDED.status,
+    updated_at = EXCLUDED.updated_at;
+
+-- Rows are visible whenever the underlying delivery is (delivery RLS applies in the subquery)
+ALTER TABLE public.delivery_current_status ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS delivery_current_status_select_policy ON public.delivery_current_status;
+CREATE POLICY delivery_current_status_select_policy ON public.delivery_current_status
+  FOR SELECT
+  USING (
+    EXISTS (
+      SELECT 1
+      FROM public.delivery d
+      WHERE d.id = delivery_current_status.delivery_id
+    )
+  );
+
+-- Billing views read the projection instead of sorting history per delivery
+CREATE OR REPLACE VIEW public.view_city_billing_shops
+WITH (security_invoker = true) AS
+SELECT
+    s.id AS shop_id,
+    s.name AS shop_name,
+    c.id AS city_id,
+    c.name AS city_name,
+    date_trunc('month', d.delivery_date)::date AS billing_month,
+    COUNT(d.id) AS total_deliveries,
+    SUM(f.share_city) AS total_subvention_due,
+    SUM(f.total_price) AS total_volume_chf
+FROM delivery d
+JOIN shop s ON s.id = d.shop_id
+JOIN city c ON c.id = s.city_id
+JOIN delivery_financial f ON f.delivery_id = d.id
+LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+WHERE COALESCE(st.status, '') <> 'cancelled'
+GROUP BY s.id, s.name, c.id, c.name, date_trunc('month', d.delivery_date)::date;
+
+CREATE OR REPLACE VIEW public.view_city_billing
+WITH (security_invoker = true) AS
+SELECT
+    c.id AS city_id,
+    c.name AS city_name,
+    date_trunc('month', d.delivery_date)::date AS billing_month,
+    COUNT(d.id) AS total_deliveries,
+    SUM(f.share_city) AS total_amount_due,
+    SUM(f.total_price) AS total_volume_chf
+FROM delivery d
+JOIN shop s ON s.id = d.shop_id
+JOIN city c ON c.id = s.city_id
+JOIN delivery_financial f ON f.delivery_id = d.id
+LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+WHERE COALESCE(st.status, '') <> 'cancelled'
+GROUP BY c.id, c.name, date_trunc('month', d.delivery_date)::date;
+
+CREATE OR REPLACE VIEW public.view_hq_billing_shops
+WITH (security_invoker = true) AS
+SELECT
+    h.name AS hq_name,
+    s.id AS shop_id,
+    s.name AS shop_name,
+    c.name AS city_name,
+    date_trunc('month', d.delivery_date)::date AS billing_month,
+    COUNT(d.id) AS total_deliveries,
+    SUM(f.share_city + f.share_admin_region) AS total_subvention_due,
+    SUM(f.total_price) AS total_volume_chf,
+    (bp.id IS NOT NULL) AS is_frozen
+FROM delivery d
+JOIN shop s ON s.id = d.shop_id
+JOIN city c ON c.id = s.city_id
+LEFT JOIN hq h ON h.id = s.hq_id
+JOIN delivery_financial f ON f.delivery_id = d.id
+LEFT JOIN billing_period bp ON bp.shop_id = s.id AND bp.period_month = date_trunc('month', d.delivery_date)::date
+LEFT JOIN delivery_current_status st ON st.delivery_id = d.id
+WHERE COALESCE(st.status, '') <> 'cancelled'
+GROUP BY h.name, s.id, s.name, c.name, date_trunc('month', d.delivery_date)::date, bp.id;
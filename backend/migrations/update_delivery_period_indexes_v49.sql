@@ -0,0 +1,25 @@
+-- Composite indexes for monthly delivery filters
+-- (queries use delivery_date >= month_start AND delivery_date < next_month_start)
+
+CREATE INDEX IF NOT EXISTS idx_delivery_shop_date
+ON public.delivery (shop_id, delivery_date);
+
+CREATE INDEX IF NOT EXISTS idx_delivery_admin_region_date
+ON public.delivery (admin_region_id, delivery_date);
+
+CREATE INDEX IF NOT EXISTS idx_delivery_city_date
+ON public.delivery (city_id, delivery_date);
+
+CREATE INDEX IF NOT EXISTS idx_delivery_hq_date
+ON public.delivery (hq_id, delivery_date);
+
+CREATE INDEX IF NOT EXISTS idx_delivery_courier_date
+ON public.delivery (courier_id, delivery_date);
+
+CREATE INDEX IF NOT EXISTS idx_delivery_client_date
+ON public.delivery (client_id, delivery_date);
+
+CREATE INDEX IF NOT EXISTS idx_delivery_date
+ON public.delivery (delivery_date);
+
+ANALYZE public.delivery;
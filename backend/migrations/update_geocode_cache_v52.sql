@@ -0,0 +1,47 @@
+-- Geocoding cache: normalized address -> coordinates (NULL when geo.admin.ch
+-- found nothing), shared by every API instance and the geo backfill script.
+-- Kept in the `private` schema, which PostgREST does not expose: only the
+-- backend reads or writes it.
+
+CREATE SCHEMA IF NOT EXISTS private;
+REVOKE ALL ON SCHEMA private FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+    REVOKE ALL ON SCHEMA private FROM anon;
+  END IF;
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+    REVOKE ALL ON SCHEMA private FROM authenticated;
+  END IF;
+END $$;
+
+-- First revision of this migration created the cache in public.
+DROP TABLE IF EXISTS public.geocode_cache;
+
+CREATE TABLE IF NOT EXISTS private.geocode_cache (
+  query_key TEXT PRIMARY KEY,
+  lat DOUBLE PRECISION,
+  lng DOUBLE PRECISION,
+  expires_at TIMESTAMPTZ NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  CHECK ((lat IS NULL) = (lng IS NULL))
+);
+
+CREATE INDEX IF NOT EXISTS idx_geocode_cache_expires_at
+  ON private.geocode_cache (expires_at);
+
+REVOKE ALL ON private.geocode_cache FROM PUBLIC;
+
+ALTER TABLE private.geocode_cache ENABLE ROW LEVEL SECURITY;
+
+-- Only the backend can reach the schema; it runs with the caller's claims.
+DROP POLICY IF EXISTS geocode_cache_manage_policy ON private.geocode_cache;
+CREATE POLICY geocode_cache_manage_policy ON private.geocode_cache
+  FOR ALL
+  USING (
+    current_setting('request.jwt.claims', true)::jsonb ->> 'role' IN ('service_role', 'authenticated')
+  )
+  WITH CHECK (
+    current_setting('request.jwt.claims', true)::jsonb ->> 'role' IN ('service_role', 'authenticated')
+  );
@@ -0,0 +1,45 @@
+-- Route distance cache: OSRM driving distance between two points (shop ->
+-- client), keyed by their coordinates rounded to ~1 m, shared by every API
+-- instance and the geo backfill script. Kept in the `private` schema, which
+-- PostgREST does not expose (see update_geocode_cache_v52.sql).
+
+CREATE SCHEMA IF NOT EXISTS private;
+REVOKE ALL ON SCHEMA private FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+    REVOKE ALL ON SCHEMA private FROM anon;
+  END IF;
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+    REVOKE ALL ON SCHEMA private FROM authenticated;
+  END IF;
+END $$;
+
+-- First revision of this migration created the cache in public.
+DROP TABLE IF EXISTS public.route_distance_cache;
+
+CREATE TABLE IF NOT EXISTS private.route_distance_cache (
+  route_key TEXT PRIMARY KEY,
+  distance_km DOUBLE PRECISION NOT NULL,
+  expires_at TIMESTAMPTZ NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_route_distance_cache_expires_at
+  ON private.route_distance_cache (expires_at);
+
+REVOKE ALL ON private.route_distance_cache FROM PUBLIC;
+
+ALTER TABLE private.route_distance_cache ENABLE ROW LEVEL SECURITY;
+
+-- Only the backend can reach the schema; it runs with the caller's claims.
+DROP POLICY IF EXISTS route_distance_cache_manage_policy ON private.route_distance_cache;
+CREATE POLICY route_distance_cache_manage_policy ON private.route_distance_cache
+  FOR ALL
+  USING (
+    current_setting('request.jwt.claims', true)::jsonb ->> 'role' IN ('service_role', 'authenticated')
+  )
+  WITH CHECK (
+    current_setting('request.jwt.claims', true)::jsonb ->> 'role' IN ('service_role', 'authenticated')
+  );
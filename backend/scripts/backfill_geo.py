@@ -1,12 +1,19 @@
 import os
-import re
 import time
 from typing import Optional
 
 import psycopg
 
 from app.core.config import settings
-from app.core.geo import compute_co2_saved_kg, compute_distance_km, geocode_swiss_address
+from app.core.geo import (
+    clean_address,
+    compute_co2_saved_kg,
+    compute_distances_km,
+    format_address,
+    geocode_swiss_address,
+    haversine_km_batch,
+    swiss_to_wgs84_batch,
+)
 
 
 SLEEP_SECONDS = float(os.getenv("BACKFILL_SLEEP_SECONDS", "0.2"))
@@ -14,27 +21,8 @@ LIMIT = int(os.getenv("BACKFILL_LIMIT", "0")) or None
 DELIVERY_LIMIT = int(os.getenv("BACKFILL_DELIVERY_LIMIT", "0")) or None
 FORCE = os.getenv("BACKFILL_FORCE", "0") == "1"
 BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "10"))
-
-
-def _clean_address(address: Optional[str]) -> Optional[str]:
-    if not address:
-        return None
-    cleaned = address.strip()
-    cleaned = re.split(r",?\s*(Etage|Étage|Code|Digicode|T[eé]l|Téléphone)\b", cleaned, maxsplit=1)[0]
-    return cleaned.strip(" ,")
-
-
-def _format_address(
-    address: Optional[str], postal_code: Optional[str], city_name: Optional[str]
-) -> Optional[str]:
-    cleaned = _clean_address(address)
-    if not cleaned:
-        return None
-    parts = [cleaned]
-    tail = " ".join(part for part in [postal_code, city_name] if part)
-    if tail:
-        parts.append(tail.strip())
-    return ", ".join(part for part in parts if part)
+DISTANCE_BATCH_SIZE = int(os.getenv("BACKFILL_DISTANCE_BATCH_SIZE", "500"))
+CONVERT_GRID = os.getenv("BACKFILL_CONVERT_GRID", "0") == "1"
 
 
 def _sleep():
@@ -48,6 +36,47 @@ def _is_swiss_lat_lng(lat: Optional[float], lng: Optional[float]) -> bool:
     return 45.5 <= lat <= 48.5 and 5.5 <= lng <= 11.5
 
 
+def convert_grid_coordinates(cur, conn, table: str) -> int:
+    """
+    Opt-in (BACKFILL_CONVERT_GRID=1): shops/clients whose lat/lng hold Swiss
+    grid coordinates (LV03/LV95, e.g. copied from map.geo.admin.ch) instead
+    of WGS84, converted in one batch without a geocoding request. The
+    easting is the larger of the two. Rows that do not land in Switzerland
+    are left as they are, for the geocoding pass.
+    """
+    query = f"SELECT id, lat, lng FROM {table} WHERE lat > 1000 AND lng > 1000"
+    if LIMIT:
+        query += " LIMIT %s"
+        cur.execute(query, (LIMIT,))
+    else:
+        cur.execute(query)
+    rows = cur.fetchall()
+    if not rows:
+        return 0
+    lat, lng = swiss_to_wgs84_batch(
+        [max(lat, lng) for _id, lat, lng in rows],
+        [min(lat, lng) for _id, lat, lng in rows],
+    )
+    converted = [
+        (row_id, row_lat, row_lng)
+        for (row_id, _lat, _lng), row_lat, row_lng in zip(rows, lat.tolist(), lng.tolist())
+        if _is_swiss_lat_lng(row_lat, row_lng)
+    ]
+    if not converted:
+        return 0
+    cur.execute(
+        f"""
+        UPDATE {table} AS t
+        SET lat = v.lat, lng = v.lng
+        FROM unnest(%s::uuid[], %s::double precision[], %s::double precision[]) AS v(id, lat, lng)
+        WHERE t.id = v.id
+        """,
+        tuple(map(list, zip(*converted))),
+    )
+    conn.commit()
+    return len(converted)
+
+
 def backfill_shops(cur, conn) -> int:
     query = """
         SELECT id, address, lat, lng
@@ -67,7 +96,7 @@ def backfill_shops(cur, conn) -> int:
         if not FORCE and _is_swiss_lat_lng(lat, lng):
             continue
 
-        coords = geocode_swiss_address(_clean_address(address))
+        coords = geocode_swiss_address(clean_address(address), cur)
         if not coords:
             continue
         lat, lng = coords
@@ -100,8 +129,8 @@ def backfill_clients(cur, conn) -> int:
     for idx, (client_id, address, postal_code, city_name, lat, lng) in enumerate(rows, start=1):
         if not FORCE and _is_swiss_lat_lng(lat, lng):
             continue
-        query_addr = _format_address(address, postal_code, city_name)
-        coords = geocode_swiss_address(query_addr) if query_addr else None
+        query_addr = format_address(address, postal_code, city_name)
+        coords = geocode_swiss_address(query_addr, cur) if query_addr else None
         if not coords:
             continue
         lat, lng = coords
@@ -140,43 +169,57 @@ def backfill_deliveries(cur, conn) -> int:
         cur.execute(query)
     rows = cur.fetchall()
     updated = 0
-    for idx, (
-        delivery_id,
-        shop_lat,
-        shop_lng,
-        client_lat,
-        client_lng,
-        delivery_address,
-        delivery_postal_code,
-        delivery_city_name,
-    ) in enumerate(rows, start=1):
-        if shop_lat is None or shop_lng is None:
-            continue
-
-        if client_lat is None or client_lng is None:
-            query_addr = _format_address(delivery_address, delivery_postal_code, delivery_city_name)
-            coords = geocode_swiss_address(query_addr) if query_addr else None
-            if not coords:
+    # Distances are routed DISTANCE_BATCH_SIZE deliveries at a time: one
+    # OSRM /table request per shop instead of one /route request per delivery.
+    for start in range(0, len(rows), DISTANCE_BATCH_SIZE):
+        pending = []
+        for (
+            delivery_id,
+            shop_lat,
+            shop_lng,
+            client_lat,
+            client_lng,
+            delivery_address,
+            delivery_postal_code,
+            delivery_city_name,
+        ) in rows[start:start + DISTANCE_BATCH_SIZE]:
+            if shop_lat is None or shop_lng is None:
                 continue
-            client_lat, client_lng = coords
-
-        distance_km = compute_distance_km(shop_lat, shop_lng, client_lat, client_lng)
-        distance_km *= settings.RETURN_TRIP_MULTIPLIER
-        co2_saved_kg = compute_co2_saved_kg(distance_km)
 
-        cur.execute(
-            """
-            UPDATE delivery
-            SET distance_km = %s,
-                co2_saved_kg = %s
-            WHERE id = %s
-            """,
-            (distance_km, co2_saved_kg, delivery_id),
-        )
-        updated += 1
-        if updated % BATCH_SIZE == 0:
-            conn.commit()
-        _sleep()
+            if client_lat is None or client_lng is None:
+                query_addr = format_address(delivery_address, delivery_postal_code, delivery_city_name)
+                coords = geocode_swiss_address(query_addr, cur) if query_addr else None
+                if not coords:
+                    continue
+                client_lat, client_lng = coords
+            pending.append((delivery_id, (shop_lat, shop_lng, client_lat, client_lng)))
+
+        pairs = [pair for _delivery_id, pair in pending]
+        distances = compute_distances_km(pairs, cur, haversine_fallback=False)
+        # Pairs OSRM could not route: straight-line distance, one vectorized call.
+        unrouted = [index for index, distance in enumerate(distances) if distance is None]
+        if unrouted:
+            fallback = haversine_km_batch(*zip(*(pairs[index] for index in unrouted)))
+            for index, distance in zip(unrouted, fallback.tolist()):
+                distances[index] = distance
+        for (delivery_id, _pair), distance_km in zip(pending, distances):
+            distance_km *= settings.RETURN_TRIP_MULTIPLIER
+            co2_saved_kg = compute_co2_saved_kg(distance_km)
+
+            cur.execute(
+                """
+                UPDATE delivery
+                SET distance_km = %s,
+                    co2_saved_kg = %s
+                WHERE id = %s
+                """,
+                (distance_km, co2_saved_kg, delivery_id),
+            )
+            updated += 1
+            if updated % BATCH_SIZE == 0:
+                conn.commit()
+        if pending:
+            _sleep()
     return updated
 
 
@@ -185,6 +228,10 @@ def main() -> None:
     with psycopg.connect(settings.DATABASE_URL, cursor_factory=psycopg.ClientCursor) as conn:
         with conn.cursor() as cur:
             cur.execute("SET statement_timeout = '0'")
+            shops_converted = clients_converted = 0
+            if CONVERT_GRID:
+                shops_converted = convert_grid_coordinates(cur, conn, "shop")
+                clients_converted = convert_grid_coordinates(cur, conn, "client")
             shops_updated = backfill_shops(cur, conn)
             clients_updated = backfill_clients(cur, conn)
             deliveries_updated = backfill_deliveries(cur, conn)
@@ -192,6 +239,7 @@ def main() -> None:
 
     print(
         f"Backfill done. shops: {shops_updated}, clients: {clients_updated}, deliveries: {deliveries_updated}"
+        f" (grid coordinates converted: {shops_converted} shops, {clients_converted} clients)"
     )
 
 
@@ -41,6 +41,10 @@ def main():
         with conn.cursor() as cur:
             cur.execute(SQL)
             print("Profiles backfill complete.")
+            print(
+                "Users must refresh tokens (logout/login); running API instances "
+                "otherwise serve cached profiles for up to IDENTITY_CACHE_TTL_SECONDS."
+            )
     finally:
         conn.close()
 
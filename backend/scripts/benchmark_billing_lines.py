@@ -0,0 +1,105 @@
+"""
+Compare billing_document_line persistence: one INSERT per line (previous
+behaviour) versus the batched unnest() path used by aggregate_billing_run.
+
+Runs against a temporary table shadowing billing_document_line and rolls
+everything back, so it is safe on any database:
+
+    python scripts/benchmark_billing_lines.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+import psycopg
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.core.billing_aggregator import _insert_document_lines  # noqa: E402
+from app.core.config import settings  # noqa: E402
+
+
+def _rows(count: int) -> list[tuple]:
+    document_id = str(uuid.uuid4())
+    shop_id = str(uuid.uuid4())
+    return [
+        (
+            document_id,
+            shop_id,
+            str(uuid.uuid4()),
+            Decimal("12.50"),
+            {
+                "delivery_date": "2025-01-15",
+                "client_name": f"Client {i}",
+                "commune_name": "Sion",
+                "bags": 2,
+                "total_price": 12.5,
+                "shop_name": "Shop",
+                "delivery_city_name": "Sion",
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def _insert_row_by_row(cur, rows: list[tuple]) -> None:
+    for document_id, shop_id, delivery_id, amount_due, meta in rows:
+        cur.execute(
+            """
+            INSERT INTO billing_document_line (document_id, shop_id, delivery_id, amount_due, meta)
+            VALUES (%s, %s, %s, %s, %s::jsonb)
+            """,
+            (document_id, shop_id, delivery_id, amount_due, json.dumps(meta)),
+        )
+
+
+def _timed(conn, writer, rows: list[tuple]) -> float:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TEMP TABLE billing_document_line (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                document_id UUID NOT NULL,
+                shop_id UUID,
+                delivery_id UUID,
+                amount_due NUMERIC(12,2) NOT NULL DEFAULT 0,
+                meta JSONB NOT NULL DEFAULT '{}'::jsonb,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            ) ON COMMIT DROP
+            """
+        )
+        started = time.perf_counter()
+        writer(cur, rows)
+        elapsed = time.perf_counter() - started
+    conn.rollback()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument(
+        "--row-by-row-max",
+        type=int,
+        default=100000,
+        help="skip the per-row baseline above this many lines",
+    )
+    args = parser.parse_args()
+
+    with psycopg.connect(settings.DATABASE_URL, prepare_threshold=None) as conn:
+        print(f"{'lines':>8} {'row-by-row (s)':>15} {'batched (s)':>12} {'speedup':>8}")
+        for size in args.sizes:
+            rows = _rows(size)
+            batched = _timed(conn, _insert_document_lines, rows)
+            if size <= args.row_by_row_max:
+                baseline = _timed(conn, _insert_row_by_row, rows)
+                print(f"{size:>8} {baseline:>15.2f} {batched:>12.2f} {baseline / batched:>7.1f}x")
+            else:
+                print(f"{size:>8} {'-':>15} {batched:>12.2f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
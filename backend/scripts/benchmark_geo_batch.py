@@ -0,0 +1,82 @@
+"""
+Compare the scalar Swiss coordinate conversion and haversine distance
+(called point by point, previous behaviour) with the NumPy batch variants
+used for bulk geo work, and report the largest difference between them.
+
+Random points across Switzerland (half LV03, half LV95), routed from a few
+shops. No database or network access:
+
+    python scripts/benchmark_geo_batch.py --points 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.core.geo import (  # noqa: E402
+    _haversine_km,
+    haversine_km_batch,
+    swiss_to_wgs84,
+    swiss_to_wgs84_batch,
+)
+
+
+def _timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def _scalar_conversion(easting, northing):
+    return [swiss_to_wgs84(e, n) for e, n in zip(easting.tolist(), northing.tolist())]
+
+
+def _scalar_distances(lat1, lon1, lat2, lon2):
+    return [
+        _haversine_km(a, b, c, d)
+        for a, b, c, d in zip(lat1.tolist(), lon1.tolist(), lat2.tolist(), lon2.tolist())
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    count = args.points
+    easting = rng.uniform(485_000.0, 835_000.0, count)
+    northing = rng.uniform(75_000.0, 295_000.0, count)
+    lv95 = np.arange(count) % 2 == 1
+    easting[lv95] += 2_000_000.0
+    northing[lv95] += 1_000_000.0
+
+    scalar_points, scalar_conversion = _timed(_scalar_conversion, easting, northing)
+    (lat, lon), batch_conversion = _timed(swiss_to_wgs84_batch, easting, northing)
+    scalar_lat, scalar_lon = np.array(scalar_points).T
+    conversion_error = max(np.abs(lat - scalar_lat).max(), np.abs(lon - scalar_lon).max())
+
+    shops = rng.integers(0, count, 16)
+    start_lat, start_lon = lat[shops][np.arange(count) % 16], lon[shops][np.arange(count) % 16]
+    scalar_km, scalar_distance = _timed(_scalar_distances, start_lat, start_lon, lat, lon)
+    batch_km, batch_distance = _timed(haversine_km_batch, start_lat, start_lon, lat, lon)
+    distance_error = np.abs(batch_km - np.array(scalar_km)).max()
+
+    print(f"{count} points")
+    print(f"{'':>12} {'scalar (s)':>11} {'batch (s)':>10} {'speedup':>8} {'max diff':>10}")
+    print(
+        f"{'LV03/LV95':>12} {scalar_conversion:>11.3f} {batch_conversion:>10.3f}"
+        f" {scalar_conversion / batch_conversion:>7.1f}x {conversion_error:>10.1e}"
+    )
+    print(
+        f"{'haversine':>12} {scalar_distance:>11.3f} {batch_distance:>10.3f}"
+        f" {scalar_distance / batch_distance:>7.1f}x {distance_error:>10.1e}"
+    )
+
+
+if __name__ == "__main__":
+    main()
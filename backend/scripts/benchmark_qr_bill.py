@@ -0,0 +1,117 @@
+"""
+Compare the per-invoice cost of the Swiss QR block: rebuilding the qrbill
+payload and the QR widget for every render (previous behaviour) versus the
+memoized payload and pre-drawn QR code used by the PDF builders.
+
+Each invoice is drawn onto an in-memory canvas `--renders` times (preview,
+freeze, ZIP export...). No database or network access:
+
+    python scripts/benchmark_qr_bill.py --invoices 50 200 --renders 2
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+from io import BytesIO
+
+from reportlab.graphics.barcode import qr
+from reportlab.graphics.shapes import Drawing, Rect
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas as pdf_canvas
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.pdf.payment_details import (  # noqa: E402
+    _build_qr_payload_qrbill,
+    _qr_code_with_cross,
+    _qr_modules,
+)
+
+QR_SIZE = 46 * mm
+
+
+def _invoice(index: int) -> dict:
+    return {
+        "iban": "CH93 0076 2011 6238 5295 7",
+        "creditor_name": "Velocite Sion",
+        "creditor_address": "Avenue de la Gare 12",
+        "creditor_postal_code": "1950",
+        "creditor_city": "Sion",
+        "creditor_country": "CH",
+        "amount": Decimal("100.00") + index,
+        "currency": "CHF",
+        "debtor_name": f"Client {index}",
+        "debtor_address": "Rue du Rhone 45",
+        "debtor_postal_code": "1950",
+        "debtor_city": "Sion",
+        "debtor_country": "CH",
+        "reference": None,
+        "message": f"Facture {index}",
+    }
+
+
+def _uncached_drawing(payload: str, size: float) -> Drawing:
+    qr_code = qr.QrCodeWidget(payload, barLevel="H")
+    bounds = qr_code.getBounds()
+    width = bounds[2] - bounds[0]
+    height = bounds[3] - bounds[1]
+    scale = size / width
+    drawing = Drawing(size, size, transform=[scale, 0, 0, scale, 0, 0])
+    drawing.add(qr_code)
+    cross_size = 7 * mm / scale
+    cross_scale = cross_size / 19
+    x = (width - cross_size) / 2
+    y = (height - cross_size) / 2
+    drawing.add(Rect(x, y, cross_size, cross_size, fillColor=colors.black, strokeColor=None))
+    drawing.add(
+        Rect(x + 8.3 * cross_scale, y + 4 * cross_scale, 3.3 * cross_scale, 11 * cross_scale,
+             fillColor=colors.white, strokeColor=None)
+    )
+    drawing.add(
+        Rect(x + 4.4 * cross_scale, y + 7.9 * cross_scale, 11 * cross_scale, 3.3 * cross_scale,
+             fillColor=colors.white, strokeColor=None)
+    )
+    return drawing
+
+
+def _before(invoice: dict, canvas) -> None:
+    payload = _build_qr_payload_qrbill.__wrapped__(**invoice)
+    _uncached_drawing(payload, QR_SIZE).drawOn(canvas, 0, 0)
+
+
+def _after(invoice: dict, canvas) -> None:
+    payload = _build_qr_payload_qrbill(**invoice)
+    _qr_code_with_cross(payload, QR_SIZE).drawOn(canvas, 0, 0)
+
+
+def _timed(render, invoices: list[dict], renders: int) -> float:
+    canvas = pdf_canvas.Canvas(BytesIO())
+    started = time.perf_counter()
+    for _ in range(renders):
+        for invoice in invoices:
+            render(invoice, canvas)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--invoices", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--renders", type=int, default=2, help="renders per invoice")
+    args = parser.parse_args()
+
+    print(f"{'invoices':>8} {'before (ms/inv)':>16} {'after (ms/inv)':>15} {'speedup':>8}")
+    for count in args.invoices:
+        _build_qr_payload_qrbill.cache_clear()
+        _qr_modules.cache_clear()
+        invoices = [_invoice(i) for i in range(count)]
+        baseline = _timed(_before, invoices, args.renders)
+        memoized = _timed(_after, invoices, args.renders)
+        print(
+            f"{count:>8} {baseline * 1000 / count:>16.2f} {memoized * 1000 / count:>15.2f}"
+            f" {baseline / memoized:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,84 @@
+from contextlib import contextmanager
 from unittest.mock import MagicMock
+
 import pytest
 from app.schemas.me import MeResponse
 
+_DEFAULT_DB_TARGETS = ("app.core.identity.get_db_connection", "app.core.guards.get_db_connection")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "db_connection(*targets, dedicated=None, fresh=False): configure mock_db_connection",
+    )
+
+
+def _fake_connection(cursor=None):
+    conn = MagicMock()
+    if cursor is None:
+        cursor = MagicMock()
+        cursor.fetchone.return_value = None
+        cursor.fetchall.return_value = []
+    conn.cursor.return_value = cursor
+    cursor.__enter__.return_value = cursor
+    cursor.__exit__.return_value = None
+    return conn, cursor
+
+
+class FakeDb:
+    """
+    Stand-in for get_db_connection(jwt_claims, *, dedicated=False).
+
+    Every checkout yields `conn` (whose cursor is `cursor`), or with
+    fresh=True a new connection after the first one, whose cursor returns
+    no rows. `checkouts` lists the (conn, cursor) of each checkout, `held`
+    counts the ones not returned yet; with dedicated=True/False the flag
+    requested by the code under test is asserted.
+    """
+
+    def __init__(self, dedicated=None, fresh=False):
+        self.conn, self.cursor = _fake_connection(MagicMock())
+        self.dedicated = dedicated
+        self.fresh = fresh
+        self.checkouts = []
+        self.held = 0
+
+    @contextmanager
+    def connect(self, jwt_claims=None, *, dedicated=False):
+        if self.dedicated is not None:
+            assert dedicated == self.dedicated
+        checkout = (self.conn, self.cursor)
+        if self.fresh and self.checkouts:
+            checkout = _fake_connection()
+        self.checkouts.append(checkout)
+        self.held += 1
+        try:
+            yield checkout[0]
+        finally:
+            self.held -= 1
+
+
 @pytest.fixture
-def mock_db_connection(mocker):
+def mock_db_connection(request, mocker):
     """
     Mock the database connection context manager.
     Usage:
         def test_something(mock_db_connection):
-            mock_cursor = mock_db_connection
-            mock_cursor.fetchone.return_value = (...)
+            mock_db_connection.cursor.fetchone.return_value = (...)
+
+        @pytest.mark.db_connection("app.core.csv_stream.get_db_connection", dedicated=True)
+        def test_export(mock_db_connection):
+            ...
+    Without targets in the marker, the identity and guards lookups are patched.
     """
-    mock_conn = MagicMock()
-    mock_cursor = MagicMock()
-    
-    # Setup context manager behavior
-    mock_conn.__enter__.return_value = mock_conn
-    mock_conn.__exit__.return_value = None
-    mock_conn.cursor.return_value = mock_cursor
-    mock_cursor.__enter__.return_value = mock_cursor
-    mock_cursor.__exit__.return_value = None
-    
-    # Patch the get_db_connection in various places it might be used
-    mocker.patch("app.core.identity.get_db_connection", return_value=mock_conn)
-    mocker.patch("app.core.guards.get_db_connection", return_value=mock_conn)
-    
-    return mock_cursor
+    marker = request.node.get_closest_marker("db_connection")
+    targets, options = (marker.args, marker.kwargs) if marker else ((), {})
+    fake = FakeDb(**options)
+    for target in targets or _DEFAULT_DB_TARGETS:
+        mocker.patch(target, side_effect=fake.connect)
+    return fake
+
 
 @pytest.fixture
 def mock_user_claims(mocker):
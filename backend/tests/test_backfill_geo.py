@@ -0,0 +1,53 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core import geo
+from scripts import backfill_geo
+
+
+def test_grid_coordinates_converted_when_in_switzerland(mocker):
+    mocker.patch.object(backfill_geo, "LIMIT", None)
+    cur, conn = MagicMock(), MagicMock()
+    # Sion as LV95 (lat/lng swapped), then a grid point far outside Switzerland.
+    cur.fetchall.return_value = [("shop-1", 1120000.0, 2594000.0), ("shop-2", 5000000.0, 9000000.0)]
+
+    assert backfill_geo.convert_grid_coordinates(cur, conn, "shop") == 1
+
+    update_sql, (ids, lat, lng) = cur.execute.call_args_list[1].args
+    assert "UPDATE shop AS t" in update_sql
+    assert ids == ["shop-1"]
+    assert (lat[0], lng[0]) == pytest.approx(geo.swiss_to_wgs84(2594000.0, 1120000.0))
+    conn.commit.assert_called_once()
+
+
+def test_grid_conversion_respects_limit(mocker):
+    mocker.patch.object(backfill_geo, "LIMIT", 5)
+    cur, conn = MagicMock(), MagicMock()
+    cur.fetchall.return_value = [("client-1", 5000000.0, 9000000.0)]
+
+    assert backfill_geo.convert_grid_coordinates(cur, conn, "client") == 0
+
+    select_sql, params = cur.execute.call_args.args
+    assert select_sql.endswith("LIMIT %s") and params == (5,)
+    conn.commit.assert_not_called()
+
+
+def test_unrouted_deliveries_get_batch_haversine(mocker):
+    mocker.patch.object(backfill_geo, "DELIVERY_LIMIT", None)
+    mocker.patch.object(backfill_geo, "SLEEP_SECONDS", 0)
+    mocker.patch.object(backfill_geo.settings, "RETURN_TRIP_MULTIPLIER", 1.0)
+    shop, client = (46.2331, 7.3606), (46.5, 9.5)
+    cur, conn = MagicMock(), MagicMock()
+    cur.fetchall.return_value = [
+        ("delivery-1", *shop, 46.2270, 7.3580, None, None, None),
+        ("delivery-2", *shop, *client, None, None, None),
+    ]
+    mocker.patch.object(backfill_geo, "compute_distances_km", return_value=[1.25, None])
+
+    assert backfill_geo.backfill_deliveries(cur, conn) == 2
+
+    distances = [call.args[1][0] for call in cur.execute.call_args_list[1:]]
+    assert distances[0] == 1.25
+    assert distances[1] == pytest.approx(geo._haversine_km(*shop, *client))
+    assert type(distances[1]) is float
@@ -0,0 +1,72 @@
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from app.core import billing_aggregator
+
+
+def test_documents_inserted_in_one_statement():
+    cur = MagicMock()
+    cur.fetchall.return_value = [
+        ("doc-1", "COMMUNE", "11111111-1111-1111-1111-111111111111"),
+        ("doc-2", "HQ", "22222222-2222-2222-2222-222222222222"),
+    ]
+    documents = [tuple(range(26)), tuple(range(26))]
+
+    ids = billing_aggregator._insert_documents(cur, documents)
+
+    cur.execute.assert_called_once()
+    sql, params = cur.execute.call_args.args
+    assert sql.count("'draft'") == 2
+    assert len(params) == 52
+    assert ids[("HQ", "22222222-2222-2222-2222-222222222222")] == "doc-2"
+
+
+def test_lines_batched(mocker):
+    """Lines go out as array parameters, one statement per batch"""
+    mocker.patch.object(billing_aggregator, "_LINE_BATCH_SIZE", 2)
+    cur = MagicMock()
+    rows = [
+        ("doc-1", "shop-1", f"delivery-{i}", Decimal("4.50"), {"bags": i})
+        for i in range(5)
+    ]
+
+    billing_aggregator._insert_document_lines(cur, rows)
+
+    assert cur.execute.call_count == 3
+    _sql, params = cur.execute.call_args_list[0].args
+    assert params[2] == ["delivery-0", "delivery-1"]
+    assert params[4] == ['{"bags": 0}', '{"bags": 1}']
+
+
+def test_no_lines_no_statement():
+    cur = MagicMock()
+    billing_aggregator._insert_document_lines(cur, [])
+    cur.execute.assert_not_called()
+
+
+def _document(recipient_id, amount):
+    line = billing_aggregator.RecipientLine(
+        shop_id="shop-1", delivery_id="delivery-1", amount_due=Decimal(amount), meta={"bags": 1}
+    )
+    values = ("run", "COMMUNE", recipient_id) + tuple(range(22))
+    return values + (billing_aggregator._document_fingerprint(values, [line]),), [line]
+
+
+def test_incremental_diff_keeps_unchanged_documents():
+    """Only changed payors are rewritten; payors without lines are removed"""
+    same = _document("11111111-1111-1111-1111-111111111111", "5.00")
+    changed = _document("22222222-2222-2222-2222-222222222222", "7.00")
+    cur = MagicMock()
+    cur.fetchall.return_value = [
+        ("doc-same", "COMMUNE", "11111111-1111-1111-1111-111111111111", same[0][-1]),
+        ("doc-changed", "COMMUNE", "22222222-2222-2222-2222-222222222222", "old-hash"),
+        ("doc-gone", "COMMUNE", "33333333-3333-3333-3333-333333333333", "hash"),
+    ]
+
+    stale_ids, to_insert, unchanged = billing_aggregator._diff_documents(
+        cur, "run", [same, changed]
+    )
+
+    assert unchanged == 1
+    assert to_insert == [changed]
+    assert sorted(stale_ids) == ["doc-changed", "doc-gone"]
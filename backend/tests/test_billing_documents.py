@@ -0,0 +1,40 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes import billing
+
+
+def _header(document_id: str, status: str = "draft", pdf_url: str | None = None) -> tuple:
+    return (document_id, "COMMUNE", None, date(2025, 1, 1), None, None, status, pdf_url)
+
+
+@pytest.mark.db_connection("app.routes.billing.get_db_connection")
+def test_document_set_loaded_in_two_queries(mocker, mock_db_connection):
+    """Headers and lines of a whole batch come from one query each"""
+    cur = mock_db_connection.cursor
+    cur.fetchall.side_effect = [
+        [_header("doc-1"), _header("doc-2"), _header("doc-3", status="frozen", pdf_url="a.pdf")],
+        [
+            ("doc-1", date(2025, 1, 2), "Shop", "Client A", "Sion", "2", Decimal("5.00")),
+            ("doc-1", date(2025, 1, 9), "Shop", "Client B", "Sion", "1", Decimal("2.50")),
+        ],
+    ]
+    plan = mocker.patch("app.routes.billing._plan_billing_document_pdf", return_value={"filename": "f.pdf"})
+
+    results = list(
+        billing._iter_billing_document_plans(["doc-1", "doc-2", "doc-3", "doc-4"], 0, "{}")
+    )
+
+    assert cur.execute.call_count == 2
+    assert cur.execute.call_args_list[1].args[1] == (["doc-1", "doc-2"],)
+    rows_by_document = {call.args[0]: call.args[2] for call in plan.call_args_list}
+    assert [row[2] for row in rows_by_document["doc-1"]] == ["Client A", "Client B"]
+    assert rows_by_document["doc-2"] == []
+    # The stored PDF is downloaded instead; its lines are only fetched if that fails.
+    assert rows_by_document["doc-3"] is None
+    assert [doc_id for doc_id, _plan, _error in results] == ["doc-1", "doc-2", "doc-3", "doc-4"]
+    assert isinstance(results[3][2], HTTPException)
+    assert results[3][2].status_code == 404
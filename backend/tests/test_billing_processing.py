@@ -0,0 +1,43 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+from fastapi import HTTPException
+import pytest
+
+from app.core import billing_processing
+
+
+def test_freeze_runs_in_a_savepoint():
+    """A failing shop rolls back to its savepoint, leaving the caller's transaction usable"""
+    cur = MagicMock()
+    cur.fetchone.return_value = (1,)  # already frozen
+    transaction = cur.connection.transaction.return_value
+    transaction.__exit__.return_value = False
+
+    with pytest.raises(HTTPException) as excinfo:
+        billing_processing.freeze_shop_billing_period(
+            cur=cur,
+            shop_id="shop-1",
+            period_month=date(2025, 1, 1),
+            frozen_by_user_id="user-1",
+            frozen_by_email="a@b.ch",
+        )
+
+    assert excinfo.value.status_code == 409
+    transaction.__enter__.assert_called_once()
+    assert transaction.__exit__.call_args.args[0] is HTTPException
+
+
+def test_freeze_pdf_rendered_through_the_pool(mocker):
+    render = mocker.patch.object(
+        billing_processing,
+        "render_jobs",
+        return_value=iter([(None, b"%PDF-shop", None)]),
+    )
+
+    pdf_bytes = billing_processing._render_pdf(billing_processing.build_shop_monthly_pdf, {"shop_name": "Shop"})
+
+    assert pdf_bytes == b"%PDF-shop"
+    (job,) = render.call_args.args[0]
+    assert job.builder is billing_processing.build_shop_monthly_pdf
+    assert job.kwargs == {"shop_name": "Shop"}
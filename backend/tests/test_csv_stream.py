@@ -0,0 +1,57 @@
+import pytest
+
+from app.core import csv_stream
+from app.core.csv_stream import CsvStream
+
+
+pytestmark = pytest.mark.db_connection("app.core.csv_stream.get_db_connection", dedicated=True)
+
+
+@pytest.fixture
+def fake_export(mocker, mock_db_connection):
+    """Named cursor over 5 rows, fetched 2 at a time"""
+    mocker.patch.object(csv_stream.settings, "CSV_EXPORT_CHUNK_ROWS", 2)
+    rows = [(i, f"name {i}") for i in range(5)]
+
+    cursor = mock_db_connection.cursor
+    cursor.description = [("id",), ("name",)]
+    cursor.fetchmany.side_effect = lambda size: [rows.pop(0) for _ in range(min(size, len(rows)))]
+    return mock_db_connection
+
+
+def test_rows_streamed_chunk_by_chunk(fake_export):
+    """The query runs on open; each later chunk is fetched only when the body needs it"""
+    conn, cursor = fake_export.conn, fake_export.cursor
+
+    stream = CsvStream("{}", "SELECT id, name FROM t WHERE x = %s", ("x",))
+    conn.cursor.assert_called_once_with(name="csv_export")
+    cursor.execute.assert_called_once_with("SELECT id, name FROM t WHERE x = %s", ("x",))
+    assert stream.columns == ["id", "name"]
+    assert stream.first_rows == [(0, "name 0"), (1, "name 1")]
+    assert cursor.fetchmany.call_count == 1
+
+    chunks = stream.iter_csv(["Id", "Nom"], lambda row: [row[0], row[1].upper()], delimiter=";")
+    assert next(chunks) == "Id;Nom\r\n0;NAME 0\r\n1;NAME 1\r\n".encode("utf-8")
+    assert cursor.fetchmany.call_count == 1
+    assert list(chunks) == [b"2;NAME 2\r\n3;NAME 3\r\n", b"4;NAME 4\r\n"]
+    assert fake_export.held == 0
+
+
+def test_connection_released_when_client_leaves_early(fake_export):
+
+    stream = CsvStream("{}", "SELECT 1")
+    response = stream.response("export.csv", ["Id", "Nom"])
+    assert response.headers["content-disposition"] == "attachment; filename=export.csv"
+    assert fake_export.held == 1
+
+    # Background task of the response, run even when the body was not sent.
+    stream.close()
+    assert fake_export.held == 0
+
+
+def test_connection_released_when_query_fails(fake_export):
+    fake_export.cursor.execute.side_effect = RuntimeError("syntax error")
+
+    with pytest.raises(RuntimeError):
+        CsvStream("{}", "SELEC 1")
+    assert fake_export.held == 0
@@ -0,0 +1,131 @@
+import pytest
+
+from app.core import delivery_enrichment, geo
+
+
+pytestmark = pytest.mark.db_connection("app.core.delivery_enrichment.get_db_connection", fresh=True)
+
+
+@pytest.fixture
+def fake_db(mock_db_connection):
+    """
+    Every checkout gets its own connection; `held` tells whether one is
+    checked out right now. The first checkout's cursor returns the row set
+    with `fake_db.cursor.fetchone.return_value`.
+    """
+    mock_db_connection.cursor.fetchone.return_value = None
+    return mock_db_connection
+
+
+def _statements(cursor):
+    return [" ".join(call.args[0].split()) for call in cursor.execute.call_args_list]
+
+
+def _no_connection_held(fake_db, result):
+    def _call(*args, **kwargs):
+        assert fake_db.held == 0
+        return result
+
+    return _call
+
+
+def test_distance_filled_in_and_shop_geocoded(fake_db, mocker):
+    mocker.patch.object(delivery_enrichment.settings, "RETURN_TRIP_MULTIPLIER", 2.0)
+    mocker.patch.object(delivery_enrichment.settings, "CO2_G_PER_KM", 100.0)
+    fake_db.cursor.fetchone.return_value = (
+        "shop-1", None, None, "Rue du Rhone 1, Digicode 1234",
+        "client-1", 46.22, 7.35,
+        "Rue de Lausanne 5", "1950", "Sion",
+    )
+    geocode = mocker.patch(
+        "app.core.delivery_enrichment.geocode_swiss_address",
+        side_effect=_no_connection_held(fake_db, (46.23, 7.36)),
+    )
+    distance = mocker.patch(
+        "app.core.delivery_enrichment.compute_distance_km",
+        side_effect=_no_connection_held(fake_db, 3.0),
+    )
+
+    assert delivery_enrichment.enrich_delivery("delivery-1", "{}") == 6.0
+
+    assert geocode.call_args.args == ("Rue du Rhone 1",)
+    assert distance.call_args.args == (46.23, 7.36, 46.22, 7.35)
+    # Read, then one write transaction.
+    (_read_conn, _read_cursor), (write_conn, cursor) = fake_db.checkouts
+    statements = _statements(cursor)
+    assert statements[0] == "UPDATE shop SET lat = %s, lng = %s WHERE id = %s AND (lat IS NULL OR lng IS NULL)"
+    assert cursor.execute.call_args_list[0].args[1] == (46.23, 7.36, "shop-1")
+    assert statements[1].startswith("UPDATE delivery SET distance_km = %s")
+    assert statements[1].endswith("AND distance_km IS NULL")
+    assert cursor.execute.call_args_list[1].args[1] == (6.0, pytest.approx(0.6), "delivery-1")
+    write_conn.commit.assert_called_once()
+
+
+def test_cache_tables_use_short_checkouts(fake_db, mocker):
+    mocker.patch.object(geo, "_geocode_cache", geo._TTLCache(16))
+    fake_db.cursor.fetchone.return_value = (
+        "shop-1", 46.23, 7.36, "Rue du Rhone 1",
+        "client-1", None, None,
+        "Rue de Lausanne 5", "1950", "Sion",
+    )
+    search = mocker.patch("app.core.geo._search_address", side_effect=_no_connection_held(fake_db, None))
+
+    assert delivery_enrichment.enrich_delivery("delivery-1", "{}") is None
+
+    search.assert_called_once()
+    # Read, cache lookup, cache write of the "not found" answer; nothing to update.
+    assert len(fake_db.checkouts) == 3
+    _write_conn, write_cursor = fake_db.checkouts[2]
+    assert "INSERT INTO private.geocode_cache" in _statements(write_cursor)[0]
+    assert fake_db.held == 0
+
+
+def test_client_address_geocoded_and_stored(fake_db, mocker):
+    fake_db.cursor.fetchone.return_value = (
+        "shop-1", 46.23, 7.36, "Rue du Rhone 1",
+        "client-1", None, None,
+        "Rue de Lausanne 5, Etage 2", "1950", "Sion",
+    )
+    geocode = mocker.patch(
+        "app.core.delivery_enrichment.geocode_swiss_address", return_value=(46.22, 7.35)
+    )
+    mocker.patch("app.core.delivery_enrichment.compute_distance_km", return_value=1.0)
+
+    delivery_enrichment.enrich_delivery("delivery-1", "{}")
+
+    assert geocode.call_args.args == ("Rue de Lausanne 5, 1950 Sion",)
+    _conn, cursor = fake_db.checkouts[-1]
+    assert _statements(cursor)[0].startswith("UPDATE client SET lat = %s, lng = %s")
+    assert cursor.execute.call_args_list[0].args[1] == (46.22, 7.35, "client-1")
+
+
+def test_unknown_address_leaves_delivery_for_backfill(fake_db, mocker):
+    fake_db.cursor.fetchone.return_value = (
+        "shop-1", 46.23, 7.36, None,
+        None, None, None,
+        "Nowhere 1", "9999", "Ailleurs",
+    )
+    mocker.patch("app.core.delivery_enrichment.geocode_swiss_address", return_value=None)
+    distance = mocker.patch("app.core.delivery_enrichment.compute_distance_km")
+
+    assert delivery_enrichment.enrich_delivery("delivery-1", "{}") is None
+    distance.assert_not_called()
+    assert len(fake_db.checkouts) == 1
+
+
+def test_already_enriched_delivery_untouched(fake_db, mocker):
+    geocode = mocker.patch("app.core.delivery_enrichment.geocode_swiss_address")
+
+    assert delivery_enrichment.enrich_delivery("delivery-1", "{}") is None
+    geocode.assert_not_called()
+
+
+def test_enqueue_runs_in_background_and_swallows_errors(mocker):
+    schedule = mocker.patch("app.core.delivery_enrichment._schedule")
+    delivery_enrichment.enqueue_enrichment("delivery-1", "{}")
+    schedule.assert_called_once_with("delivery-1", "{}")
+
+    mocker.patch(
+        "app.core.delivery_enrichment.enrich_delivery", side_effect=RuntimeError("db down")
+    )
+    delivery_enrichment._run_enrichment("delivery-1", "{}")
@@ -0,0 +1,218 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs, urlsplit
+
+import psycopg
+import pytest
+
+from app.core import geo
+
+
+@pytest.fixture(autouse=True)
+def empty_geo_caches():
+    geo._geocode_cache.clear()
+    geo._distance_cache.clear()
+    yield
+    geo._geocode_cache.clear()
+    geo._distance_cache.clear()
+
+
+@pytest.fixture
+def osrm(mocker):
+    """
+    Local OSRM stand-in serving /table: road distance = 1.5 x haversine,
+    no route to points east of 9.0 (lng). Records the requested paths.
+    """
+    requests = []
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            requests.append(url.path)
+            points = [tuple(map(float, pair.split(","))) for pair in url.path.rsplit("/", 1)[1].split(";")]
+            query = parse_qs(url.query)
+            sources = [int(index) for index in query["sources"][0].split(";")]
+            destinations = [int(index) for index in query["destinations"][0].split(";")]
+            distances = [
+                [
+                    None if points[dest][0] > 9.0 else round(
+                        1500 * geo._haversine_km(points[src][1], points[src][0], points[dest][1], points[dest][0]), 1
+                    )
+                    for dest in destinations
+                ]
+                for src in sources
+            ]
+            body = json.dumps({"code": "Ok", "distances": distances}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    mocker.patch.object(geo.settings, "OSRM_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    yield requests
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def search(mocker):
+    return mocker.patch("app.core.geo._search_address", return_value=(46.23, 7.36))
+
+
+def test_address_normalization():
+    assert geo.format_address("Rue du Rhône 45, Etage 2, code 1234", "1950", "Sion") == "Rue du Rhône 45, 1950 Sion"
+    assert geo.normalize_address("  RUE du Rhône 45 ,1950   Sion ") == "rue du rhône 45, 1950 sion"
+    assert geo.normalize_address(" , ") is None
+
+
+def test_repeat_address_served_from_memory(search):
+    assert geo.geocode_swiss_address("Rue du Rhône 45, 1950 Sion") == (46.23, 7.36)
+    assert geo.geocode_swiss_address("rue du rhône 45,1950 SION") == (46.23, 7.36)
+    search.assert_called_once_with("Rue du Rhône 45, 1950 Sion")
+
+
+def test_not_found_cached_but_failures_are_not(search, mocker):
+    mocker.patch.object(geo.settings, "GEOCODE_NEGATIVE_TTL_SECONDS", 60.0)
+    search.return_value = None
+    assert geo.geocode_swiss_address("Nowhere 1, 9999 Ailleurs") is None
+    assert geo.geocode_swiss_address("Nowhere 1, 9999 Ailleurs") is None
+    assert search.call_count == 1
+
+    search.side_effect = RuntimeError("timeout")
+    assert geo.geocode_swiss_address("Avenue de la Gare 12, 1950 Sion") is None
+    search.side_effect = None
+    search.return_value = (46.22, 7.35)
+    assert geo.geocode_swiss_address("Avenue de la Gare 12, 1950 Sion") == (46.22, 7.35)
+
+
+def test_expired_entry_searched_again(search, mocker):
+    mocker.patch.object(geo.settings, "GEOCODE_CACHE_TTL_SECONDS", -1.0)
+    geo.geocode_swiss_address("Rue du Rhône 45, 1950 Sion")
+    geo.geocode_swiss_address("Rue du Rhône 45, 1950 Sion")
+    assert search.call_count == 2
+
+
+def test_shared_table_consulted_before_the_api(search):
+    cur = MagicMock()
+    cur.fetchone.return_value = (46.1, 7.1, 3600.0)
+
+    assert geo.geocode_swiss_address("Rue du Rhône 45, 1950 Sion", cur) == (46.1, 7.1)
+    assert cur.execute.call_args.args[1] == ("rue du rhône 45, 1950 sion",)
+    search.assert_not_called()
+    # Now in memory as well.
+    assert geo.geocode_swiss_address("Rue du Rhône 45, 1950 Sion") == (46.1, 7.1)
+    assert cur.execute.call_count == 1
+
+
+def test_api_answer_written_to_shared_table(search, mocker):
+    mocker.patch.object(geo.settings, "GEOCODE_CACHE_TTL_SECONDS", 86400.0)
+    cur = MagicMock()
+    cur.fetchone.return_value = None
+
+    geo.geocode_swiss_address("Rue du Rhône 45, 1950 Sion", cur)
+
+    insert_sql, insert_params = cur.execute.call_args.args
+    assert "INSERT INTO private.geocode_cache" in insert_sql
+    assert insert_params == ("rue du rhône 45, 1950 sion", 46.23, 7.36, 86400.0)
+    assert cur.connection.transaction.call_count == 2
+
+
+def test_shared_table_failure_does_not_break_geocoding(search):
+    cur = MagicMock()
+    cur.execute.side_effect = psycopg.errors.UndefinedTable("relation does not exist")
+
+    assert geo.geocode_swiss_address("Rue du Rhône 45, 1950 Sion", cur) == (46.23, 7.36)
+    search.assert_called_once()
+
+
+SHOP = (46.2331, 7.3606)
+CLIENTS = [(46.2270, 7.3580), (46.2400, 7.3700), (46.2190, 7.3450)]
+
+
+def test_distances_batched_per_shop(osrm, mocker):
+    mocker.patch.object(geo.settings, "OSRM_TABLE_MAX_COORDINATES", 3)
+    pairs = [(*SHOP, *client) for client in CLIENTS] + [(46.0, 7.0, *CLIENTS[0])]
+
+    distances = geo.compute_distances_km(pairs)
+
+    # Shop: 3 clients in 2 requests of at most 3 coordinates; other start: 1 request.
+    assert len(osrm) == 3
+    for pair, distance in zip(pairs, distances):
+        assert distance == pytest.approx(1.5 * geo._haversine_km(*pair), abs=0.01)
+
+    assert geo.compute_distances_km(pairs) == distances
+    assert len(osrm) == 3
+
+
+def test_unroutable_pairs_fall_back_to_haversine_uncached(osrm):
+    pair = (*SHOP, 46.5, 9.5)
+    assert geo.compute_distance_km(*pair) == pytest.approx(geo._haversine_km(*pair))
+    geo.compute_distance_km(*pair)
+    assert len(osrm) == 2
+
+
+def test_unroutable_pairs_left_to_the_caller(osrm):
+    pairs = [(*SHOP, *CLIENTS[0]), (*SHOP, 46.5, 9.5)]
+    distances = geo.compute_distances_km(pairs, haversine_fallback=False)
+    assert distances[0] is not None and distances[1] is None
+
+
+def test_osrm_down_falls_back_to_haversine(mocker):
+    mocker.patch.object(geo.settings, "OSRM_BASE_URL", "http://127.0.0.1:9")
+    pair = (*SHOP, *CLIENTS[0])
+    assert geo.compute_distance_km(*pair) == pytest.approx(geo._haversine_km(*pair))
+
+
+def test_distances_shared_through_the_table(osrm, mocker):
+    mocker.patch.object(geo.settings, "ROUTE_CACHE_TTL_SECONDS", 3600.0)
+    stored_key = geo._distance_key(SHOP, CLIENTS[0])
+    cur = MagicMock()
+    cur.fetchall.return_value = [(stored_key, 2.5, 600.0)]
+
+    distances = geo.compute_distances_km([(*SHOP, *CLIENTS[0]), (*SHOP, *CLIENTS[1])], cur)
+
+    assert distances[0] == 2.5
+    read_sql, read_params = cur.execute.call_args_list[0].args
+    assert "FROM private.route_distance_cache" in read_sql
+    assert read_params == ([stored_key, geo._distance_key(SHOP, CLIENTS[1])],)
+    # Only the unknown pair is routed, then written back.
+    assert len(osrm) == 1
+    write_sql, write_params = cur.execute.call_args_list[1].args
+    assert "INSERT INTO private.route_distance_cache" in write_sql
+    assert write_params == (3600.0, [geo._distance_key(SHOP, CLIENTS[1])], [distances[1]])
+
+
+def test_batch_conversion_matches_scalar():
+    # Sion (LV03 and LV95), Geneva, St. Gallen, Lugano.
+    easting = [594000.0, 2594000.0, 500000.0, 746000.0, 717000.0]
+    northing = [120000.0, 1120000.0, 117500.0, 254000.0, 96000.0]
+
+    lat, lon = geo.swiss_to_wgs84_batch(easting, northing)
+
+    for index, (e, n) in enumerate(zip(easting, northing)):
+        assert (lat[index], lon[index]) == pytest.approx(geo.swiss_to_wgs84(e, n), abs=1e-12)
+
+
+def test_batch_haversine_matches_scalar():
+    lat2 = [46.2270, 46.2044, 47.4245, 46.0037]
+    lon2 = [7.3580, 6.1432, 9.3767, 8.9511]
+
+    distances = geo.haversine_km_batch(SHOP[0], SHOP[1], lat2, lon2)
+
+    for distance, end in zip(distances, zip(lat2, lon2)):
+        assert distance == pytest.approx(geo._haversine_km(*SHOP, *end), abs=1e-9)
+
+
+def test_fallback_distances_are_plain_floats(mocker):
+    mocker.patch("app.core.geo.route_distances_km", side_effect=RuntimeError("down"))
+    distances = geo.compute_distances_km([(*SHOP, *client) for client in CLIENTS])
+    assert all(type(distance) is float for distance in distances)
@@ -46,7 +46,7 @@ def test_require_hq_or_admin_for_shop_hq_success(
     hq_id = "hq-1"
     
     # Mock Shop lookup finding the shop and linking it to hq-1
-    mock_cursor = mock_db_connection
+    mock_cursor = mock_db_connection.cursor
     # row = (shop_hq_id, canton_id)
     # The code ALWAYS checks admin region after checking shop, regardless of user role
     mock_cursor.fetchone.side_effect = [
@@ -69,7 +69,7 @@ def test_require_hq_or_admin_for_shop_hq_failure(
     shop_id = "shop-1"
     
     # Shop belongs to hq-2
-    mock_cursor = mock_db_connection
+    mock_cursor = mock_db_connection.cursor
     mock_cursor.fetchone.side_effect = [
         ("hq-2", "canton-1"), # 1. Shop details
         (None,)               # 2. Admin region
@@ -92,7 +92,7 @@ def test_require_hq_or_admin_for_shop_admin_success(
     canton_id = "canton-1"
     admin_region_id = "admin-1"
     
-    mock_cursor = mock_db_connection
+    mock_cursor = mock_db_connection.cursor
     mock_cursor.fetchone.side_effect = [
         (None, canton_id),     # First fetch: Shop details (No HQ, just canton)
         (admin_region_id,),    # Second fetch: Admin region for canton
@@ -0,0 +1,71 @@
+import httpx
+import pytest
+
+from app.core import http_client
+
+
+@pytest.fixture
+def api(mocker):
+    """Shared client on a mock transport answering `statuses` in turn"""
+    calls = []
+    statuses = []
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        status = statuses.pop(0) if statuses else 200
+        if status is None:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(status, json={})
+
+    mocker.patch.object(http_client, "_client", httpx.Client(transport=httpx.MockTransport(_handler)))
+    mocker.patch.dict(http_client._hosts, clear=True)
+    mocker.patch.object(http_client.settings, "HTTP_BREAKER_FAILURES", 2)
+    mocker.patch.object(http_client.settings, "HTTP_BREAKER_RESET_SECONDS", 30.0)
+    return calls, statuses
+
+
+def test_circuit_opens_after_consecutive_failures(api, mocker):
+    calls, statuses = api
+    statuses.extend([503, None])
+
+    assert http_client.get("https://osrm.test/table", timeout=1).status_code == 503
+    with pytest.raises(httpx.ConnectError):
+        http_client.get("https://osrm.test/table", timeout=1)
+    with pytest.raises(http_client.HostUnavailableError):
+        http_client.get("https://osrm.test/table", timeout=1)
+    assert len(calls) == 2
+
+    # Other hosts are not affected.
+    assert http_client.get("https://api3.geo.test/search", timeout=1).status_code == 200
+    assert http_client.get_http_client_stats()["hosts"]["osrm.test"]["open"]
+
+    # After the reset delay one trial request goes through and closes the circuit.
+    now = http_client.time.monotonic()
+    mocker.patch("app.core.http_client.time.monotonic", return_value=now + 31)
+    assert http_client.get("https://osrm.test/table", timeout=1).status_code == 200
+    assert http_client.get("https://osrm.test/table", timeout=1).status_code == 200
+    assert not http_client.get_http_client_stats()["hosts"]["osrm.test"]["open"]
+
+
+def test_client_errors_do_not_count_as_failures(api):
+    calls, statuses = api
+    statuses.extend([404, 404, 422])
+
+    for _ in range(3):
+        http_client.put("https://auth.test/admin/users/1", json={}, timeout=1)
+    assert len(calls) == 3
+    assert http_client.get_http_client_stats()["hosts"]["auth.test"]["failures"] == 0
+
+
+def test_busy_host_fails_fast(api, mocker):
+    calls, _statuses = api
+    mocker.patch.object(http_client.settings, "HTTP_MAX_CONCURRENCY_PER_HOST", 1)
+    guard = http_client._get_host_guard("https://osrm.test/table")
+    guard.acquire()
+
+    with pytest.raises(http_client.HostUnavailableError):
+        http_client.get("https://osrm.test/table", timeout=1)
+    assert calls == []
+
+    guard.release(False, False)
+    assert http_client.get("https://osrm.test/table", timeout=1).status_code == 200
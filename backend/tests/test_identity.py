@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from app.core import identity
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(mocker):
+    return mocker.patch.object(
+        identity, "_profile_cache", identity._ProfileCache(max_entries=2, ttl_seconds=60)
+    )
+
+
+def _claims(iat):
+    return json.dumps({"sub": "u1", "iat": iat})
+
+
+def test_profile_cached_per_token(mock_db_connection):
+    """A second lookup with the same token skips the profiles query"""
+    mock_db_connection.cursor.fetchone.return_value = ("shop", None, None, "shop-1", None, None)
+
+    first = identity.resolve_identity("u1", "e", _claims(100))
+    second = identity.resolve_identity("u1", "e", _claims(100))
+
+    assert first == second
+    assert second.shop_id == "shop-1"
+    assert mock_db_connection.cursor.execute.call_count == 1
+    assert identity.get_identity_cache_stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_new_token_or_invalidation_refetches(mock_db_connection):
+    mock_db_connection.cursor.fetchone.return_value = ("city", "city-1", None, None, None, None)
+    identity.resolve_identity("u1", "e", _claims(100))
+
+    mock_db_connection.cursor.fetchone.return_value = ("hq", None, "hq-1", None, None, None)
+    assert identity.resolve_identity("u1", "e", _claims(200)).role == "hq"
+
+    mock_db_connection.cursor.fetchone.return_value = ("shop", None, None, "shop-1", None, None)
+    identity.invalidate_identity("u1")
+    assert identity.resolve_identity("u1", "e", _claims(200)).role == "shop"
+    assert mock_db_connection.cursor.execute.call_count == 3
+
+
+def test_lru_evicts_oldest_user(fresh_cache):
+    fresh_cache.put("u1", 1, None)
+    fresh_cache.put("u2", 1, None)
+    fresh_cache.get("u1", 1)
+    fresh_cache.put("u3", 1, None)
+    assert fresh_cache.get("u2", 1) == (False, None)
+    assert fresh_cache.get("u1", 1) == (True, None)
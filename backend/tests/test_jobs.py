@@ -0,0 +1,60 @@
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import jobs
+from app.routes import billing
+
+
+def _handler(params, item_key, _claims):
+    if item_key == "frozen":
+        raise HTTPException(status_code=409, detail="Already frozen")
+    if item_key == "broken":
+        raise RuntimeError("upload failed")
+    return {"shop": item_key, "month": params["month"]}
+
+
+def test_items_record_their_outcome(mocker):
+    mocker.patch.dict(jobs._handlers, {"test.kind": _handler})
+    mocker.patch.object(jobs, "_claim_item", return_value=True)
+    finish = mocker.patch.object(jobs, "_finish_item")
+
+    for key in ("ok", "frozen", "broken"):
+        jobs._local_items["job-1"] += 1
+        jobs._run_item("job-1", "test.kind", {"month": "2025-01-01"}, key, "{}")
+
+    outcomes = {call.args[1]: call.args[2:5] for call in finish.call_args_list}
+    assert outcomes["ok"] == ("done", {"shop": "ok", "month": "2025-01-01"}, None)
+    assert outcomes["frozen"] == ("skipped", None, "Already frozen")
+    assert outcomes["broken"] == ("failed", None, "upload failed")
+    assert "job-1" not in jobs._local_items
+
+
+def test_cancelled_item_is_not_run(mocker):
+    handler = MagicMock()
+    mocker.patch.dict(jobs._handlers, {"test.kind": handler})
+    mocker.patch.object(jobs, "_claim_item", return_value=False)
+    finish = mocker.patch.object(jobs, "_finish_item")
+
+    jobs._local_items["job-2"] += 1
+    jobs._run_item("job-2", "test.kind", {}, "shop-1", "{}")
+
+    handler.assert_not_called()
+    finish.assert_not_called()
+
+
+@pytest.mark.db_connection("app.routes.billing.get_db_connection")
+def test_region_freeze_returns_a_job_per_shop(mocker, mock_db_connection):
+    mock_db_connection.cursor.fetchall.return_value = [("shop-1", "Boulangerie"), ("shop-2", "Fleuriste")]
+    submit = mocker.patch("app.routes.billing.submit_job", return_value="job-3")
+    user = MagicMock(role="admin_region", admin_region_id="region-1", user_id="user-1", email="a@b.ch")
+
+    response = billing.freeze_region_billing(month="2025-01", admin_region_id=None, user=user, jwt_claims="{}")
+
+    assert response == {"month": "2025-01", "total_shops": 2, "job_id": "job-3", "status": "queued"}
+    kwargs = submit.call_args.kwargs
+    assert kwargs["kind"] == "billing.freeze_shop"
+    assert kwargs["items"] == [("shop-1", "Boulangerie"), ("shop-2", "Fleuriste")]
+    assert kwargs["params"]["period_month"] == "2025-01-01"
+    assert kwargs["admin_region_id"] == "region-1"
@@ -0,0 +1,74 @@
+from io import BytesIO
+
+from PIL import Image as PILImage
+from reportlab.lib.units import cm
+
+from app.pdf import logo
+
+
+def _image(width: int, height: int, mode: str = "RGB", format: str = "PNG") -> bytes:
+    buffer = BytesIO()
+    PILImage.new(mode, (width, height), "red").save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def test_logo_is_decoded_once_and_downscaled(mocker):
+    mocker.patch.object(logo, "_scaled_logos", logo.OrderedDict())
+    scale = mocker.spy(logo, "_scale")
+    data = _image(4000, 1000)
+
+    first = logo.build_logo_image(width_cm=4.2, logo_bytes=data)
+    second = logo.build_logo_image(width_cm=4.2, logo_bytes=data)
+
+    scale.assert_called_once()
+    assert first is not second
+    assert first.drawWidth == 4.2 * cm
+    assert first.drawHeight == 4.2 * cm / 4
+    # 4.2 cm at 300 dpi
+    assert first.imageWidth == 496
+
+
+def test_cmyk_logo_converted_for_png():
+    png_bytes, width, _height = logo._scale(_image(4000, 1000, "CMYK", "JPEG"), 4.2)
+
+    assert width == 496
+    with PILImage.open(BytesIO(png_bytes)) as png:
+        assert (png.format, png.mode) == ("PNG", "RGB")
+
+
+def test_logo_kept_as_is_when_it_cannot_be_reencoded(mocker):
+    data = _image(200, 100, "CMYK", "JPEG")
+    mocker.patch.object(logo.PILImage.Image, "save", side_effect=OSError("cannot write"))
+
+    assert logo._scale(data, 4.2) == (data, 200, 100)
+    assert logo._scale(b"not an image", 4.2) is None
+
+
+def test_storage_logo_cached_until_invalidated(mocker):
+    mocker.patch.object(logo, "_storage_logos", {})
+    download = mocker.patch.object(logo, "download_file_bytes", return_value=b"png")
+
+    assert logo.load_storage_logo("admin-region/r1/logo.png") == b"png"
+    assert logo.load_storage_logo("admin-region/r1/logo.png") == b"png"
+    assert download.call_count == 1
+
+    logo.invalidate_storage_logo("admin-region/r1/logo.png")
+    logo.load_storage_logo("admin-region/r1/logo.png")
+    assert download.call_count == 2
+    assert logo.load_storage_logo(None) is None
+
+
+def test_failed_storage_download_cached_briefly(mocker):
+    mocker.patch.object(logo, "_storage_logos", {})
+    download = mocker.patch.object(
+        logo, "download_file_bytes", side_effect=[RuntimeError("storage down"), b"png"]
+    )
+    now = mocker.patch.object(logo.time, "monotonic", return_value=1000.0)
+
+    assert logo.load_storage_logo("admin-region/r1/logo.png") is None
+    assert logo.load_storage_logo("admin-region/r1/logo.png") is None
+    assert download.call_count == 1
+
+    now.return_value = 1000.0 + logo._FAILED_LOGO_TTL_SECONDS + 1
+    assert logo.load_storage_logo("admin-region/r1/logo.png") == b"png"
+    assert download.call_count == 2
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.lib.units import mm
+
+from app.pdf import payment_details
+from app.pdf.payment_details import _build_qr_payload_qrbill, _qr_code_with_cross, _qr_modules
+from app.pdf.swiss_qr_renderer import _generate_qr_code_with_cross
+
+_INVOICE = {
+    "iban": "CH93 0076 2011 6238 5295 7",
+    "creditor_name": "Velocite Sion",
+    "creditor_address": "Avenue de la Gare 12",
+    "creditor_postal_code": "1950",
+    "creditor_city": "Sion",
+    "creditor_country": "CH",
+    "amount": Decimal("42.50"),
+    "currency": "CHF",
+    "debtor_name": "Jean Dupont",
+    "debtor_address": "Rue du Rhone 45",
+    "debtor_postal_code": "1950",
+    "debtor_city": "Sion",
+    "debtor_country": "CH",
+    "reference": None,
+    "message": "Facture 2025-01",
+}
+
+
+def test_qr_payload_is_memoized(mocker):
+    _build_qr_payload_qrbill.cache_clear()
+    build = mocker.spy(payment_details, "_build_qrbill_instance")
+
+    first = _build_qr_payload_qrbill(**_INVOICE)
+    second = _build_qr_payload_qrbill(**dict(_INVOICE))
+
+    assert first == second
+    assert build.call_count == 1
+
+
+def test_qr_drawing_is_predrawn_and_never_shared(mocker):
+    payload = _build_qr_payload_qrbill(**_INVOICE)
+    _qr_modules.cache_clear()
+    widget = mocker.spy(payment_details.qr, "QrCodeWidget")
+
+    drawing = _generate_qr_code_with_cross(payload, 46 * mm)
+    other = _qr_code_with_cross(payload, 46 * mm)
+
+    # Encoded once, but every caller gets its own drawing and shapes.
+    assert widget.call_count == 1
+    assert other is not drawing
+    assert not {id(shape) for shape in other.contents} & {id(shape) for shape in drawing.contents}
+    assert drawing.width == drawing.height == 46 * mm
+    # No widget left to re-encode the payload at render time.
+    assert not any(isinstance(shape, QrCodeWidget) for shape in drawing.contents)
@@ -0,0 +1,86 @@
+import hashlib
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.pdf import pdf_cache
+from app.pdf.invoice_report import build_recipient_invoice_pdf
+
+
+@pytest.fixture
+def disk_cache(mocker, tmp_path):
+    mocker.patch.object(pdf_cache.settings, "PDF_CACHE_DIR", str(tmp_path))
+    mocker.patch.object(pdf_cache.settings, "PDF_CACHE_MAX_BYTES", 250)
+    mocker.patch.object(pdf_cache, "_disk", None)
+    return tmp_path
+
+
+def test_render_key_follows_inputs():
+    kwargs = {"period_month": date(2025, 1, 1), "rows": [(date(2025, 1, 2), Decimal("5.00"))]}
+    key = pdf_cache.render_key("city_invoice/c1", build_recipient_invoice_pdf, kwargs)
+
+    assert key.startswith("city_invoice/c1/")
+    assert key == pdf_cache.render_key("city_invoice/c1", build_recipient_invoice_pdf, dict(kwargs))
+    changed = {**kwargs, "rows": [(date(2025, 1, 2), Decimal("6.00"))]}
+    assert key != pdf_cache.render_key("city_invoice/c1", build_recipient_invoice_pdf, changed)
+
+
+def test_disk_tier_evicts_least_recently_used(disk_cache, mocker):
+    download = mocker.patch("app.pdf.pdf_cache.download_file_bytes")
+    pdf_cache.put("doc/a", b"a" * 100)
+    pdf_cache.put("doc/b", b"b" * 100)
+    assert pdf_cache.get("doc/a") == b"a" * 100
+    pdf_cache.put("doc/c", b"c" * 100)
+
+    assert pdf_cache.get("doc/b") is None
+    assert pdf_cache.get("doc/a") == b"a" * 100
+    assert (disk_cache / "doc" / "c.pdf").exists()
+    download.assert_not_called()
+
+
+def test_storage_tier_fills_disk(disk_cache, mocker):
+    download = mocker.patch("app.pdf.pdf_cache.download_file_bytes", return_value=b"%PDF-1")
+
+    assert pdf_cache.get("doc/a", remote=True) == b"%PDF-1"
+    assert pdf_cache.get("doc/a", remote=True) == b"%PDF-1"
+    download.assert_called_once_with(bucket="pdf-cache", path="doc/a.pdf")
+
+
+def test_stored_pdf_cached_only_when_hash_matches(disk_cache, mocker):
+    data = b"%PDF-frozen"
+    download = mocker.patch("app.pdf.pdf_cache.download_file_bytes", return_value=data)
+
+    tampered = "0" * 64
+    pdf_cache.fetch_stored_pdf(bucket="billing-pdf", path="shop/1.pdf", sha256=tampered)
+    pdf_cache.fetch_stored_pdf(bucket="billing-pdf", path="shop/1.pdf", sha256=tampered)
+    assert download.call_count == 2
+
+    sha256 = hashlib.sha256(data).hexdigest()
+    pdf_cache.fetch_stored_pdf(bucket="billing-pdf", path="shop/1.pdf", sha256=sha256)
+    assert pdf_cache.fetch_stored_pdf(bucket="billing-pdf", path="shop/1.pdf", sha256=sha256) == data
+    assert download.call_count == 3
+
+
+def test_disk_tier_is_owner_only(mocker, tmp_path):
+    root = tmp_path / "pdf-cache"
+    mocker.patch.object(pdf_cache.settings, "PDF_CACHE_DIR", str(root))
+    mocker.patch.object(pdf_cache, "_disk", None)
+
+    pdf_cache.put("city_invoice/c1/abc", b"%PDF-1")
+
+    assert root.stat().st_mode & 0o777 == 0o700
+    assert (root / "city_invoice").stat().st_mode & 0o777 == 0o700
+    assert (root / "city_invoice" / "c1").stat().st_mode & 0o777 == 0o700
+    assert (root / "city_invoice" / "c1" / "abc.pdf").stat().st_mode & 0o777 == 0o600
+
+
+def test_disk_tier_disabled_on_foreign_root(mocker, tmp_path):
+    mocker.patch.object(pdf_cache.settings, "PDF_CACHE_DIR", str(tmp_path))
+    mocker.patch.object(pdf_cache, "_disk", None)
+    mocker.patch("app.pdf.pdf_cache.os.getuid", return_value=tmp_path.stat().st_uid + 1)
+
+    pdf_cache.put("doc/a", b"%PDF-1")
+
+    assert pdf_cache.get("doc/a") is None
+    assert not (tmp_path / "doc").exists()
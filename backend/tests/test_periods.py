@@ -0,0 +1,93 @@
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from app.core.periods import month_bounds, month_range
+
+MIGRATION = Path(__file__).resolve().parents[1] / "migrations" / "update_delivery_period_indexes_v49.sql"
+
+
+def test_month_bounds():
+    assert month_bounds(date(2025, 3, 17)) == (date(2025, 3, 1), date(2025, 4, 1))
+    assert month_bounds(date(2024, 12, 1)) == (date(2024, 12, 1), date(2025, 1, 1))
+
+
+def test_month_range_is_sargable():
+    assert month_range() == "d.delivery_date >= %s AND d.delivery_date < %s"
+    assert "date_trunc" not in month_range("x.day")
+
+
+@pytest.fixture
+def pg_conn():
+    """Live Postgres from TEST_DATABASE_URL; everything runs in a rolled-back transaction."""
+    psycopg = pytest.importorskip("psycopg")
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL not set")
+    try:
+        conn = psycopg.connect(url, connect_timeout=5)
+    except psycopg.OperationalError as exc:
+        pytest.skip(f"database unavailable: {exc}")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def test_month_filter_uses_composite_index(pg_conn):
+    """On a seeded delivery table the v49 indexes serve the shop/month filter"""
+    with pg_conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TEMP TABLE delivery (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                shop_id UUID,
+                hq_id UUID,
+                admin_region_id UUID,
+                city_id UUID,
+                courier_id UUID,
+                client_id UUID,
+                delivery_date DATE NOT NULL
+            ) ON COMMIT DROP
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO delivery (shop_id, admin_region_id, city_id, delivery_date)
+            SELECT
+                ('00000000-0000-0000-0000-' || lpad((n % 200)::text, 12, '0'))::uuid,
+                ('00000000-0000-0000-0001-' || lpad((n % 5)::text, 12, '0'))::uuid,
+                ('00000000-0000-0000-0002-' || lpad((n % 40)::text, 12, '0'))::uuid,
+                DATE '2023-01-01' + (n % 730)
+            FROM generate_series(1, 50000) AS n
+            """
+        )
+        cur.execute(MIGRATION.read_text().replace("public.delivery", "pg_temp.delivery"))
+
+        cur.execute(
+            f"""
+            EXPLAIN (FORMAT JSON)
+            SELECT d.id
+            FROM delivery d
+            WHERE d.shop_id = %s
+              AND {month_range()}
+            """,
+            ("00000000-0000-0000-0000-000000000007", *month_bounds(date(2024, 3, 1))),
+        )
+        raw = cur.fetchone()[0]
+        plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+
+    nodes = list(_plan_nodes(plan))
+    assert not any(node["Node Type"] == "Seq Scan" for node in nodes)
+    index_conds = [node.get("Index Cond", "") for node in nodes]
+    assert any("shop_id" in cond and "delivery_date" in cond for cond in index_conds)
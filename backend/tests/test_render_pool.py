@@ -0,0 +1,123 @@
+import io
+import time
+import zipfile
+
+import pytest
+
+from app.core.zip_stream import ZipStream
+from app.pdf import render_pool
+from app.pdf.render_pool import PdfRenderTimeout, RenderJob, render_jobs
+from app.routes.reporting import _stream_rendered_pdfs
+
+
+def _fake_pdf(*, label: str, delay: float = 0.0) -> io.BytesIO:
+    if delay:
+        time.sleep(delay)
+    if label == "broken":
+        raise ValueError("no rows to render")
+    return io.BytesIO(f"%PDF-{label}".encode())
+
+
+def _job(label: str, delay: float = 0.0) -> RenderJob:
+    return RenderJob(
+        name=label,
+        filename=f"{label}.pdf",
+        builder=_fake_pdf,
+        kwargs={"label": label, "delay": delay},
+    )
+
+
+@pytest.fixture
+def workers(mocker):
+    def _configure(count: int, max_pending: int = 8, timeout: float = 60.0):
+        mocker.patch.object(render_pool.settings, "PDF_RENDER_WORKERS", count)
+        mocker.patch.object(render_pool.settings, "PDF_RENDER_MAX_PENDING", max_pending)
+        mocker.patch.object(render_pool.settings, "PDF_RENDER_TIMEOUT_SECONDS", timeout)
+
+    yield _configure
+    render_pool.shutdown_render_pool()
+
+
+def test_inline_rendering_keeps_order_and_errors(workers):
+    workers(0)
+    results = list(render_jobs([_job("a"), _job("broken"), _job("b")]))
+
+    assert [job.name for job, _pdf, _err in results] == ["a", "broken", "b"]
+    assert results[0][1] == b"%PDF-a"
+    assert isinstance(results[1][2], ValueError)
+
+
+def test_pool_bounds_jobs_in_flight(workers):
+    """The job generator is only advanced as results are consumed"""
+    workers(1, max_pending=2)
+    pulled = []
+
+    def _jobs():
+        for label in ("a", "b", "c", "d"):
+            pulled.append(label)
+            yield _job(label)
+
+    results = render_jobs(_jobs())
+    job, pdf_bytes, error = next(results)
+    assert (job.name, pdf_bytes, error) == ("a", b"%PDF-a", None)
+    assert pulled == ["a", "b"]
+    assert [job.name for job, _pdf, _err in results] == ["b", "c", "d"]
+
+
+def test_pool_reports_timeout_and_replaces_executor(workers):
+    workers(1, timeout=0.5)
+    results = list(render_jobs([_job("slow", delay=30.0)]))
+
+    assert isinstance(results[0][2], PdfRenderTimeout)
+    assert render_pool._executor is None
+
+
+def test_queued_time_does_not_count_towards_timeout(workers):
+    """Documents waiting for the single worker keep their full render budget"""
+    workers(1, timeout=1.0)
+    results = list(render_jobs([_job(label, delay=0.4) for label in ("a", "b", "c", "d")]))
+
+    assert [error for _job, _pdf, error in results] == [None] * 4
+    assert render_pool._executor is not None
+    assert render_pool._started_at == {}
+
+
+def test_stored_pdfs_pass_through_in_order(workers):
+    workers(1)
+    stored = RenderJob(name="stored", filename="stored.pdf", pdf_bytes=b"%PDF-stored")
+    results = list(render_jobs([_job("a"), stored, _job("b")]))
+
+    assert [(job.name, pdf_bytes) for job, pdf_bytes, _err in results] == [
+        ("a", b"%PDF-a"),
+        ("stored", b"%PDF-stored"),
+        ("b", b"%PDF-b"),
+    ]
+
+
+def test_zip_gets_error_entries_for_failed_documents(workers):
+    workers(0)
+    zip_file = ZipStream()
+    chunks = list(_stream_rendered_pdfs(zip_file, [_job("a"), _job("broken")]))
+    chunks.append(zip_file.close())
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == ["a.pdf", "ERROR_broken.txt"]
+        assert archive.read("ERROR_broken.txt") == b"Could not generate PDF: no rows to render"
+
+
+def test_cached_renders_are_reused(workers, mocker, tmp_path):
+    workers(0)
+    mocker.patch.object(render_pool.settings, "PDF_CACHE_DIR", str(tmp_path))
+    mocker.patch.object(render_pool.pdf_cache, "_disk", None)
+    render = mocker.spy(render_pool, "_render")
+    job = RenderJob(
+        name="a",
+        filename="a.pdf",
+        builder=_fake_pdf,
+        kwargs={"label": "a"},
+        cache_id="shop_invoice/a",
+    )
+
+    assert [pdf for _job, pdf, _err in render_jobs([job])] == [b"%PDF-a"]
+    assert [pdf for _job, pdf, _err in render_jobs([job])] == [b"%PDF-a"]
+    render.assert_called_once()
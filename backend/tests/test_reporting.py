@@ -0,0 +1,27 @@
+import pytest
+
+from app.routes import reporting
+
+
+@pytest.mark.db_connection("app.routes.reporting.get_db_connection", dedicated=True)
+def test_zip_rows_fetched_in_batches_without_holding_a_connection(mocker, mock_db_connection):
+    mocker.patch.object(reporting, "_ZIP_FETCH_BATCH_SIZE", 2)
+
+    def _fetch(cur, shop_id, shop_name):
+        if shop_id == "s2":
+            raise RuntimeError("statement timeout")
+        return [(shop_name, 1)]
+
+    shops = [("s1", "Alpha"), ("s2", "Beta"), ("s3", "Gamma")]
+    results = []
+    for shop, rows, error in reporting._fetch_per_item(shops, _fetch, "{}"):
+        # Rendering and streaming happen here: no connection held.
+        assert mock_db_connection.held == 0
+        results.append((shop[0], rows, type(error).__name__ if error else None))
+
+    assert len(mock_db_connection.checkouts) == 2
+    assert results == [
+        ("s1", [("Alpha", 1)], None),
+        ("s2", None, "RuntimeError"),
+        ("s3", [("Gamma", 1)], None),
+    ]
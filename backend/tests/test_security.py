@@ -0,0 +1,105 @@
+import base64
+import time
+
+import pytest
+from jose import jwt
+
+from app.core import security
+
+
+SECRET = base64.b64encode(b"super-secret-signing-key").decode()
+
+
+@pytest.fixture(autouse=True)
+def isolated_security(mocker):
+    mocker.patch.object(security.settings, "SUPABASE_JWT_SECRET", SECRET)
+    mocker.patch.dict(security._HS256_PREFERRED, {"variant": None})
+    mocker.patch.object(
+        security, "_PAYLOAD_CACHE", security._PayloadCache(max_entries=8, ttl_seconds=300)
+    )
+
+
+def _token(exp_in: float = 600) -> str:
+    return jwt.encode(
+        {"sub": "u1", "aud": "authenticated", "exp": int(time.time() + exp_in)},
+        b"super-secret-signing-key",
+        algorithm="HS256",
+    )
+
+
+def test_secret_variant_remembered(mocker):
+    """Once the base64 secret verifies, later tokens skip the raw-secret attempt"""
+    decode = mocker.spy(security.jwt, "decode")
+    assert security._decode_jwt(_token())["sub"] == "u1"
+    assert decode.call_count == 2
+    assert security._HS256_PREFERRED["variant"] == "base64"
+
+    decode.reset_mock()
+    security._decode_jwt(_token(exp_in=900))
+    assert decode.call_count == 1
+
+
+def test_payload_cached_until_exp(mocker):
+    token = _token()
+    decode = mocker.spy(security, "_decode_jwt")
+    first = security.get_current_user_claims(security.get_token_payload(
+        mocker.Mock(credentials=token)
+    ))
+    user = security.get_current_user(security.get_token_payload(
+        mocker.Mock(credentials=token)
+    ))
+    assert '"sub": "u1"' in first
+    assert user.user_id == "u1"
+    assert decode.call_count == 1
+
+    # Past `exp` the cached payload is dropped and the token is verified again.
+    mocker.patch.object(security.time, "time", return_value=time.time() + 3600)
+    security.get_token_payload(mocker.Mock(credentials=token))
+    assert decode.call_count == 2
+
+
+@pytest.fixture
+def jwks_cache(mocker):
+    cache = {
+        "expires_at": 0,
+        "attempted_at": 0,
+        "keys": [],
+        "by_kid": {},
+        "refreshing": False,
+    }
+    mocker.patch.object(security, "_JWKS_CACHE", cache)
+    return cache
+
+
+def test_jwks_cold_fetch_builds_kid_index(mocker, jwks_cache):
+    fetch = mocker.patch.object(
+        security, "_fetch_jwks", return_value=[{"kid": "k1", "kty": "EC"}]
+    )
+    assert security._get_jwks_key("k1") == {"kid": "k1", "kty": "EC"}
+    assert security._get_jwks_key("k1") == {"kid": "k1", "kty": "EC"}
+    fetch.assert_called_once()
+
+
+def test_jwks_stale_keys_served_while_refreshing(mocker, jwks_cache):
+    """Expired keys are returned at once; one background refresh is started"""
+    jwks_cache.update(
+        keys=[{"kid": "k1"}], by_kid={"k1": {"kid": "k1"}}, attempted_at=time.time()
+    )
+    fetch = mocker.patch.object(security, "_fetch_jwks")
+    background = mocker.patch.object(security, "_refresh_jwks_in_background")
+
+    assert security._get_jwks_key("k1") == {"kid": "k1"}
+    assert security._get_jwks_key("k1") == {"kid": "k1"}
+    background.assert_called_once()
+    fetch.assert_not_called()
+
+
+def test_jwks_refresh_failure_keeps_keys(mocker, jwks_cache):
+    jwks_cache.update(keys=[{"kid": "k1"}], by_kid={"k1": {"kid": "k1"}}, refreshing=True)
+    mocker.patch.object(security, "_fetch_jwks", side_effect=OSError("down"))
+
+    security._refresh_jwks()
+
+    assert jwks_cache["by_kid"] == {"k1": {"kid": "k1"}}
+    assert jwks_cache["refreshing"] is False
+    assert jwks_cache["expires_at"] > time.time()
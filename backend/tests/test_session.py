@@ -0,0 +1,122 @@
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from psycopg.pq import TransactionStatus
+
+from app.db import session
+
+
+@pytest.fixture
+def mock_pool(mocker, mock_db_connection):
+    mock_db_connection.conn.closed = False
+    pool = MagicMock()
+    pool.connection.side_effect = mock_db_connection.connect
+    mocker.patch("app.db.session._get_pool", return_value=pool)
+    return mock_db_connection.conn, mock_db_connection.cursor
+
+
+def test_claims_set_on_checkout(mock_pool):
+    """Each checkout scopes the JWT claims to the borrowed connection"""
+    conn, cursor = mock_pool
+    conn.info.transaction_status = TransactionStatus.IDLE
+
+    with session.get_db_connection('{"sub": "u1"}') as borrowed:
+        assert borrowed is conn
+
+    cursor.execute.assert_called_once_with(
+        "SELECT set_config('request.jwt.claims', %s, true)", ('{"sub": "u1"}',)
+    )
+    conn.rollback.assert_not_called()
+
+
+def test_open_transaction_rolled_back_on_return(mock_pool):
+    """Uncommitted work (and transaction-local claims) never leak to the next borrower"""
+    conn, _cursor = mock_pool
+    conn.info.transaction_status = TransactionStatus.INTRANS
+
+    with pytest.raises(RuntimeError):
+        with session.get_db_connection("{}"):
+            raise RuntimeError("boom")
+
+    conn.rollback.assert_called_once()
+
+
+def test_pool_stats_when_closed(mocker):
+    mocker.patch("app.db.session._pool", None)
+    assert session.get_pool_stats() == {"open": False}
+
+
+def test_endpoint_keeps_last_address_when_lookup_fails(mocker):
+    """Expired entries are refreshed in the background and survive DNS failures"""
+    getaddrinfo = mocker.patch(
+        "app.db.session.socket.getaddrinfo",
+        return_value=[(None, None, None, None, ("10.0.0.1", 0))],
+    )
+    endpoint = session._ResolvedEndpoint("db.example.com", ttl_seconds=60)
+    assert endpoint.get() == "10.0.0.1"
+    assert endpoint.get() == "10.0.0.1"
+    assert getaddrinfo.call_count == 1
+
+    getaddrinfo.side_effect = session.socket.gaierror("lookup failed")
+    endpoint.expires_at = 0.0
+    background = mocker.patch.object(endpoint, "_refresh_in_background")
+    assert endpoint.get() == "10.0.0.1"
+    background.assert_called_once()
+    endpoint._refresh()
+    assert endpoint.address == "10.0.0.1"
+    assert getaddrinfo.call_count == 2
+
+
+def test_endpoint_falls_back_to_hostname(mocker):
+    mocker.patch(
+        "app.db.session.socket.getaddrinfo",
+        side_effect=session.socket.gaierror("lookup failed"),
+    )
+    endpoint = session._ResolvedEndpoint("db.example.com", ttl_seconds=60)
+    assert endpoint.get() == "db.example.com"
+
+
+def test_request_shares_one_connection(mocker):
+    """Guards and the route body reuse the connection borrowed for the request"""
+    conn = MagicMock()
+    conn.closed = False
+    conn.info.transaction_status = TransactionStatus.IDLE
+    pool = MagicMock()
+    pool.getconn.return_value = conn
+    mocker.patch("app.db.session._get_pool", return_value=pool)
+
+    def guard():
+        with session.get_db_connection("{}") as borrowed:
+            return borrowed
+
+    app = FastAPI(dependencies=[Depends(session.request_db_scope)])
+
+    @app.get("/")
+    def route(guard_conn=Depends(guard)):
+        with session.get_db_connection("{}") as borrowed:
+            with session.get_db_connection("{}"):
+                pass
+            return {"shared": borrowed is guard_conn is conn}
+
+    assert TestClient(app).get("/").json() == {"shared": True}
+    pool.getconn.assert_called_once()
+    pool.putconn.assert_called_once_with(conn)
+    # The nested checkout went through the pool instead of the shared connection.
+    pool.connection.assert_called_once()
+
+
+def test_dedicated_connection_bypasses_request_scope(mock_pool):
+    """Streamed responses outlive the request: they never borrow its shared connection"""
+    conn, _cursor = mock_pool
+    conn.info.transaction_status = TransactionStatus.IDLE
+    scope = MagicMock()
+    token = session._request_connection.set(scope)
+    try:
+        with session.get_db_connection("{}", dedicated=True) as borrowed:
+            assert borrowed is conn
+    finally:
+        session._request_connection.reset(token)
+
+    scope.acquire.assert_not_called()
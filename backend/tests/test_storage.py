@@ -0,0 +1,92 @@
+import httpx
+import pytest
+
+from app.pdf import pdf_cache
+from app.storage import supabase_storage
+
+
+@pytest.fixture
+def local_storage(mocker, tmp_path):
+    mocker.patch.object(supabase_storage.settings, "STORAGE_LOCAL_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def supabase(mocker):
+    """Supabase storage answered by `handler(request) -> httpx.Response`"""
+    mocker.patch.object(supabase_storage.settings, "STORAGE_LOCAL_DIR", None)
+    mocker.patch.object(supabase_storage.settings, "STORAGE_RETRY_BACKOFF_SECONDS", 0.0)
+    mocker.patch.object(supabase_storage, "_known_buckets", set())
+    requests = []
+
+    def _install(handler):
+        def _record(request):
+            requests.append(request)
+            return handler(request)
+
+        client = httpx.Client(transport=httpx.MockTransport(_record))
+        mocker.patch.object(supabase_storage, "_client", client)
+        return requests
+
+    return _install
+
+
+def test_local_backend_round_trip(local_storage):
+    supabase_storage.upload_pdf_bytes(bucket="billing-pdf", path="shop/1/2025-01.pdf", data=b"%PDF")
+
+    assert (local_storage / "billing-pdf" / "shop" / "1" / "2025-01.pdf").read_bytes() == b"%PDF"
+    assert supabase_storage.download_file_bytes(bucket="billing-pdf", path="shop/1/2025-01.pdf") == b"%PDF"
+    with pytest.raises(RuntimeError):
+        supabase_storage.download_file_bytes(bucket="billing-pdf", path="../outside.pdf")
+
+
+def test_batches_keep_order_and_report_failures(local_storage):
+    errors = supabase_storage.upload_many(
+        [("logos", f"{name}.png", name.encode(), "image/png") for name in ("a", "b", "c")]
+    )
+    results = supabase_storage.download_many([("logos", "a.png"), ("logos", "missing.png"), ("logos", "c.png")])
+
+    assert errors == [None, None, None]
+    assert results[0] == b"a"
+    assert isinstance(results[1], RuntimeError)
+    assert results[2] == b"c"
+
+
+def test_transient_errors_are_retried(supabase):
+    answers = iter([httpx.Response(503, text="busy"), httpx.Response(200, content=b"%PDF")])
+    requests = supabase(lambda request: next(answers))
+
+    assert supabase_storage.download_file_bytes(bucket="billing-pdf", path="a.pdf") == b"%PDF"
+    assert len(requests) == 2
+
+
+def test_missing_bucket_created_once(supabase):
+    def _handler(request):
+        if request.url.path == "/storage/v1/bucket":
+            return httpx.Response(200, json={"name": "pdf-cache"})
+        if len([r for r in requests if r.url.path.startswith("/storage/v1/object")]) == 1:
+            return httpx.Response(400, json={"error": "Bucket not found"})
+        return httpx.Response(200, json={})
+
+    requests = supabase(_handler)
+
+    supabase_storage.upload_pdf_bytes(bucket="pdf-cache", path="a.pdf", data=b"%PDF")
+    supabase_storage.upload_pdf_bytes(bucket="pdf-cache", path="b.pdf", data=b"%PDF")
+
+    assert [request.url.path for request in requests] == [
+        "/storage/v1/object/pdf-cache/a.pdf",
+        "/storage/v1/bucket",
+        "/storage/v1/object/pdf-cache/a.pdf",
+        "/storage/v1/object/pdf-cache/b.pdf",
+    ]
+    assert "pdf-cache" in supabase_storage._known_buckets
+
+
+def test_stored_pdfs_fetched_in_one_batch(local_storage, mocker):
+    mocker.patch.object(pdf_cache.settings, "PDF_CACHE_MAX_BYTES", 0)
+    supabase_storage.upload_pdf_bytes(bucket="billing-pdf", path="a.pdf", data=b"%PDF-a")
+
+    results = pdf_cache.fetch_stored_pdfs(bucket="billing-pdf", entries=[("a.pdf", None), ("b.pdf", None)])
+
+    assert results[0] == b"%PDF-a"
+    assert isinstance(results[1], RuntimeError)
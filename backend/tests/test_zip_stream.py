@@ -0,0 +1,24 @@
+import io
+import os
+import zipfile
+
+from app.core.zip_stream import ZipStream
+
+
+def test_entries_are_flushed_as_they_are_written():
+    """Each drain returns the bytes of the entry just added, nothing is kept"""
+    zip_file = ZipStream()
+    documents = {f"doc_{i}.pdf": os.urandom(256 * 1024) for i in range(4)}
+
+    chunks = []
+    for name, data in documents.items():
+        zip_file.writestr(name, data)
+        chunk = zip_file.drain()
+        assert len(chunk) > len(data)
+        assert zip_file.drain() == b""
+        chunks.append(chunk)
+    chunks.append(zip_file.close())
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert {name: archive.read(name) for name in archive.namelist()} == documents
@@ -12,7 +12,7 @@ import {
     TableRow,
 } from '@/components/ui/table'
 import { Badge } from '@/components/ui/badge'
-import { apiGet, apiPost, API_BASE_URL } from '@/lib/api'
+import { apiGet, apiPost, waitForJob, API_BASE_URL } from '@/lib/api'
 import { createClient } from '@/lib/supabase/client'
 import { toast } from 'sonner'
 import { useAuth } from '@/app/(protected)/providers/AuthProvider'
@@ -135,6 +135,18 @@ export default function BillingPage() {
     }, [monthPickerOpen])
 
 
+    const aggregateRegion = async (queryParams: string, token: string) => {
+        const { job_id } = await apiPost<{ job_id: string }>(
+            `/billing/region/aggregate?month=${selectedMonth}${queryParams}`,
+            {},
+            token
+        )
+        const job = await waitForJob(job_id, token)
+        if (job.status !== 'completed' || job.items_by_status.done !== job.total_items) {
+            throw new Error(job.error || 'Billing aggregation failed')
+        }
+    }
+
     const loadData = async () => {
         setLoading(true)
         try {
@@ -143,11 +155,7 @@ export default function BillingPage() {
             if (!session?.access_token) return
 
             const queryParams = adminContextRegion ? `&admin_region_id=${adminContextRegion.id}` : ''
-            await apiPost(
-                `/billing/region/aggregate?month=${selectedMonth}${queryParams}`,
-                {},
-                session.access_token
-            )
+            await aggregateRegion(queryParams, session.access_token)
             const res = await apiGet<BillingData>(
                 `/billing/documents?month=${selectedMonth}${queryParams}`,
                 session.access_token
@@ -212,11 +220,7 @@ export default function BillingPage() {
             if (!session?.access_token) return
 
             const queryParams = adminContextRegion ? `&admin_region_id=${adminContextRegion.id}` : ''
-            await apiPost(
-                `/billing/region/aggregate?month=${selectedMonth}${queryParams}`,
-                {},
-                session.access_token
-            )
+            await aggregateRegion(queryParams, session.access_token)
             loadData()
             loadDetails()
             toast.success('Facturation recalculee')
@@ -138,6 +138,29 @@ export async function apiPatch<T>(
   )
 }
 
+export type BackgroundJob = {
+  id: string
+  status: 'queued' | 'running' | 'completed' | 'cancelled' | 'failed'
+  error: string | null
+  total_items: number
+  finished_items: number
+  items_by_status: Record<string, number>
+}
+
+export async function waitForJob(
+  jobId: string,
+  token?: string,
+  intervalMs = 1000
+): Promise<BackgroundJob> {
+  for (;;) {
+    const job = await apiGet<BackgroundJob>(`/jobs/${jobId}`, token)
+    if (job.status !== 'queued' && job.status !== 'running') {
+      return job
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs))
+  }
+}
+
 export const api = {
   get: apiGet,
   post: apiPost,